@@ -0,0 +1,189 @@
+"""
+Retreino incremental dos modelos persistidos e backtest walk-forward.
+
+Modo 'atualizar': quando chega um novo mês/ano de dados (INMET/ANEEL), cada
+modelo salvo por app_treinamento.py é atualizado só com as horas posteriores
+a metadados['dados_ate']: o Random Forest ganha novas árvores (warm_start) e
+o XGBoost continua o boosting a partir do booster salvo (spec['atualizar']).
+Não há nova busca de hiperparâmetros.
+
+Modo 'backtest': treina com os primeiros MESES_TREINO_INICIAL meses e, a cada
+período seguinte, mede o modelo no período e depois o atualiza com ele,
+salvando as métricas de cada passo em CSV.
+
+Uso: python app_incremental.py [atualizar|backtest] [chave_modelo ...]
+"""
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+from sklearn.metrics import f1_score, precision_score, recall_score, roc_auc_score
+from data_pipeline import city_config, MODEL_FEATURES, TARGET, build_city_dataset, preprocessing_version
+from model_registry import get_models
+from training import safe_city_name
+import model_store
+from decision_threshold import LIMIAR_PADRAO
+
+# --- CONFIGURAÇÕES ---
+
+MODO = 'atualizar'
+# Árvores (Random Forest) ou rodadas de boosting (XGBoost) adicionadas por atualização
+INCREMENTO = 20
+# Backtest walk-forward: treino inicial e tamanho de cada passo (frequência do pandas)
+MESES_TREINO_INICIAL = 12
+PERIODO_BACKTEST = 'M'
+
+
+def update_model(spec, estimator, metadados, X_new, y_new, incremento=INCREMENTO):
+    """
+    Atualiza o estimador só com os dados novos. Retorna (estimador, metadados)
+    atualizados, ou None se o lote não tiver as duas classes (os dados ficam
+    para a próxima atualização, pois 'dados_ate' não avança).
+    """
+    if len(np.unique(y_new)) < 2:
+        print(f"  AVISO: Dados novos com uma única classe ({len(y_new)} amostras). Atualização adiada.")
+        return None
+
+    n0, n1 = metadados['contagem_classes']
+    contagem = [n0 + int((y_new == 0).sum()), n1 + int((y_new == 1).sum())]
+
+    inicio = time.time()
+    estimator = spec['atualizar'](estimator, X_new, y_new, incremento, contagem)
+    segundos = time.time() - inicio
+
+    metadados = dict(metadados)
+    metadados['contagem_classes'] = contagem
+    metadados['dados_ate'] = X_new.index.max().isoformat()
+    metadados['atualizacoes'] = metadados.get('atualizacoes', []) + [{
+        'amostras': len(y_new),
+        'positivos': int(y_new.sum()),
+        'incremento': incremento,
+        'segundos': round(segundos, 3)
+    }]
+    return estimator, metadados
+
+
+def evaluate_period(estimator, X, y, limiar=LIMIAR_PADRAO):
+    """Métricas de um período (usadas antes de o modelo ver os dados do período), com o limiar do modelo."""
+    y_proba = estimator.predict_proba(X)[:, 1]
+    y_pred = (y_proba >= limiar).astype(int)
+    metricas = {
+        'amostras': len(y),
+        'positivos': int(y.sum()),
+        'f1': f1_score(y, y_pred, zero_division=0),
+        'precisao': precision_score(y, y_pred, zero_division=0),
+        'recall': recall_score(y, y_pred, zero_division=0),
+        'auc': np.nan
+    }
+    if len(np.unique(y)) == 2:
+        metricas['auc'] = roc_auc_score(y, y_proba)
+    return metricas
+
+
+def periods_of(index, periodo=PERIODO_BACKTEST):
+    """Período (mês, por padrão) de cada hora do índice UTC."""
+    return index.tz_convert('UTC').tz_localize(None).to_period(periodo)
+
+
+def walk_forward_backtest(df_final, spec, params, meses_iniciais=MESES_TREINO_INICIAL,
+                          periodo=PERIODO_BACKTEST, incremento=INCREMENTO, limiar=LIMIAR_PADRAO):
+    """
+    Treina com os primeiros meses_iniciais meses e avança período a período:
+    mede no período seguinte (previsão = probabilidade >= limiar) e então
+    atualiza o modelo com ele.
+    Retorna um DataFrame com as métricas de cada passo.
+    """
+    periodos = periods_of(df_final.index, periodo)
+    unicos = periodos.unique().sort_values()
+    limite = periods_of(df_final.index[:1], 'M')[0] + meses_iniciais
+
+    treino = periods_of(df_final.index, 'M') < limite
+    X_treino, y_treino = df_final.loc[treino, MODEL_FEATURES], df_final.loc[treino, TARGET]
+    if len(np.unique(y_treino)) < 2:
+        print("  ERRO: O treino inicial do backtest só contém uma classe.")
+        return None
+
+    estimator = spec['build_estimator'](y_treino).set_params(**params)
+    estimator.fit(X_treino, y_treino)
+    metadados = {'contagem_classes': [int((y_treino == 0).sum()), int((y_treino == 1).sum())]}
+
+    passos = []
+    for p in unicos[unicos >= limite.asfreq(periodo, how='start')]:
+        mascara = periodos == p
+        X_p, y_p = df_final.loc[mascara, MODEL_FEATURES], df_final.loc[mascara, TARGET]
+        passo = {'periodo': str(p), **evaluate_period(estimator, X_p, y_p, limiar)}
+
+        resultado = update_model(spec, estimator, metadados, X_p, y_p, incremento)
+        passo['atualizado'] = resultado is not None
+        if resultado is not None:
+            estimator, metadados = resultado
+            passo['segundos_atualizacao'] = metadados['atualizacoes'][-1]['segundos']
+        passos.append(passo)
+        print(f"  [Backtest] {p}: F1 {passo['f1']:.4f} | Recall {passo['recall']:.4f} | "
+              f"{passo['positivos']} positivos em {passo['amostras']} horas")
+    return pd.DataFrame(passos)
+
+
+def run_update(cidade, df_final, key, spec):
+    carregado = model_store.load_model(cidade, spec['sufixo'])
+    if carregado is None:
+        print(f"  AVISO: Nenhum modelo salvo para {cidade} / {spec['nome']}. Execute app_treinamento.py primeiro.")
+        return
+    estimator, metadados = carregado
+    if metadados.get('versao_preprocessamento') != preprocessing_version():
+        print(f"  AVISO: {cidade} / {spec['nome']} foi treinado com outro pré-processamento. Re-treine com app_treinamento.py.")
+        return
+
+    novos = df_final[df_final.index > pd.Timestamp(metadados['dados_ate'])]
+    if novos.empty:
+        print(f"  {cidade} / {spec['nome']}: nenhum dado novo após {metadados['dados_ate']}.")
+        return
+
+    X_new, y_new = novos[metadados['features']], novos[TARGET]
+    # Desempenho nos dados novos ANTES da atualização (o modelo ainda não os viu)
+    metricas = evaluate_period(estimator, X_new, y_new, metadados.get('limiar', LIMIAR_PADRAO))
+    print(f"  {cidade} / {spec['nome']}: {len(novos)} horas novas. F1 antes da atualização: {metricas['f1']:.4f}")
+
+    resultado = update_model(spec, estimator, metadados, X_new, y_new)
+    if resultado is None:
+        return
+    estimator, metadados = resultado
+    print(f"  Atualizado em {metadados['atualizacoes'][-1]['segundos']:.2f}s (dados até {metadados['dados_ate']}).")
+    model_store.save_model(cidade, spec['sufixo'], estimator, metadados)
+
+
+def run_backtest(cidade, df_final, key, spec):
+    carregado = model_store.load_model(cidade, spec['sufixo'])
+    # Usa os hiperparâmetros e o limiar do modelo salvo; sem ele, os padrões do estimador
+    params = carregado[1]['best_params'] if carregado else {}
+    limiar = carregado[1].get('limiar', LIMIAR_PADRAO) if carregado else LIMIAR_PADRAO
+    print(f"\n[Backtest] {spec['nome']} para {cidade} (parâmetros: {params}, limiar: {limiar:.4f})")
+    resultado = walk_forward_backtest(df_final, spec, params, limiar=limiar)
+    if resultado is None or resultado.empty:
+        return
+    os.makedirs(spec['saida_dir'], exist_ok=True)
+    caminho = os.path.join(spec['saida_dir'], f"backtest_{safe_city_name(cidade)}_{spec['sufixo']}.csv")
+    resultado.to_csv(caminho, sep=';', index=False)
+    print(f"[SUCESSO] Backtest salvo em: {caminho} (F1 médio: {resultado['f1'].mean():.4f})")
+
+
+def main(modo=MODO, model_keys=None):
+    models = get_models(model_keys)
+    aneel_state = {}
+    for cidade, cidade_arquivo_nome in city_config().items():
+        print(f"\n{'='*70}\n{modo.capitalize()}: {cidade}\n{'='*70}")
+        df_final = build_city_dataset(cidade, cidade_arquivo_nome, aneel_state)
+        if df_final is None:
+            continue
+        for key, spec in models:
+            if modo == 'backtest':
+                run_backtest(cidade, df_final, key, spec)
+            else:
+                run_update(cidade, df_final, key, spec)
+
+
+if __name__ == "__main__":
+    argumentos = sys.argv[1:]
+    modo = argumentos.pop(0) if argumentos and argumentos[0] in ('atualizar', 'backtest') else MODO
+    main(modo, argumentos or None)
@@ -0,0 +1,200 @@
+"""
+Pontuação em lote (streaming) com os modelos salvos.
+
+Lê os arquivos filtrados do INMET de cada cidade em blocos de CHUNKSIZE
+linhas, aplica o mesmo pré-processamento horário do treino (hourly_weather)
+e grava a probabilidade de interrupção de cada hora em um Parquet por cidade
+e modelo, sem carregar todos os anos na memória.
+
+As linhas da última hora de cada bloco ficam pendentes até o bloco seguinte,
+para que uma hora dividida entre blocos seja agregada uma única vez. Os
+arquivos são lidos na ordem dos anos (em ordem cronológica, como gerados
+pelo INMET/app.py). As features derivadas (janelas móveis) continuam de um
+bloco para o outro pelo modo incremental de weather_features.py; as features
+das estações vizinhas (spatial_index.py) são calculadas uma vez por cidade e
+unidas a cada bloco.
+
+Com USAR_ARVORES_PLANAS, RF e XGBoost pontuam pelas árvores compiladas em
+arrays NumPy (flat_trees.py, abertas por memory-map). No primeiro bloco de cada
+modelo, o resultado é conferido com o predict_proba do estimador; se divergir
+além de TOLERANCIA_ARVORES_PLANAS, a pontuação volta para o estimador.
+
+Uso: python app_predict.py [chave_modelo ...]   (padrão: todos os modelos)
+"""
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from data_pipeline import (
+    city_config, INMET_DIR, ANOS, USAR_FEATURES_DERIVADAS, FEATURES_VIZINHAS, resolve_filtered_file,
+    hourly_weather, join_neighbour_features, get_neighbour_features, preprocessing_version
+)
+import weather_features
+import flat_trees
+from model_registry import get_models
+from training import safe_city_name
+import model_store
+
+# --- CONFIGURAÇÕES ---
+
+PREVISOES_DIR = 'Data/Previsoes'
+CHUNKSIZE = 100_000
+# Anos pontuados (por padrão, os mesmos do treino)
+ANOS_PONTUACAO = ANOS
+# Pontua com as árvores compiladas (flat_trees.py) quando o modelo permitir
+USAR_ARVORES_PLANAS = True
+# Diferença máxima aceita entre as árvores compiladas e o predict_proba do estimador
+TOLERANCIA_ARVORES_PLANAS = 1e-5
+
+
+def iter_inmet_chunks(filepath, chunksize=CHUNKSIZE):
+    """Blocos de um arquivo filtrado do INMET (Parquet ou CSV), com índice 'Datetime' UTC."""
+    if filepath.endswith('.parquet'):
+        for batch in pq.ParquetFile(filepath).iter_batches(batch_size=chunksize):
+            bloco = batch.to_pandas()
+            if 'Datetime' in bloco.columns:
+                bloco = bloco.set_index('Datetime')
+            yield bloco
+    else:
+        yield from pd.read_csv(filepath, sep=';', index_col='Datetime', parse_dates=['Datetime'],
+                               chunksize=chunksize)
+
+
+def stream_hourly_features(arquivos, chunksize=CHUNKSIZE):
+    """Gera DataFrames horários (mesmas features do treino) bloco a bloco."""
+    pendente = None
+    ultima_hora = None
+
+    def emitir(df):
+        nonlocal ultima_hora
+        if df.empty:
+            return None
+        horario = hourly_weather(df)
+        if ultima_hora is not None:
+            horario = horario[horario.index > ultima_hora]
+        if horario.empty:
+            return None
+        ultima_hora = horario.index.max()
+        return horario
+
+    for arquivo in arquivos:
+        for bloco in iter_inmet_chunks(arquivo, chunksize):
+            bloco = bloco.astype('float32')
+            if pendente is not None:
+                bloco = pd.concat([pendente, bloco])
+            horas = bloco.index.floor('h')
+            corte = horas.max()
+            if pd.isna(corte):
+                continue
+            # A última hora do bloco pode continuar no bloco seguinte
+            pendente = bloco[horas == corte]
+            horario = emitir(bloco[horas < corte])
+            if horario is not None:
+                yield horario
+
+    if pendente is not None:
+        horario = emitir(pendente)
+        if horario is not None:
+            yield horario
+
+
+def schema_previsoes(metadados):
+    return pa.schema(
+        [('Datetime', pa.timestamp('ns', tz='UTC')), ('probabilidade', pa.float32()), ('previsao', pa.int8())],
+        metadata={
+            'cidade': metadados['cidade'],
+            'modelo': metadados['modelo'],
+            'limiar': str(metadados['limiar']),
+            'versao_preprocessamento': metadados['versao_preprocessamento']
+        }
+    )
+
+
+def flat_matches_estimator(modelo_plano, estimator, X, tolerancia=TOLERANCIA_ARVORES_PLANAS):
+    """True se as árvores compiladas reproduzem o predict_proba do estimador em X (DataFrame)."""
+    esperado = estimator.predict_proba(X)[:, 1]
+    obtido = flat_trees.predict_proba_flat(modelo_plano, X.to_numpy('float32'))[:, 1]
+    return bool(np.allclose(obtido, esperado, rtol=0, atol=tolerancia))
+
+
+def predict(estimator, metadados, arquivos, saida, chunksize=CHUNKSIZE, vizinhas=None, modelo_plano=None):
+    """
+    Pontua os arquivos com o modelo e grava Datetime/probabilidade/previsao em 'saida'.
+    'vizinhas' são as features das estações vizinhas da cidade (get_neighbour_features).
+    'modelo_plano' (model_store.load_or_build_flat_model) pontua no lugar do estimador,
+    depois de conferido no primeiro bloco.
+    Retorna o número de horas pontuadas, ou None se o modelo for incompatível.
+    """
+    versao = preprocessing_version()
+    if metadados.get('versao_preprocessamento') != versao:
+        print(f"  ERRO: Modelo treinado com outro pré-processamento "
+              f"({metadados.get('versao_preprocessamento')} != {versao}). Re-treine com app_treinamento.py.")
+        return None
+
+    limiar = metadados.get('limiar', 0.5)
+    schema = schema_previsoes(metadados)
+    os.makedirs(os.path.dirname(saida) or '.', exist_ok=True)
+    temporario = saida + '.tmp'
+    estado = weather_features.new_stream_state() if USAR_FEATURES_DERIVADAS else None
+    total = 0
+    with pq.ParquetWriter(temporario, schema) as writer:
+        for horario in stream_hourly_features(arquivos, chunksize):
+            if estado is not None:
+                horario = weather_features.stream_features(estado, horario)
+            horario = join_neighbour_features(horario, vizinhas)
+            X = horario[metadados['features']]
+            if modelo_plano is not None and total == 0 and not flat_matches_estimator(modelo_plano, estimator, X):
+                print("  AVISO: Árvores compiladas divergem do estimador; pontuando com o estimador.")
+                modelo_plano = None
+            if modelo_plano is not None:
+                probabilidade = flat_trees.predict_proba_flat(modelo_plano, X.to_numpy('float32'))[:, 1]
+            else:
+                probabilidade = estimator.predict_proba(X)[:, 1]
+            tabela = pa.table({
+                'Datetime': horario.index.as_unit('ns'),
+                'probabilidade': probabilidade.astype('float32'),
+                'previsao': (probabilidade >= limiar).astype('int8')
+            }, schema=schema)
+            writer.write_table(tabela)
+            total += len(horario)
+    os.replace(temporario, saida)
+    return total
+
+
+def city_inmet_files(cidade_arquivo_nome, anos=ANOS_PONTUACAO):
+    arquivos = []
+    for ano in anos:
+        filepath = resolve_filtered_file(os.path.join(INMET_DIR, str(ano), cidade_arquivo_nome))
+        if filepath:
+            arquivos.append(filepath)
+    return arquivos
+
+
+def main(model_keys=None):
+    models = get_models(model_keys)
+    estado_vizinhas = {}
+    for cidade, cidade_arquivo_nome in city_config().items():
+        arquivos = city_inmet_files(cidade_arquivo_nome)
+        if not arquivos:
+            print(f"[Previsão] AVISO: Nenhum arquivo do INMET para {cidade}. Pulando.")
+            continue
+        vizinhas = get_neighbour_features(estado_vizinhas, cidade) if FEATURES_VIZINHAS else None
+        for key, spec in models:
+            carregado = model_store.load_model(cidade, spec['sufixo'])
+            if carregado is None:
+                print(f"[Previsão] AVISO: Nenhum modelo salvo para {cidade} / {spec['nome']}. Pulando.")
+                continue
+            estimator, metadados = carregado
+            modelo_plano = (model_store.load_or_build_flat_model(cidade, spec['sufixo'], estimator, metadados)
+                            if USAR_ARVORES_PLANAS else None)
+            saida = os.path.join(PREVISOES_DIR, f"previsoes_{safe_city_name(cidade)}_{spec['sufixo']}.parquet")
+            print(f"[Previsão] {cidade} / {spec['nome']}: pontuando {len(arquivos)} arquivo(s)...")
+            total = predict(estimator, metadados, arquivos, saida, vizinhas=vizinhas, modelo_plano=modelo_plano)
+            if total is not None:
+                print(f"[SUCESSO] {total} horas pontuadas em: {saida}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:] or None)
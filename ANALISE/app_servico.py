@@ -0,0 +1,305 @@
+"""
+Serviço HTTP local de pontuação de risco de interrupção (apenas biblioteca padrão + modelos salvos).
+
+Os modelos de todas as cidades (model_store.py) são carregados uma única vez
+na inicialização. Cada observação horária do INMET (ou lote de observações)
+chega por POST e entra na fila do seu modelo; um coletor por modelo junta os
+pedidos que chegam dentro de JANELA_LOTE_MS (até MAX_LOTE linhas) e faz UMA
+chamada vetorizada de predict_proba para todos, em uma thread, sem bloquear o
+loop do asyncio.
+
+Com USAR_ARVORES_PLANAS, Random Forest e XGBoost são pontuados pela versão
+compilada em arrays NumPy (flat_trees.py), aberta por memory-map: em lotes
+pequenos como os do serviço ela evita o custo fixo por árvore do sklearn e os
+processos do serviço compartilham o mesmo arquivo em vez de uma cópia do modelo.
+
+Endpoints:
+  POST /prever    {"cidade": "Passo Fundo", "modelo": "xgboost" (opcional),
+                   "observacoes": [{"Temp. Ins. (C)": 21.3, ...}, ...]}
+                  (ou "observacao": {...} para uma única hora)
+                  Com "Datetime" (ISO, UTC) em todas as observações, basta enviar as
+                  features do INMET (mais as "<feature> vizinhas", se usadas): as derivadas
+                  (janelas móveis) são calculadas pelo modo incremental, continuando
+                  as horas já recebidas da cidade.
+  GET  /metricas  latências p50/p99 (ms), pedidos atendidos e tamanho médio dos lotes
+  GET  /saude     modelos carregados
+
+Uso: python app_servico.py [porta]
+"""
+import sys
+import json
+import time
+import asyncio
+from collections import deque
+import numpy as np
+import pandas as pd
+from data_pipeline import city_config, FEATURES, FEATURES_VIZINHAS, USAR_FEATURES_DERIVADAS, preprocessing_version
+from model_registry import get_models
+import model_store
+import flat_trees
+import weather_features
+
+# --- CONFIGURAÇÕES ---
+
+HOST = '127.0.0.1'
+PORTA = 8080
+# Tempo máximo que um pedido espera por outros para formar um lote
+JANELA_LOTE_MS = 2
+MAX_LOTE = 4096
+# Latências guardadas para os percentis (últimos N pedidos)
+JANELA_LATENCIAS = 10_000
+# Pontua com as árvores compiladas (flat_trees.py) quando o modelo permitir
+USAR_ARVORES_PLANAS = True
+
+STATUS_HTTP = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 500: 'Internal Server Error'}
+
+
+def load_models(model_keys=None, usar_arvores_planas=USAR_ARVORES_PLANAS):
+    """
+    {(cidade, sufixo): (modelo, metadados)} de todos os modelos salvos e compatíveis.
+    'modelo' é o estimador ou, com usar_arvores_planas, o modelo compilado de flat_trees.
+    """
+    modelos = {}
+    versao = preprocessing_version()
+    for cidade in city_config():
+        for _, spec in get_models(model_keys):
+            carregado = model_store.load_model(cidade, spec['sufixo'])
+            if carregado is None:
+                continue
+            estimator, metadados = carregado
+            if metadados.get('versao_preprocessamento') != versao:
+                print(f"[Serviço] AVISO: {cidade} / {spec['nome']} ignorado (outro pré-processamento).")
+                continue
+            modelo_plano = (model_store.load_or_build_flat_model(cidade, spec['sufixo'], estimator, metadados)
+                            if usar_arvores_planas else None)
+            if modelo_plano is not None:
+                modelos[(cidade, spec['sufixo'])] = (modelo_plano, metadados)
+                print(f"[Serviço] Modelo carregado (árvores compiladas): {cidade} / {spec['sufixo']}")
+                continue
+            # Lotes pequenos: paralelismo interno do estimador só adicionaria overhead
+            if 'n_jobs' in estimator.get_params():
+                estimator.set_params(n_jobs=1)
+            modelos[(cidade, spec['sufixo'])] = (estimator, metadados)
+            print(f"[Serviço] Modelo carregado: {cidade} / {spec['sufixo']}")
+    return modelos
+
+
+def create_service(modelos):
+    return {
+        'modelos': modelos,
+        'filas': {chave: asyncio.Queue() for chave in modelos},
+        # Estado do modo incremental das features derivadas, por cidade
+        'estados': {},
+        'latencias': deque(maxlen=JANELA_LATENCIAS),
+        'pedidos': 0,
+        'lotes': 0,
+        'linhas_em_lotes': 0
+    }
+
+
+def _predict(modelo, metadados, X):
+    if isinstance(modelo, dict):
+        return flat_trees.predict_proba_flat(modelo, X)[:, 1]
+    proba = modelo.predict_proba(pd.DataFrame(X, columns=metadados['features']))[:, 1]
+    return proba
+
+
+async def batch_collector(servico, chave):
+    """Junta os pedidos de um modelo em micro-lotes e pontua cada lote com uma chamada."""
+    modelo, metadados = servico['modelos'][chave]
+    fila = servico['filas'][chave]
+    loop = asyncio.get_running_loop()
+    janela = JANELA_LOTE_MS / 1000
+
+    while True:
+        pedidos = [await fila.get()]
+        linhas = len(pedidos[0]['X'])
+        prazo = loop.time() + janela
+        while linhas < MAX_LOTE:
+            restante = prazo - loop.time()
+            if restante <= 0 and fila.empty():
+                break
+            try:
+                pedido = fila.get_nowait() if not fila.empty() else await asyncio.wait_for(fila.get(), restante)
+            except asyncio.TimeoutError:
+                break
+            pedidos.append(pedido)
+            linhas += len(pedido['X'])
+
+        # Pedidos cancelados (cliente desconectado ou tempo esgotado) não são pontuados
+        pedidos = [p for p in pedidos if not p['futuro'].done()]
+        if not pedidos:
+            continue
+        X = np.vstack([p['X'] for p in pedidos])
+        try:
+            proba = await loop.run_in_executor(None, _predict, modelo, metadados, X)
+        except Exception as e:
+            for p in pedidos:
+                if not p['futuro'].done():
+                    p['futuro'].set_exception(e)
+            continue
+
+        servico['lotes'] += 1
+        servico['linhas_em_lotes'] += len(X)
+        inicio = 0
+        for p in pedidos:
+            fim = inicio + len(p['X'])
+            # O pedido pode ter sido cancelado durante a pontuação do lote
+            if not p['futuro'].done():
+                p['futuro'].set_result(proba[inicio:fim])
+            inicio = fim
+
+
+def parse_observations(corpo, features, estado=None):
+    """
+    Converte 'observacao' ou 'observacoes' em uma matriz float32 na ordem das features.
+    Se todas as observações têm 'Datetime' e há um estado incremental, só as
+    features do INMET (e as das estações vizinhas, se usadas) são exigidas e as
+    derivadas vêm de weather_features.
+    """
+    observacoes = corpo.get('observacoes')
+    if observacoes is None and 'observacao' in corpo:
+        observacoes = [corpo['observacao']]
+    if not observacoes:
+        raise ValueError("Informe 'observacao' ou 'observacoes'.")
+    derivar = estado is not None and all('Datetime' in obs for obs in observacoes)
+    entrada = FEATURES + FEATURES_VIZINHAS if derivar else features
+    faltando = [f for f in entrada if any(f not in obs for obs in observacoes)]
+    if faltando:
+        raise ValueError(f"Features ausentes: {faltando}")
+    X = np.array([[obs[f] for f in entrada] for obs in observacoes], dtype='float32')
+    if not derivar:
+        return X
+    horas = pd.DatetimeIndex(pd.to_datetime([obs['Datetime'] for obs in observacoes], utc=True)).floor('h')
+    horario = weather_features.stream_features(estado, pd.DataFrame(X, columns=entrada, index=horas))
+    return horario[features].to_numpy('float32')
+
+
+async def handle_predict(servico, corpo):
+    cidade = corpo.get('cidade')
+    chaves = [chave for chave in servico['modelos']
+              if chave[0] == cidade and corpo.get('modelo') in (None, chave[1])]
+    if not chaves:
+        return 404, {'erro': f"Nenhum modelo carregado para cidade={cidade!r}, modelo={corpo.get('modelo')!r}"}
+
+    # Todos os modelos carregados têm o mesmo pré-processamento (e as mesmas features)
+    estado = servico['estados'].setdefault(cidade, weather_features.new_stream_state()) if USAR_FEATURES_DERIVADAS else None
+    X = parse_observations(corpo, servico['modelos'][chaves[0]][1]['features'], estado)
+
+    loop = asyncio.get_running_loop()
+    futuros = {}
+    for chave in chaves:
+        futuros[chave] = loop.create_future()
+        await servico['filas'][chave].put({'X': X, 'futuro': futuros[chave]})
+
+    resultados = {}
+    for chave, futuro in futuros.items():
+        proba = await futuro
+        limiar = servico['modelos'][chave][1].get('limiar', 0.5)
+        resultados[chave[1]] = [
+            {'probabilidade': round(float(p), 6), 'previsao': int(p >= limiar)} for p in proba
+        ]
+    return 200, {'cidade': cidade, 'resultados': resultados}
+
+
+def latency_metrics(servico):
+    latencias = np.array(servico['latencias'])
+    return {
+        'pedidos': servico['pedidos'],
+        'lotes': servico['lotes'],
+        'linhas_por_lote': round(servico['linhas_em_lotes'] / servico['lotes'], 2) if servico['lotes'] else 0,
+        'p50_ms': round(float(np.percentile(latencias, 50)), 3) if len(latencias) else None,
+        'p99_ms': round(float(np.percentile(latencias, 99)), 3) if len(latencias) else None
+    }
+
+
+async def route(servico, metodo, caminho, corpo_bruto):
+    if caminho == '/prever':
+        if metodo != 'POST':
+            return 405, {'erro': 'Use POST.'}
+        inicio = time.perf_counter()
+        try:
+            corpo = json.loads(corpo_bruto or b'{}')
+            if not isinstance(corpo, dict):
+                raise ValueError('O corpo deve ser um objeto JSON.')
+            status, resposta = await handle_predict(servico, corpo)
+        except (ValueError, TypeError) as e:
+            return 400, {'erro': str(e)}
+        servico['pedidos'] += 1
+        servico['latencias'].append((time.perf_counter() - inicio) * 1000)
+        return status, resposta
+    if caminho == '/metricas':
+        return 200, latency_metrics(servico)
+    if caminho == '/saude':
+        return 200, {'modelos': [f'{c} / {m}' for c, m in servico['modelos']]}
+    return 404, {'erro': f'Caminho desconhecido: {caminho}'}
+
+
+async def handle_connection(servico, reader, writer):
+    """HTTP/1.1 mínimo com keep-alive: uma requisição por vez na conexão."""
+    try:
+        while True:
+            linha = await reader.readline()
+            if not linha:
+                break
+            try:
+                metodo, caminho, _ = linha.decode('latin-1').split(' ', 2)
+            except ValueError:
+                break
+            cabecalhos = {}
+            while True:
+                cabecalho = await reader.readline()
+                if cabecalho in (b'\r\n', b'\n', b''):
+                    break
+                nome, _, valor = cabecalho.decode('latin-1').partition(':')
+                cabecalhos[nome.strip().lower()] = valor.strip()
+            tamanho = int(cabecalhos.get('content-length', 0))
+            corpo = await reader.readexactly(tamanho) if tamanho else b''
+
+            try:
+                status, resposta = await route(servico, metodo, caminho.split('?', 1)[0], corpo)
+            except Exception as e:
+                status, resposta = 500, {'erro': str(e)}
+
+            dados = json.dumps(resposta, ensure_ascii=False).encode('utf-8')
+            fechar = cabecalhos.get('connection', '').lower() == 'close'
+            writer.write(
+                f"HTTP/1.1 {status} {STATUS_HTTP.get(status, '')}\r\n"
+                f"Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(dados)}\r\n"
+                f"Connection: {'close' if fechar else 'keep-alive'}\r\n\r\n".encode('latin-1') + dados
+            )
+            await writer.drain()
+            if fechar:
+                break
+    except (asyncio.IncompleteReadError, ConnectionResetError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(host=HOST, porta=PORTA, model_keys=None, pronto=None):
+    modelos = load_models(model_keys)
+    if not modelos:
+        print("[Serviço] ERRO: Nenhum modelo salvo encontrado. Execute app_treinamento.py primeiro.")
+        return
+    servico = create_service(modelos)
+    coletores = [asyncio.create_task(batch_collector(servico, chave)) for chave in modelos]
+    server = await asyncio.start_server(lambda r, w: handle_connection(servico, r, w), host, porta)
+    print(f"[Serviço] Ouvindo em http://{host}:{porta} ({len(modelos)} modelos).")
+    if pronto is not None:
+        pronto.set()
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        for coletor in coletores:
+            coletor.cancel()
+
+
+if __name__ == "__main__":
+    porta = int(sys.argv[1]) if len(sys.argv) > 1 else PORTA
+    try:
+        asyncio.run(serve(porta=porta))
+    except KeyboardInterrupt:
+        print("\n[Serviço] Encerrado.")
@@ -0,0 +1,125 @@
+"""
+Driver único de treinamento: monta o dataset e o split treino/teste de cada
+cidade UMA vez e os entrega a todos os modelos registrados em
+model_registry.py, garantindo que os modelos sejam comparados nas mesmas
+amostras sem reprocessar as entradas.
+
+Com USAR_AGENDADOR = True, a busca de hiperparâmetros de todas as cidades e
+modelos é feita por um único pool de processos (scheduler.py); com False,
+cada cidade roda o GridSearchCV em série, como antes. O modo de busca
+(grade completa ou successive halving com orçamento) é scheduler.MODO_BUSCA;
+o halving e os orçamentos só existem no agendador, e o caminho em série
+sempre roda a grade completa.
+
+Uso: python app_treinamento.py [chave_modelo ...]   (padrão: todos os modelos)
+"""
+import os
+import sys
+import numpy as np
+from data_pipeline import city_config, TARGET, build_city_dataset, split_dataset
+from model_registry import get_models
+from training import (
+    train_and_evaluate_model, write_single_class_report, select_threshold, evaluate_model, write_report,
+    persist_model
+)
+import scheduler
+
+# Busca global (cidade × modelo × hiperparâmetros × fold) em um único pool de processos
+USAR_AGENDADOR = True
+
+
+def main(model_keys=None, usar_agendador=USAR_AGENDADOR):
+    """Orquestra o pipeline de carregamento e treinamento para todas as cidades e modelos."""
+    models = get_models(model_keys)
+    print(f"Modelos registrados para esta execução: {[key for key, _ in models]}")
+    if not usar_agendador and scheduler.MODO_BUSCA != 'grid':
+        print(f"AVISO: MODO_BUSCA = '{scheduler.MODO_BUSCA}' só vale com o agendador; "
+              f"o treinamento em série usa a grade completa.")
+
+    # Garante que os diretórios de saída existam
+    for _, spec in models:
+        try:
+            os.makedirs(spec['saida_dir'], exist_ok=True)
+            print(f"Diretório de saída verificado: {spec['saida_dir']}")
+        except Exception as e:
+            print(f"ERRO CRÍTICO: Não foi possível criar o diretório de saída {spec['saida_dir']}. Erro: {e}")
+            return
+
+    # Os dados completos da ANEEL são carregados sob demanda e compartilhados entre as cidades
+    aneel_state = {}
+    # Cidades prontas para o agendador: {cidade: (df_processed, split)}
+    cidades_prontas = {}
+
+    for cidade_nome_filtro, cidade_arquivo_nome in city_config().items():
+
+        print(f"\n{'='*70}\nProcessando pipeline para: {cidade_nome_filtro}\n{'='*70}")
+
+        # 1. Dataset horário da cidade (uma vez para todos os modelos)
+        df_processed = build_city_dataset(cidade_nome_filtro, cidade_arquivo_nome, aneel_state)
+        if df_processed is None:
+            continue
+
+        # 2. Verificação de classe única
+        if len(np.unique(df_processed[TARGET])) < 2:
+            for _, spec in models:
+                write_single_class_report(df_processed, cidade_nome_filtro, spec)
+            continue
+
+        # 3. Split treino/teste único, compartilhado por todos os modelos
+        print("  2. Definindo Features e Alvo...")
+        split = split_dataset(df_processed, cidade_nome_filtro)
+        if split is None:
+            continue
+
+        if usar_agendador:
+            cidades_prontas[cidade_nome_filtro] = (df_processed, split)
+            continue
+
+        # 4. Treinar e avaliar cada modelo registrado
+        for _, spec in models:
+            train_and_evaluate_model(df_processed, split, cidade_nome_filtro, spec)
+
+    if cidades_prontas:
+        train_with_scheduler(cidades_prontas, models)
+
+    print(f"\n{'='*70}\nPipeline concluído para todas as cidades.\n{'='*70}")
+
+
+def train_with_scheduler(cidades_prontas, models):
+    """Executa a busca de todas as cidades × modelos no agendador e gera os relatórios."""
+    tarefas = []
+    for cidade, (_, (X_train, _, y_train, _)) in cidades_prontas.items():
+        for key, spec in models:
+            print(f"\n[Treinamento] {spec['nome']} para: {cidade}")
+            tarefas.append({
+                'cidade': cidade,
+                'modelo': key,
+                'estimator': spec['build_estimator'](y_train),
+                'param_grid': spec['param_grid'],
+                'halving': spec.get('halving'),
+                'early_stopping_rounds': spec.get('early_stopping_rounds'),
+                'matriz_quantizada': spec.get('matriz_quantizada', False),
+                'X_train': X_train,
+                'y_train': y_train
+            })
+
+    resultados = scheduler.run_jobs(tarefas)
+
+    # Relatórios por cidade, na ordem de city_config()
+    for cidade, (df_processed, (_, X_test, y_train, y_test)) in cidades_prontas.items():
+        for key, spec in models:
+            busca = resultados.get((cidade, key))
+            if busca is None or busca['best_estimator'] is None:
+                print(f"\n[ERRO] Sem modelo treinado para {cidade} / {spec['nome']}. Relatório não gerado.")
+                continue
+            print(f"\n[Relatório] {spec['nome']} para: {cidade}")
+            print(f"  Melhores Hiperparâmetros encontrados: {busca['best_params']}")
+            print(f"  Melhor F1 na Validação Cruzada (CV): {busca['best_score']:.4f}")
+            select_threshold(busca, y_train)
+            metricas = evaluate_model(busca['best_estimator'], X_test, y_test, busca['limiar']['limiar'])
+            write_report(df_processed, cidade, spec, busca, metricas)
+            persist_model(df_processed, cidade, spec, busca, y_train)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:] or None)
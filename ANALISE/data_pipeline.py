@@ -0,0 +1,568 @@
+"""
+Pipeline de dados compartilhado pelos modelos: carregamento dos arquivos
+filtrados da ANEEL e do INMET, pré-processamento/merge horário por cidade
+(com cache) e divisão treino/teste.
+"""
+import pandas as pd
+import numpy as np
+import os
+import re
+import json
+import hashlib
+import inspect
+from urllib.parse import quote, unquote
+import pyarrow.dataset as ds
+from sklearn.model_selection import train_test_split
+import feature_cache
+import weather_features
+import spatial_index
+from interval_labels import label_hours
+
+# --- 1. CONFIGURAÇÕES GLOBAIS ---
+
+# Defina os diretórios base conforme a estrutura do seu projeto
+ANEEL_DIR = '../ANEEL/Data/Filtrados'
+INMET_DIR = '../INMET/Data/Filtrados'
+# Layout particionado (conjunto=<x>/ano=<y>) gerado pelo ANEEL/app.py com PARTICIONAR = True.
+# Quando existir, cada cidade lê apenas as suas partições.
+ANEEL_PARTICIONADO_DIR = os.path.join(ANEEL_DIR, 'particionado')
+
+# Cache dos DataFrames horários por cidade (chaveado pelo conteúdo das
+# entradas, pela cidade e pelo código de pré-processamento)
+USE_CACHE = True
+CACHE_DIR = 'Data/Cache'
+CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# Anos para processar
+ANOS = list(range(2020, 2024))
+
+# Mapeia o nome do filtro (ANEEL) para o nome do arquivo (INMET). Vale só sem os
+# arquivos de coordenadas; com eles, city_config() gera o mapeamento
+CIDADES_CONFIG = {
+    'Lagoa Vermelha': 'LagoaVermelha_filtrado.csv',
+    'Passo Fundo': 'PassoFundo_filtrado.csv',
+    'Santa Maria': 'SantaMaria_filtrado.csv'
+}
+
+# Mapeamento espacial (spatial_index.py): com os arquivos de coordenadas das
+# estações do INMET e dos conjuntos da ANEEL, cada conjunto usa a estação mais
+# próxima e o mapeamento cidade → arquivo (city_config) é gerado para todos os
+# conjuntos com coordenadas. As coordenadas são lidas na primeira chamada de
+# get_neighbours, não na importação do módulo
+USAR_MAPEAMENTO_ESPACIAL = True
+
+# Features a serem usadas do INMET
+# (INMET/app.py já entrega as medições em float32 com índice 'Datetime' UTC)
+FEATURES = [
+    'Temp. Ins. (C)', 'Vel. Vento (m/s)', 'Raj. Vento (m/s)',
+    'Pressao Ins. (hPa)', 'Chuva (mm)'
+]
+# Features derivadas (weather_features.py): janelas móveis de chuva, vento,
+# temperatura e pressão e codificação da hora do dia e da estação do ano
+USAR_FEATURES_DERIVADAS = True
+# Medições das estações vizinhas de cada conjunto, ponderadas pelo inverso da
+# distância (requer o mapeamento espacial e os arquivos filtrados das vizinhas).
+# No RS as estações automáticas ficam a 60-100 km umas das outras, então poucos
+# conjuntos têm vizinha dentro de spatial_index.RAIO_MAX_KM: ligar só com uma
+# rede mais densa ou um raio maior
+USAR_FEATURES_VIZINHAS = False
+FEATURES_VIZINHAS = [f'{col} vizinhas' for col in FEATURES] if USAR_FEATURES_VIZINHAS else []
+# Entradas dos modelos: as features do INMET, as derivadas e as das vizinhas
+MODEL_FEATURES = (FEATURES + (weather_features.derived_feature_names() if USAR_FEATURES_DERIVADAS else [])
+                  + FEATURES_VIZINHAS)
+TARGET = 'interrupcao_real'
+
+# Fuso das datas da ANEEL (horário local), convertidas para UTC no join com o INMET
+FUSO_ANEEL = 'America/Sao_Paulo'
+
+# Interrupções consideradas no alvo: reais, não programadas e de causa ambiental
+MOTIVO_INTERRUPCAO = 0
+TIPO_INTERRUPCAO = 'Não Programada'
+FATO_GERADOR = 'Meio ambiente'
+
+# Rotulagem do alvo: 'intervalo' marca todas as horas entre o início e o fim
+# de cada interrupção; 'inicio' marca só a hora do início (comportamento antigo)
+ROTULAGEM = 'intervalo'
+# Colunas auxiliares por hora (não usadas como features): interrupções
+# simultâneas e consumidores afetados
+COLUNAS_ROTULO = ['n_interrupcoes', 'consumidores_afetados']
+
+# Divisão treino/teste (a mesma para todos os modelos)
+TEST_SIZE = 0.2
+RANDOM_STATE = 42
+
+
+# --- 2. FUNÇÕES DE CARREGAMENTO DE DADOS ---
+
+# Estações mais próximas de cada conjunto, carregadas na primeira chamada de get_neighbours
+_VIZINHAS = {}
+
+
+def get_neighbours():
+    """
+    Estações mais próximas de cada conjunto (spatial_index.load_neighbours),
+    lidas dos arquivos de coordenadas na primeira chamada. None sem o
+    mapeamento espacial ou sem os arquivos.
+    """
+    if 'vizinhas' not in _VIZINHAS:
+        _VIZINHAS['vizinhas'] = spatial_index.load_neighbours() if USAR_MAPEAMENTO_ESPACIAL else None
+    return _VIZINHAS['vizinhas']
+
+
+def city_config():
+    """
+    {conjunto (filtro da ANEEL): arquivo filtrado do INMET}: a estação mais
+    próxima de cada conjunto com coordenadas, ou CIDADES_CONFIG sem elas.
+    """
+    vizinhas = get_neighbours()
+    return CIDADES_CONFIG if vizinhas is None else spatial_index.station_mapping(vizinhas)
+
+
+def resolve_filtered_file(filepath):
+    """Caminho efetivamente lido para um arquivo filtrado (o .parquet, se existir), ou None."""
+    filepath_parquet = os.path.splitext(filepath)[0] + '.parquet'
+    if os.path.exists(filepath_parquet):
+        return filepath_parquet
+    return filepath if os.path.exists(filepath) else None
+
+
+def read_filtered_file(filepath, **read_csv_kwargs):
+    """
+    Lê um arquivo filtrado, preferindo a versão Parquet (já tipada) quando
+    ela existir ao lado do CSV.
+    """
+    filepath_resolvido = resolve_filtered_file(filepath)
+    if filepath_resolvido is not None and filepath_resolvido.endswith('.parquet'):
+        return pd.read_parquet(filepath_resolvido)
+    return pd.read_csv(filepath, **read_csv_kwargs)
+
+
+def load_aneel_data(aneel_dir, anos):
+    """Carrega e concatena todos os arquivos de interrupção da ANEEL."""
+    print(f"[ANEEL] Carregando dados de {anos[0]} a {anos[-1]}...")
+    all_interruptions = []
+    for ano in anos:
+        filename = f'interrupcoes_rge_sul_filtrado_{ano}.csv'
+        filepath = os.path.join(aneel_dir, filename)
+        try:
+            df_int = read_filtered_file(filepath, sep=';', decimal=',', low_memory=False)
+            df_int['AnoFonte'] = ano  # Adiciona coluna para referência
+            all_interruptions.append(df_int)
+            print(f"  - Carregado: {filename} ({len(df_int)} registros)")
+        except FileNotFoundError:
+            print(f"  - AVISO: Arquivo não encontrado: {filepath}. Pulando.")
+        except Exception as e:
+            print(f"  - ERRO ao ler {filepath}: {e}. Pulando.")
+
+    if not all_interruptions:
+        print("[ANEEL] ERRO CRÍTICO: Nenhum arquivo da ANEEL foi carregado.")
+        return None
+
+    df_full = pd.concat(all_interruptions, ignore_index=True)
+    print(f"[ANEEL] Total de {len(df_full)} registros de interrupção carregados.\n")
+    return df_full
+
+
+def load_inmet_data_for_city(inmet_dir, anos, cidade_arquivo_nome):
+    """Carrega e concatena todos os dados do INMET para UMA cidade."""
+    print(f"[INMET] Carregando dados para '{cidade_arquivo_nome}' de {anos[0]} a {anos[-1]}...")
+    all_meteo = []
+    for ano in anos:
+        # Estrutura: ../INMET/Data/Filtrados/2020/LagoaVermelha_filtrado.csv
+        filepath = os.path.join(inmet_dir, str(ano), cidade_arquivo_nome)
+        try:
+            df_meteo = read_filtered_file(filepath, sep=';', index_col='Datetime', parse_dates=['Datetime'])
+            df_meteo = df_meteo.astype('float32')
+            df_meteo['AnoFonte'] = ano
+            all_meteo.append(df_meteo)
+            print(f"  - Carregado: {filepath} ({len(df_meteo)} registros)")
+        except FileNotFoundError:
+            print(f"  - AVISO: Arquivo não encontrado: {filepath}. Pulando.")
+        except Exception as e:
+            print(f"  - ERRO ao ler {filepath}: {e}. Pulando.")
+
+    if not all_meteo:
+        print(f"[INMET] ERRO CRÍTICO: Nenhum arquivo do INMET foi carregado para {cidade_arquivo_nome}.")
+        return None
+
+    df_full = pd.concat(all_meteo)  # Mantém o índice Datetime
+    print(f"[INMET] Total de {len(df_full)} registros meteorológicos carregados para {cidade_arquivo_nome}.\n")
+    return df_full
+
+
+def list_aneel_conjuntos(particionado_dir):
+    """Lista os conjuntos disponíveis no layout particionado (nomes das pastas conjunto=<x>)."""
+    return sorted(
+        unquote(pasta.split('=', 1)[1])
+        for pasta in os.listdir(particionado_dir)
+        if pasta.startswith('conjunto=')
+    )
+
+
+def load_aneel_partitions(particionado_dir, anos, conjuntos=None):
+    """
+    Carrega as interrupções do layout particionado aplicando os predicados de
+    ano e conjunto sobre as pastas (só as partições que casam são abertas).
+    conjuntos=None lê todos os conjuntos.
+    """
+    dataset = ds.dataset(particionado_dir, format='parquet', partitioning='hive')
+    filtro = ds.field('ano').isin(list(anos))
+    if conjuntos is not None:
+        filtro = filtro & ds.field('conjunto').isin(list(conjuntos))
+    df = dataset.to_table(filter=filtro).to_pandas()
+    df = df.rename(columns={'ano': 'AnoFonte'}).drop(columns=['conjunto'])
+    print(f"[ANEEL] {len(df)} registros carregados das partições {conjuntos if conjuntos is not None else '(todas)'}.")
+    return df
+
+
+def build_city_regex(cidade_nome_filtro):
+    """Regex usada para associar o nome da cidade aos conjuntos da ANEEL."""
+    return r'\b' + pd.Series(cidade_nome_filtro).str.replace(r'[^\w\s]', '', regex=True)[0] + r'\b'
+
+
+def city_conjuntos(particionado_dir, cidade_nome_filtro):
+    """Conjuntos do layout particionado que correspondem à cidade."""
+    cidade_regex = build_city_regex(cidade_nome_filtro)
+    return [
+        conjunto for conjunto in list_aneel_conjuntos(particionado_dir)
+        if re.search(cidade_regex, conjunto, flags=re.IGNORECASE)
+    ]
+
+
+def load_aneel_data_for_city(particionado_dir, anos, cidade_nome_filtro):
+    """Carrega apenas as partições dos conjuntos que correspondem à cidade."""
+    return load_aneel_partitions(particionado_dir, anos, city_conjuntos(particionado_dir, cidade_nome_filtro))
+
+
+def aneel_to_utc(datas):
+    """As datas da ANEEL estão no horário local: converte para UTC, como o índice do INMET."""
+    return (
+        pd.to_datetime(datas, errors='coerce')
+        .dt.tz_localize(FUSO_ANEEL, ambiguous='NaT', nonexistent='shift_forward')
+        .dt.tz_convert('UTC')
+        .reset_index(drop=True)
+    )
+
+
+def filter_real_interruptions(df_aneel):
+    """
+    Aplica os filtros de causa/tipo do alvo (motivo, tipo não programado e
+    fato gerador ambiental) e converte início e fim da interrupção para UTC.
+    Arquivos filtrados antigos, sem DatFimInterrupcao/NumUnidadeConsumidora,
+    resultam em fim NaT (só a hora do início) e zero consumidores.
+    """
+    mascara = (
+        (df_aneel['IdeMotivoInterrupcao'] == MOTIVO_INTERRUPCAO) &
+        (df_aneel['DscTipoInterrupcao'] == TIPO_INTERRUPCAO) &
+        (df_aneel['DscFatoGeradorInterrupcao'].str.contains(FATO_GERADOR, na=False, case=False))
+    ).to_numpy(dtype=bool)
+    df_reais = df_aneel.loc[mascara]
+
+    fim = df_reais['DatFimInterrupcao'] if 'DatFimInterrupcao' in df_reais else pd.Series(pd.NaT, index=df_reais.index)
+    consumidores = (
+        pd.to_numeric(df_reais['NumUnidadeConsumidora'], errors='coerce')
+        if 'NumUnidadeConsumidora' in df_reais else pd.Series(0.0, index=df_reais.index)
+    )
+    return pd.DataFrame({
+        'DscConjuntoUnidadeConsumidora': df_reais['DscConjuntoUnidadeConsumidora'].reset_index(drop=True),
+        'DatetimeInicio': aneel_to_utc(df_reais['DatInicioInterrupcao']),
+        'DatetimeFim': aneel_to_utc(fim),
+        'NumUnidadeConsumidora': consumidores.fillna(0).reset_index(drop=True)
+    }).dropna(subset=['DatetimeInicio'])
+
+
+def build_aneel_city_index(df_aneel_raw, cidades):
+    """
+    Indexa as interrupções da ANEEL por cidade em uma única passada.
+
+    Os filtros de causa/tipo e a conversão de datas são aplicados uma vez ao
+    frame inteiro. Os nomes de conjunto são fatorados e cada nome ÚNICO é
+    comparado com a regex de cada cidade (custo proporcional ao número de
+    conjuntos, não de eventos). Os eventos são então reordenados por cidade em
+    uma única tabela, e cada cidade recebe um slice contíguo dela (sem cópia).
+
+    Retorna {cidade: DataFrame com DscConjuntoUnidadeConsumidora, DatetimeInicio,
+    DatetimeFim (UTC) e NumUnidadeConsumidora}.
+    """
+    df_reais = filter_real_interruptions(df_aneel_raw)
+
+    codigos, conjuntos = pd.factorize(df_reais['DscConjuntoUnidadeConsumidora'])
+    conjuntos = pd.Index(conjuntos).astype(str).str.strip()
+    # Matriz conjunto × cidade (+1 linha para conjunto nulo, código -1)
+    correspondencia = np.zeros((len(conjuntos) + 1, len(cidades)), dtype=bool)
+    for j, cidade in enumerate(cidades):
+        correspondencia[:-1, j] = conjuntos.str.contains(build_city_regex(cidade), case=False, regex=True)
+
+    linhas_por_cidade = [np.flatnonzero(correspondencia[codigos, j]) for j in range(len(cidades))]
+    limites = np.concatenate([[0], np.cumsum([len(linhas) for linhas in linhas_por_cidade])])
+    tabela = df_reais.iloc[np.concatenate(linhas_por_cidade)] if len(cidades) else df_reais.iloc[:0]
+
+    indice = {cidade: tabela.iloc[limites[j]:limites[j + 1]] for j, cidade in enumerate(cidades)}
+    print(f"[ANEEL] Índice por cidade: {len(df_reais)} interrupções reais, "
+          f"{len(conjuntos)} conjuntos, " + ", ".join(f"{c}: {len(t)}" for c, t in indice.items()))
+    return indice
+
+
+def list_city_input_files(cidade_nome_filtro, cidade_arquivo_nome, usar_particoes):
+    """Arquivos filtrados (INMET e ANEEL) que alimentam o DataFrame de uma cidade."""
+    arquivos = []
+    for ano in ANOS:
+        filepath = resolve_filtered_file(os.path.join(INMET_DIR, str(ano), cidade_arquivo_nome))
+        if filepath:
+            arquivos.append(filepath)
+    if usar_particoes:
+        for conjunto in city_conjuntos(ANEEL_PARTICIONADO_DIR, cidade_nome_filtro):
+            for ano in ANOS:
+                pasta = os.path.join(ANEEL_PARTICIONADO_DIR, f'conjunto={quote(conjunto, safe="")}', f'ano={ano}')
+                if os.path.isdir(pasta):
+                    arquivos.extend(os.path.join(pasta, nome) for nome in sorted(os.listdir(pasta)))
+    else:
+        for ano in ANOS:
+            filepath = resolve_filtered_file(os.path.join(ANEEL_DIR, f'interrupcoes_rge_sul_filtrado_{ano}.csv'))
+            if filepath:
+                arquivos.append(filepath)
+    if FEATURES_VIZINHAS:
+        # Medições das estações vizinhas que entram nas features IDW
+        vizinhas = spatial_index.neighbour_stations(get_neighbours())
+        vizinhas = vizinhas[vizinhas['Conjunto'] == cidade_nome_filtro]
+        for arquivo in vizinhas['Arquivo']:
+            for ano in ANOS:
+                filepath = resolve_filtered_file(os.path.join(INMET_DIR, str(ano), arquivo))
+                if filepath:
+                    arquivos.append(filepath)
+    return arquivos
+
+
+# --- 3. FUNÇÃO DE PRÉ-PROCESSAMENTO E MERGE ---
+
+def hourly_weather(df_clima_raw):
+    """
+    Features horárias do INMET (usado no treino e na pontuação em streaming).
+    Os dados já chegam normalizados da ingestão (INMET/app.py): índice
+    'Datetime' em UTC e medições em float32, sem conversão de strings aqui.
+    """
+    cols_presentes = [col for col in FEATURES if col in df_clima_raw.columns]
+
+    # Remove linhas onde as features essenciais são nulas
+    df_clima = df_clima_raw.dropna(subset=cols_presentes)
+    df_clima = df_clima[df_clima.index.notna()]
+    df_clima = df_clima[~df_clima.index.duplicated(keep='first')].sort_index() # Garante unicidade
+
+    # Agrupar dados por hora (resample) para garantir 1 registro/hora
+    # Usa a média se houver múltiplos registros na mesma hora (raro)
+    df_clima_hourly = df_clima[cols_presentes].resample('h').mean()
+    # Remove horas que não tinham dados (resultam em NaN após resample)
+    return df_clima_hourly.dropna(subset=FEATURES)
+
+
+def join_neighbour_features(df_clima_hourly, df_vizinhas):
+    """Acrescenta FEATURES_VIZINHAS (NaN nas horas sem vizinha medida ou com df_vizinhas=None)."""
+    if not FEATURES_VIZINHAS:
+        return df_clima_hourly
+    if df_vizinhas is None:
+        df_vizinhas = pd.DataFrame(columns=FEATURES_VIZINHAS, dtype='float32')
+    return df_clima_hourly.join(df_vizinhas[FEATURES_VIZINHAS].reindex(df_clima_hourly.index))
+
+
+def model_features(df_clima_hourly, df_vizinhas=None):
+    """Acrescenta ao DataFrame horário as features derivadas (em lote) e as das vizinhas, se habilitadas."""
+    if USAR_FEATURES_DERIVADAS:
+        df_clima_hourly = weather_features.window_features(df_clima_hourly)
+    return join_neighbour_features(df_clima_hourly, df_vizinhas)
+
+
+def get_neighbour_features(estado, cidade_nome_filtro):
+    """
+    Features IDW das estações vizinhas de uma cidade/conjunto (horas × FEATURES_VIZINHAS).
+    Na primeira chamada, carrega as medições horárias de todas as estações que
+    são vizinhas de algum conjunto e calcula as features de todos os conjuntos
+    de uma vez (spatial_index.idw_features); as chamadas seguintes reaproveitam
+    o resultado guardado em 'estado'.
+    """
+    if 'vizinhas' not in estado:
+        if get_neighbours() is None:
+            return None
+        candidatas = spatial_index.neighbour_stations(get_neighbours())
+        medicoes = {}
+        for estacao, arquivo in dict(zip(candidatas['Estacao'], candidatas['Arquivo'])).items():
+            df_clima_raw = load_inmet_data_for_city(INMET_DIR, ANOS, arquivo)
+            if df_clima_raw is not None:
+                medicoes[estacao] = hourly_weather(df_clima_raw)
+        estado['vizinhas'] = spatial_index.idw_features(spatial_index.idw_weights(get_neighbours()), medicoes, FEATURES)
+    return estado['vizinhas'].get(cidade_nome_filtro)
+
+
+def preprocessing_version():
+    """
+    Hash do pré-processamento das features (código de hourly_weather, de
+    weather_features.py e de spatial_index.py, coordenadas usadas nas vizinhas e
+    lista de MODEL_FEATURES). Salvo com cada modelo; a pontuação recusa modelos
+    treinados com outra versão.
+    """
+    conteudo = (inspect.getsource(hourly_weather) + inspect.getsource(weather_features)
+                + json.dumps(MODEL_FEATURES))
+    if FEATURES_VIZINHAS and get_neighbours() is not None:
+        conteudo += inspect.getsource(spatial_index) + get_neighbours().to_json()
+    return hashlib.sha256(conteudo.encode('utf-8')).hexdigest()[:16]
+
+
+def preprocess_and_merge_data(df_clima_raw, df_eventos_cidade, cidade_nome_filtro, df_vizinhas=None):
+    """
+    Limpa, processa e une os dados meteorológicos e de interrupção
+    para uma cidade específica. df_eventos_cidade é o slice da cidade no
+    índice de build_aneel_city_index (já filtrado e com datas em UTC);
+    df_vizinhas são as features das estações vizinhas (get_neighbour_features).
+    """
+    print(f"[Processamento] Iniciando pipeline para: {cidade_nome_filtro}")
+
+    # --- 4.1. Processamento INMET (Clima) ---
+    df_clima_hourly = model_features(hourly_weather(df_clima_raw), df_vizinhas)
+
+    print(f"[Processamento] Dados INMET limpos. {len(df_clima_hourly)} registros/hora válidos.")
+
+
+    # --- 4.2. Processamento ANEEL (Interrupções) ---
+    if df_eventos_cidade is None or df_eventos_cidade.empty:
+        print(f"[Processamento] AVISO: Nenhuma interrupção (Não Programada, Meio Ambiente) encontrada para '{cidade_nome_filtro}'.")
+        df_clima_hourly[TARGET] = 0
+        df_clima_hourly[COLUNAS_ROTULO[0]] = np.zeros(len(df_clima_hourly), dtype='int32')
+        df_clima_hourly[COLUNAS_ROTULO[1]] = np.zeros(len(df_clima_hourly), dtype='int64')
+        return df_clima_hourly[MODEL_FEATURES + [TARGET] + COLUNAS_ROTULO]
+
+    # --- 4.3. Merge e Criação da Variável Alvo ---
+    df_final = df_clima_hourly.copy()
+
+    # Junção vetorizada eventos × horas: no modo 'intervalo' cada interrupção
+    # marca todas as horas entre início e fim; no modo 'inicio', só a hora do início
+    n_eventos, n_consumidores = label_hours(
+        df_final.index,
+        df_eventos_cidade['DatetimeInicio'],
+        df_eventos_cidade['DatetimeFim'] if ROTULAGEM == 'intervalo' else None,
+        df_eventos_cidade['NumUnidadeConsumidora']
+    )
+    df_final[COLUNAS_ROTULO[0]] = n_eventos
+    df_final[COLUNAS_ROTULO[1]] = n_consumidores
+
+    # Variável Alvo: 1 se alguma interrupção real estava ativa na hora, 0 caso contrário
+    df_final[TARGET] = (n_eventos > 0).astype(int)
+
+    print(f"[Processamento] {len(df_eventos_cidade)} interrupções reais (Não Prog, Ambiental) rotuladas por '{ROTULAGEM}'.")
+
+    print(f"Dados prontos. Total de amostras: {len(df_final)}")
+    target_count = df_final[TARGET].sum()
+    if len(df_final) > 0:
+        print(f"Total de eventos de interrupção real: {target_count} ({target_count / len(df_final) * 100:.2f}%)")
+    
+    # Garante que só temos as colunas necessárias
+    return df_final[MODEL_FEATURES + [TARGET] + COLUNAS_ROTULO]
+
+
+# --- 4. MONTAGEM DO DATASET POR CIDADE E DIVISÃO TREINO/TESTE ---
+
+def get_aneel_data(aneel_state):
+    """
+    Carrega o DataFrame completo da ANEEL na primeira chamada e o reaproveita
+    nas seguintes (aneel_state é um dicionário compartilhado entre as cidades).
+    """
+    if 'df' not in aneel_state:
+        aneel_state['df'] = load_aneel_data(ANEEL_DIR, ANOS)
+    return aneel_state['df']
+
+
+def get_city_events(aneel_state, cidade_nome_filtro):
+    """
+    Eventos (já filtrados) da cidade a partir do índice por cidade, construído
+    uma única vez para todas as cidades de city_config(). Retorna None se os
+    dados da ANEEL não puderem ser carregados.
+    """
+    indice = aneel_state.setdefault('indice', {})
+    if cidade_nome_filtro not in indice:
+        df_aneel_raw = get_aneel_data(aneel_state)
+        if df_aneel_raw is None:
+            return None
+        cidades = [c for c in dict.fromkeys(list(city_config()) + [cidade_nome_filtro]) if c not in indice]
+        indice.update(build_aneel_city_index(df_aneel_raw, cidades))
+    return indice[cidade_nome_filtro]
+
+
+def build_city_dataset(cidade_nome_filtro, cidade_arquivo_nome, aneel_state):
+    """
+    Retorna o DataFrame horário (MODEL_FEATURES + TARGET) de uma cidade, do cache
+    quando possível. Os dados da ANEEL só são lidos se houver cache miss; no
+    layout particionado, apenas a fatia da cidade é lida.
+    """
+    usar_particoes = os.path.isdir(ANEEL_PARTICIONADO_DIR)
+
+    if USE_CACHE:
+        cache_key = feature_cache.build_cache_key(
+            CACHE_DIR,
+            list_city_input_files(cidade_nome_filtro, cidade_arquivo_nome, usar_particoes),
+            cidade_nome_filtro,
+            [preprocess_and_merge_data, hourly_weather, model_features, join_neighbour_features,
+             get_neighbour_features, build_city_regex, filter_real_interruptions, build_aneel_city_index,
+             aneel_to_utc, label_hours, weather_features.window_features, weather_features.time_encodings,
+             spatial_index.idw_weights, spatial_index.idw_features],
+            {'features': MODEL_FEATURES, 'target': TARGET, 'fuso_aneel': FUSO_ANEEL, 'anos': ANOS,
+             'rotulagem': ROTULAGEM, 'janelas': weather_features.JANELAS_HORAS,
+             'operacoes_janela': weather_features.OPERACOES_JANELA,
+             'vizinhas': get_neighbours().to_dict('records') if FEATURES_VIZINHAS and get_neighbours() is not None else None,
+             'idw': [spatial_index.POTENCIA_IDW, spatial_index.RAIO_MAX_KM, spatial_index.DISTANCIA_MINIMA_KM]}
+        )
+        df_processed = feature_cache.load_cached_frame(CACHE_DIR, cache_key)
+        if df_processed is not None:
+            print(f"[Cache] Dados de {cidade_nome_filtro} carregados do cache ({len(df_processed)} amostras).")
+            return df_processed
+
+    # Carregar dados INMET para esta cidade
+    df_clima_raw = load_inmet_data_for_city(INMET_DIR, ANOS, cidade_arquivo_nome)
+    if df_clima_raw is None:
+        print(f"Pulando {cidade_nome_filtro} por falta de dados INMET.")
+        return None
+
+    # Processar e unir os dados
+    if usar_particoes:
+        df_aneel_cidade = load_aneel_data_for_city(ANEEL_PARTICIONADO_DIR, ANOS, cidade_nome_filtro)
+        df_eventos = build_aneel_city_index(df_aneel_cidade, [cidade_nome_filtro])[cidade_nome_filtro]
+    else:
+        df_eventos = get_city_events(aneel_state, cidade_nome_filtro)
+        if df_eventos is None:
+            print(f"Pulando {cidade_nome_filtro} pois dados da ANEEL não foram carregados.")
+            return None
+    df_vizinhas = get_neighbour_features(aneel_state, cidade_nome_filtro) if FEATURES_VIZINHAS else None
+    df_processed = preprocess_and_merge_data(df_clima_raw, df_eventos, cidade_nome_filtro, df_vizinhas)
+    if df_processed is None or df_processed.empty:
+        print(f"Pulando {cidade_nome_filtro} por falha no pré-processamento.")
+        return None
+
+    if USE_CACHE:
+        feature_cache.save_cached_frame(CACHE_DIR, cache_key, df_processed, CACHE_MAX_BYTES)
+    return df_processed
+
+
+def split_dataset(df_final, cidade_nome):
+    """
+    Divide os dados (80% treino, 20% teste) com estratificação, uma única vez
+    por cidade, para que todos os modelos usem exatamente o mesmo split.
+    Retorna (X_train, X_test, y_train, y_test) ou None se o treino ficar com uma só classe.
+    """
+    X = df_final[MODEL_FEATURES]
+    y = df_final[TARGET]
+
+    try:
+        X_train, X_test, y_train, y_test = train_test_split(
+            X, y, test_size=TEST_SIZE, random_state=RANDOM_STATE, stratify=y
+        )
+    except ValueError:
+        # Fallback se a estratificação falhar (poucas amostras)
+        print("  AVISO: Stratify falhou (poucas amostras de uma classe). Tentando sem stratify.")
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=TEST_SIZE, random_state=RANDOM_STATE)
+
+    # Verifica se o split resultou em apenas uma classe no treino
+    if len(np.unique(y_train)) < 2:
+        print(f"  ERRO: O conjunto de treino para {cidade_nome} só contém uma classe após o split. Abortando GridSearch.")
+        # (Isso pode acontecer se houver < 5 eventos positivos, e o cv=3 falhar)
+        return None
+
+    print(f"  Tamanho do conjunto de treino: {len(X_train)} (Positivos: {y_train.sum()})")
+    print(f"  Tamanho do conjunto de teste: {len(X_test)} (Positivos: {y_test.sum()})")
+    return X_train, X_test, y_train, y_test
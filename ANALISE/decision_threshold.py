@@ -0,0 +1,82 @@
+"""
+Escolha do limiar de decisão a partir das probabilidades out-of-fold (OOF)
+da validação cruzada.
+
+Com ~1% de horas positivas, o limiar padrão de 0,5 descarta boa parte do que
+o modelo separa. threshold_curve ordena as probabilidades OOF uma única vez
+(O(n log n)) e, com a soma acumulada dos positivos, obtém verdadeiros e falsos
+positivos, precisão, recall e F1 de TODOS os limiares candidatos (as
+probabilidades distintas) em uma só passada vetorizada. choose_threshold
+aplica o critério: maior F1, ou maior precisão com recall mínimo.
+
+A previsão é 'probabilidade >= limiar'. O limiar escolhido fica no ponto médio
+entre a probabilidade candidata e a próxima menor, para não depender de
+empates exatos com os valores vistos na validação.
+"""
+import numpy as np
+
+# 'f1' (maior F1) ou 'recall' (maior precisão entre os limiares com recall >= RECALL_MINIMO)
+CRITERIO_LIMIAR = 'f1'
+RECALL_MINIMO = 0.5
+# Usado quando não há probabilidades OOF (ou nenhuma amostra positiva)
+LIMIAR_PADRAO = 0.5
+
+
+def threshold_curve(y_true, proba):
+    """
+    Métricas de todos os limiares candidatos, do maior para o menor.
+    Retorna um dict de arrays: limiar, tp, fp, precisao, recall, f1.
+    """
+    y_true = np.asarray(y_true).astype(bool)
+    proba = np.asarray(proba, dtype='float64')
+    ordem = np.argsort(-proba, kind='stable')
+    p_ordenada = proba[ordem]
+    tp_acumulado = np.cumsum(y_true[ordem])
+
+    # Um candidato por probabilidade distinta: a última posição de cada grupo de empates
+    fim_grupo = np.flatnonzero(np.diff(p_ordenada, append=-np.inf) != 0)
+    tp = tp_acumulado[fim_grupo].astype('float64')
+    previstos = fim_grupo + 1.0
+    fp = previstos - tp
+    positivos = float(y_true.sum())
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        precisao = tp / previstos
+        recall = tp / positivos if positivos else np.zeros_like(tp)
+        f1 = 2 * tp / (previstos + positivos)
+
+    candidatos = p_ordenada[fim_grupo]
+    # Ponto médio até a próxima probabilidade menor (o último candidato fica com ele mesmo)
+    proxima = np.append(candidatos[1:], candidatos[-1:])
+    return {
+        'limiar': (candidatos + proxima) / 2,
+        'tp': tp, 'fp': fp, 'precisao': precisao, 'recall': recall, 'f1': f1
+    }
+
+
+def choose_threshold(y_true, proba, criterio=CRITERIO_LIMIAR, recall_minimo=RECALL_MINIMO):
+    """
+    Limiar escolhido pelas probabilidades OOF. Retorna {'limiar', 'criterio',
+    'f1', 'precisao', 'recall'} (métricas OOF no limiar). Em empates vence o
+    maior limiar. Sem OOF ou sem positivos, usa LIMIAR_PADRAO.
+    """
+    if proba is None or len(proba) == 0 or not np.asarray(y_true).any():
+        return {'limiar': LIMIAR_PADRAO, 'criterio': 'padrao', 'f1': np.nan, 'precisao': np.nan, 'recall': np.nan}
+
+    curva = threshold_curve(y_true, proba)
+    if criterio == 'f1':
+        melhor = int(np.nanargmax(curva['f1']))
+    elif criterio == 'recall':
+        # O recall só cresce com o índice (o último candidato tem recall 1), então sempre há algum
+        atingem = np.flatnonzero(curva['recall'] >= recall_minimo)
+        melhor = int(atingem[np.nanargmax(curva['precisao'][atingem])])
+    else:
+        raise ValueError(f"Critério de limiar desconhecido: {criterio}")
+
+    return {
+        'limiar': float(curva['limiar'][melhor]),
+        'criterio': criterio if criterio == 'f1' else f'recall>={recall_minimo}',
+        'f1': float(curva['f1'][melhor]),
+        'precisao': float(curva['precisao'][melhor]),
+        'recall': float(curva['recall'][melhor])
+    }
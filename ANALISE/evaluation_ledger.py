@@ -0,0 +1,126 @@
+"""
+Registro (ledger) em SQLite das avaliações da busca de hiperparâmetros.
+
+Cada célula da busca (dados de treino × modelo × hiperparâmetros × fold ×
+recurso do halving) é gravada assim que termina, com o F1 de validação, o
+tempo, o best_iteration da parada antecipada e as probabilidades de validação
+(usadas na escolha do limiar). Antes de agendar uma célula, a busca consulta o
+ledger e reaproveita o resultado gravado. Assim:
+  - uma busca interrompida (falha ou Ctrl-C) recomeça de onde parou;
+  - repetir a mesma busca não refaz nenhum fit;
+  - acrescentar um valor à grade custa só as células novas.
+
+A chave dos dados é o hash do conteúdo de X_train/y_train e do número de folds
+(os folds são determinísticos); a do modelo inclui os parâmetros do estimador
+base (exceto n_jobs). Fits que falharam não são gravados e são refeitos na
+próxima execução.
+"""
+import os
+import json
+import hashlib
+import sqlite3
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+LEDGER_PATH = 'Data/Cache/avaliacoes.sqlite'
+# Desative para sempre refazer todas as avaliações
+USAR_LEDGER = True
+# Parâmetros do estimador que não mudam o resultado
+PARAMETROS_IGNORADOS = {'n_jobs', 'verbose', 'verbosity'}
+
+
+def _hash_json(valor):
+    texto = json.dumps(valor, sort_keys=True, default=str)
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+
+
+def dataset_hash(X_train, y_train, n_folds):
+    """Hash do conteúdo (índice, colunas e valores) do treino e do número de folds."""
+    h = hashlib.sha256()
+    h.update(json.dumps([list(map(str, X_train.columns)), int(n_folds)]).encode('utf-8'))
+    h.update(pd.util.hash_pandas_object(X_train, index=True).to_numpy().tobytes())
+    h.update(pd.util.hash_pandas_object(y_train, index=True).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def estimator_hash(estimator):
+    """Hash da classe e dos parâmetros do estimador base."""
+    params = {k: v for k, v in estimator.get_params().items() if k not in PARAMETROS_IGNORADOS}
+    return _hash_json([type(estimator).__name__, params])
+
+
+def cell_key(dados, modelo, estimator, params, fold, variante):
+    """
+    Chave de uma célula: (dados, modelo, config do estimador, params, fold, variante).
+    variante descreve o recurso do halving, a parada antecipada e o caminho quantizado.
+    """
+    return (dados, modelo, estimator_hash(estimator), json.dumps(params, sort_keys=True, default=str),
+            int(fold), json.dumps(variante, sort_keys=True, default=str))
+
+
+def open_ledger(caminho=LEDGER_PATH):
+    """Abre (criando se preciso) o ledger. Retorna None se USAR_LEDGER = False."""
+    if not USAR_LEDGER:
+        return None
+    os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+    conexao = sqlite3.connect(caminho)
+    conexao.execute('PRAGMA journal_mode=WAL')
+    conexao.execute("""
+        CREATE TABLE IF NOT EXISTS avaliacoes (
+            dados TEXT NOT NULL,
+            modelo TEXT NOT NULL,
+            config_modelo TEXT NOT NULL,
+            params TEXT NOT NULL,
+            fold INTEGER NOT NULL,
+            variante TEXT NOT NULL,
+            score REAL,
+            tempo REAL,
+            best_iteration INTEGER,
+            proba BLOB,
+            registrado_em TEXT,
+            PRIMARY KEY (dados, modelo, config_modelo, params, fold, variante)
+        )
+    """)
+    conexao.commit()
+    return conexao
+
+
+def lookup(conexao, chave):
+    """Resultado gravado da célula (no formato de scheduler._executar_fold) ou None."""
+    if conexao is None:
+        return None
+    linha = conexao.execute(
+        """SELECT score, tempo, best_iteration, proba FROM avaliacoes
+           WHERE dados = ? AND modelo = ? AND config_modelo = ? AND params = ? AND fold = ? AND variante = ?""",
+        chave
+    ).fetchone()
+    if linha is None:
+        return None
+    score, tempo, best_iteration, proba = linha
+    return {
+        'score': np.nan if score is None else score,
+        'erro': None,
+        'tempo': tempo,
+        'best_iteration': best_iteration,
+        'proba': None if proba is None else np.frombuffer(proba, dtype='float32').copy()
+    }
+
+
+def store(conexao, chave, resultado):
+    """Grava (e confirma) o resultado de uma célula; fits com erro não são gravados."""
+    if conexao is None or resultado['erro']:
+        return
+    proba = resultado.get('proba')
+    score = resultado['score']
+    conexao.execute(
+        'INSERT OR REPLACE INTO avaliacoes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+        chave + (
+            None if score is None or np.isnan(score) else float(score),
+            float(resultado['tempo']),
+            None if resultado['best_iteration'] is None else int(resultado['best_iteration']),
+            None if proba is None else np.asarray(proba, dtype='float32').tobytes(),
+            datetime.now().isoformat(timespec='seconds')
+        )
+    )
+    conexao.commit()
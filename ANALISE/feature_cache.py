@@ -0,0 +1,121 @@
+"""
+Cache endereçado por conteúdo para os DataFrames horários por cidade
+(MODEL_FEATURES + TARGET) gerados por preprocess_and_merge_data.
+
+A chave combina o hash SHA-256 do conteúdo de cada arquivo de entrada, o
+filtro da cidade, a configuração usada (features, alvo, fuso) e o código-fonte
+das funções de pré-processamento, de modo que qualquer mudança em um desses
+itens gera uma nova entrada. Os DataFrames são gravados em Parquet e as
+entradas menos usadas recentemente são removidas quando o diretório passa de
+max_bytes.
+"""
+import os
+import json
+import hashlib
+import inspect
+import pandas as pd
+
+# Incrementar ao mudar o formato das entradas do cache
+CACHE_VERSION = 1
+HASH_INDEX_FILE = 'file_hashes.json'
+
+
+def _load_hash_index(cache_dir):
+    path = os.path.join(cache_dir, HASH_INDEX_FILE)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_hash_index(cache_dir, index):
+    path = os.path.join(cache_dir, HASH_INDEX_FILE)
+    temp = path + '.tmp'
+    with open(temp, 'w', encoding='utf-8') as f:
+        json.dump(index, f, indent=2, sort_keys=True)
+    os.replace(temp, path)
+
+
+def file_hash(path, index):
+    """
+    SHA-256 do conteúdo do arquivo. O resultado é memorizado no índice por
+    (tamanho, mtime) para não reler arquivos que não mudaram.
+    """
+    st = os.stat(path)
+    chave = os.path.abspath(path)
+    registro = index.get(chave)
+    if registro and registro['size'] == st.st_size and registro['mtime_ns'] == st.st_mtime_ns:
+        return registro['sha256']
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for bloco in iter(lambda: f.read(1 << 20), b''):
+            sha.update(bloco)
+    index[chave] = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'sha256': sha.hexdigest()}
+    return index[chave]['sha256']
+
+
+def build_cache_key(cache_dir, input_files, cidade_nome_filtro, code_funcs, config):
+    """Calcula a chave do cache para uma cidade a partir das entradas, do código e da configuração."""
+    os.makedirs(cache_dir, exist_ok=True)
+    index = _load_hash_index(cache_dir)
+    arquivos = sorted((os.path.basename(path), file_hash(path, index)) for path in input_files)
+    _save_hash_index(cache_dir, index)
+
+    codigo = hashlib.sha256(''.join(inspect.getsource(func) for func in code_funcs).encode('utf-8')).hexdigest()
+    conteudo = {
+        'versao': CACHE_VERSION,
+        'cidade': cidade_nome_filtro,
+        'arquivos': arquivos,
+        'codigo': codigo,
+        'config': config
+    }
+    return hashlib.sha256(json.dumps(conteudo, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def _entry_path(cache_dir, key):
+    return os.path.join(cache_dir, f'{key}.parquet')
+
+
+def load_cached_frame(cache_dir, key):
+    """Retorna o DataFrame em cache (ou None) e marca a entrada como usada recentemente."""
+    path = _entry_path(cache_dir, key)
+    if not os.path.exists(path):
+        return None
+    try:
+        df = pd.read_parquet(path)
+    except Exception as e:
+        print(f"[Cache] AVISO: Entrada corrompida {path} ({e}). Recalculando.")
+        os.remove(path)
+        return None
+    os.utime(path)
+    return df
+
+
+def save_cached_frame(cache_dir, key, df, max_bytes):
+    """Grava o DataFrame no cache e remove as entradas mais antigas se o limite for excedido."""
+    os.makedirs(cache_dir, exist_ok=True)
+    path = _entry_path(cache_dir, key)
+    temp = path + '.tmp'
+    df.to_parquet(temp)
+    os.replace(temp, path)
+    evict(cache_dir, max_bytes, keep=path)
+
+
+def evict(cache_dir, max_bytes, keep=None):
+    """Remove as entradas usadas há mais tempo até o cache caber em max_bytes."""
+    entradas = []
+    for nome in os.listdir(cache_dir):
+        if nome.endswith('.parquet'):
+            path = os.path.join(cache_dir, nome)
+            st = os.stat(path)
+            entradas.append((st.st_mtime, st.st_size, path))
+    total = sum(tamanho for _, tamanho, _ in entradas)
+    for _, tamanho, path in sorted(entradas):
+        if total <= max_bytes:
+            break
+        if path == keep:
+            continue
+        os.remove(path)
+        total -= tamanho
+        print(f"[Cache] Entrada removida (limite de {max_bytes / 1e6:.0f} MB): {os.path.basename(path)}")
@@ -0,0 +1,225 @@
+"""
+Compilação de ensembles de árvores (Random Forest do sklearn ou XGBoost) em
+arrays NumPy contíguos e avaliação vetorizada em lote.
+
+Todas as árvores ficam em um único conjunto de arrays por nó (feature,
+limiar, filhos, lado dos valores ausentes e valor da folha) mais o índice da
+raiz de cada árvore. Folhas têm feature -1 e apontam para si mesmas, então a
+avaliação desce TODAS as árvores de um bloco de amostras ao mesmo tempo,
+retirando do lote os pares (amostra, árvore) que já chegaram a uma folha.
+
+O modelo é gravado como um diretório de arquivos .npy mais um meta.json;
+load_flat_model abre os arrays com np.load(mmap_mode='r'), sem copiá-los
+para a memória de cada processo.
+
+predict_proba_flat reproduz o predict_proba do estimador original:
+  - os limiares do Random Forest (x <= limiar em float64) são convertidos
+    para o menor float32 tal que x < limiar, o mesmo teste do XGBoost, sem
+    mudar nenhuma decisão para X em float32;
+  - Random Forest: soma das proporções das folhas em float64, árvore a árvore,
+    dividida pelo número de árvores (como o sklearn com n_jobs=1);
+  - XGBoost (binary:logistic): margem base + soma das folhas em float32 e
+    sigmoide em float32.
+"""
+import os
+import json
+import shutil
+import numpy as np
+
+# Pares (amostra, árvore) avaliados por vez (limita a memória da avaliação)
+PARES_POR_BLOCO = 1_000_000
+# Níveis descidos entre duas remoções dos pares que já chegaram a uma folha
+NIVEIS_POR_COMPACTACAO = 3
+ARRAYS = ['feature', 'limiar', 'filhos', 'ausente_esquerda', 'valor', 'raizes']
+
+
+def is_supported(modelo):
+    return hasattr(modelo, 'estimators_') or hasattr(modelo, 'get_booster')
+
+
+def _concatenar(arvores):
+    """Junta as árvores em arrays globais (índices dos filhos deslocados, folhas apontando para si)."""
+    partes = {nome: [] for nome in ARRAYS if nome != 'raizes'}
+    raizes = []
+    deslocamento = 0
+    for arv in arvores:
+        folha = arv['esquerda'] < 0
+        idx = np.arange(len(folha)) + deslocamento
+        filhos = np.column_stack([
+            np.where(folha, idx, arv['esquerda'] + deslocamento),
+            np.where(folha, idx, arv['direita'] + deslocamento)
+        ])
+        partes['feature'].append(np.where(folha, -1, arv['feature']).astype('int32'))
+        partes['limiar'].append(arv['limiar'].astype('float32'))
+        partes['filhos'].append(filhos.astype('int32'))
+        partes['ausente_esquerda'].append(np.asarray(arv['ausente_esquerda']).astype(bool))
+        partes['valor'].append(arv['valor'])
+        raizes.append(deslocamento)
+        deslocamento += len(folha)
+    arrays = {nome: np.concatenate(valores) for nome, valores in partes.items()}
+    arrays['raizes'] = np.array(raizes, dtype='int32')
+    return arrays
+
+
+def _limiar_estrito_float32(limiar):
+    """Menor float32 L tal que, para x float32, (x <= limiar) equivale a (x < L)."""
+    abaixo = limiar.astype('float32')
+    arredondou_para_cima = abaixo.astype('float64') > limiar
+    abaixo[arredondou_para_cima] = np.nextafter(abaixo[arredondou_para_cima], np.float32(-np.inf))
+    return np.nextafter(abaixo, np.float32(np.inf))
+
+
+def flatten_random_forest(modelo):
+    """Arrays de um RandomForestClassifier binário (valor da folha: proporções das duas classes)."""
+    arvores = []
+    for estimador in modelo.estimators_:
+        t = estimador.tree_
+        arvores.append({
+            'feature': t.feature,
+            'limiar': _limiar_estrito_float32(t.threshold),
+            'esquerda': t.children_left,
+            'direita': t.children_right,
+            'ausente_esquerda': t.missing_go_to_left,
+            'valor': t.value[:, 0, :].astype('float64')
+        })
+    return _concatenar(arvores), {'tipo': 'random_forest'}
+
+
+def flatten_xgboost(modelo):
+    """Arrays de um XGBClassifier (binary:logistic) a partir do dump JSON do booster."""
+    conteudo = json.loads(modelo.get_booster().save_raw(raw_format='json'))['learner']
+    objetivo = conteudo['objective']['name']
+    if objetivo != 'binary:logistic':
+        raise ValueError(f"Objetivo do XGBoost não suportado: {objetivo}")
+
+    arvores = []
+    for arv in conteudo['gradient_booster']['model']['trees']:
+        esquerda = np.array(arv['left_children'])
+        condicoes = np.array(arv['split_conditions'], dtype='float32')
+        arvores.append({
+            'feature': np.array(arv['split_indices']),
+            'limiar': condicoes,
+            'esquerda': esquerda,
+            'direita': np.array(arv['right_children']),
+            'ausente_esquerda': np.array(arv['default_left']),
+            # Nas folhas, split_conditions guarda o valor da folha
+            'valor': np.where(esquerda < 0, condicoes, np.float32(0)).reshape(-1, 1)
+        })
+
+    # Com parada antecipada, o predict_proba usa só as árvores até best_iteration
+    best_iteration = getattr(modelo, 'best_iteration', None)
+    if best_iteration is not None:
+        arvores = arvores[:best_iteration + 1]
+
+    # base_score é uma probabilidade; a margem inicial é o seu logit (em float32, como no XGBoost)
+    base_score = np.float32(conteudo['learner_model_param']['base_score'].strip('[]'))
+    razao = np.float32(1) / base_score - np.float32(1)
+    margem_base = -np.float32(np.log(np.float64(razao)))
+    return _concatenar(arvores), {'tipo': 'xgboost', 'margem_base': float(margem_base)}
+
+
+def flatten_model(modelo, features):
+    """Compila um modelo suportado em {'arrays': {...}, 'meta': {...}}."""
+    if hasattr(modelo, 'estimators_'):
+        arrays, meta = flatten_random_forest(modelo)
+    elif hasattr(modelo, 'get_booster'):
+        arrays, meta = flatten_xgboost(modelo)
+    else:
+        raise TypeError(f"Modelo não suportado: {type(modelo).__name__}")
+    meta['features'] = list(features)
+    meta['n_arvores'] = len(arrays['raizes'])
+    meta['n_nos'] = len(arrays['feature'])
+    return {'arrays': arrays, 'meta': meta}
+
+
+def save_flat_model(modelo_plano, diretorio, **extras):
+    """Grava os arrays (.npy) e o meta.json de forma atômica (diretório temporário + os.replace)."""
+    temporario = diretorio.rstrip(os.sep) + '.tmp'
+    shutil.rmtree(temporario, ignore_errors=True)
+    os.makedirs(temporario)
+    for nome, array in modelo_plano['arrays'].items():
+        np.save(os.path.join(temporario, f'{nome}.npy'), np.ascontiguousarray(array))
+    with open(os.path.join(temporario, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(dict(modelo_plano['meta'], **extras), f, ensure_ascii=False, indent=2)
+    shutil.rmtree(diretorio, ignore_errors=True)
+    os.replace(temporario, diretorio)
+    return diretorio
+
+
+def load_flat_model(diretorio, mmap=True):
+    """Abre um modelo gravado por save_flat_model (ou None se não existir)."""
+    caminho_meta = os.path.join(diretorio, 'meta.json')
+    if not os.path.exists(caminho_meta):
+        return None
+    with open(caminho_meta, encoding='utf-8') as f:
+        meta = json.load(f)
+    arrays = {
+        nome: np.load(os.path.join(diretorio, f'{nome}.npy'), mmap_mode='r' if mmap else None)
+        for nome in ARRAYS
+    }
+    return {'arrays': arrays, 'meta': meta}
+
+
+def apply_leaves(modelo_plano, X):
+    """Índice (global) da folha alcançada por cada amostra em cada árvore: (amostras, árvores)."""
+    a = modelo_plano['arrays']
+    feature, limiar = a['feature'], a['limiar']
+    filhos, ausente_esquerda = a['filhos'].reshape(-1), a['ausente_esquerda']
+    raizes = np.asarray(a['raizes'])
+
+    n_amostras, n_arvores = X.shape[0], len(raizes)
+    # X transposto e achatado: o valor da feature f na amostra i fica em f * n + i
+    colunas = np.ascontiguousarray(X.T).reshape(-1)
+    tem_ausentes = bool(np.isnan(colunas).any())
+
+    folhas = np.empty(n_amostras * n_arvores, dtype='int32')
+    par = np.arange(n_amostras * n_arvores, dtype='int32')
+    amostra = par // n_arvores
+    no = np.tile(raizes, n_amostras)
+
+    while len(no):
+        for _ in range(NIVEIS_POR_COMPACTACAO):
+            # Nas folhas (feature -1) o teste é irrelevante: os dois filhos são a própria folha
+            x = colunas[feature[no] * n_amostras + amostra]
+            direita = x >= limiar[no]
+            if tem_ausentes:
+                ausente = np.isnan(x)
+                direita[ausente] = ~ausente_esquerda[no[ausente]]
+            no = filhos[2 * no + direita]
+        chegou = feature[no] < 0
+        folhas[par[chegou]] = no[chegou]
+        continua = ~chegou
+        par, amostra, no = par[continua], amostra[continua], no[continua]
+
+    return folhas.reshape(n_amostras, n_arvores)
+
+
+def predict_proba_flat(modelo_plano, X):
+    """Probabilidades (amostras, 2) iguais às do predict_proba do modelo original."""
+    meta = modelo_plano['meta']
+    valor = modelo_plano['arrays']['valor']
+    X = np.asarray(X, dtype='float32')
+    n_arvores = meta['n_arvores']
+    bloco = max(1, PARES_POR_BLOCO // n_arvores)
+
+    if meta['tipo'] == 'random_forest':
+        proba = np.zeros((len(X), 2))
+    else:
+        margem = np.full(len(X), meta['margem_base'], dtype='float32')
+
+    for inicio in range(0, len(X), bloco):
+        folhas = apply_leaves(modelo_plano, X[inicio:inicio + bloco])
+        fim = inicio + len(folhas)
+        # Soma árvore a árvore, na mesma ordem (e precisão) do estimador original
+        for t in range(n_arvores):
+            if meta['tipo'] == 'random_forest':
+                proba[inicio:fim] += valor[folhas[:, t]]
+            else:
+                margem[inicio:fim] += valor[folhas[:, t], 0]
+
+    if meta['tipo'] == 'random_forest':
+        return proba / n_arvores
+    # Mesma sigmoide do XGBoost: expf(min(-margem, 88.7)) arredondada para float32
+    exp = np.exp(np.minimum(-margem, np.float32(88.7)).astype('float64')).astype('float32')
+    positiva = np.float32(1) / (exp + np.float32(1))
+    return np.column_stack([np.float32(1) - positiva, positiva])
@@ -0,0 +1,64 @@
+"""
+Rotulagem horária por intervalo das interrupções da ANEEL.
+
+Cada interrupção afeta todas as horas entre o início e o fim (e não só a hora
+do início). A junção eventos × horas é vetorizada: as horas de início e de fim
+de cada evento são localizadas no índice horário ordenado com searchsorted, e
+um vetor de diferenças (+1 no início, -1 depois do fim), acumulado com
+bincount + cumsum, dá em uma passada o número de eventos simultâneos e a soma
+de consumidores afetados em cada hora. O custo é O((eventos + horas) log horas),
+sem laço Python por evento.
+"""
+import numpy as np
+import pandas as pd
+
+HORA_NS = 3_600_000_000_000
+
+
+def _horas_ns(datas):
+    """Datas (tz-aware ou naive UTC) em nanossegundos, truncadas na hora."""
+    valores = pd.DatetimeIndex(datas).as_unit('ns').asi8
+    return valores - np.mod(valores, HORA_NS)
+
+
+def label_hours(horas, inicio, fim=None, consumidores=None):
+    """
+    Conta, para cada hora de 'horas', as interrupções ativas e os consumidores afetados.
+
+    horas: DatetimeIndex horário ordenado (UTC), como o índice do INMET reamostrado.
+    inicio, fim: datas de início e fim de cada evento (UTC). Fim ausente (NaT),
+    anterior ao início ou fim=None marca apenas a hora do início.
+    consumidores: número de unidades consumidoras de cada evento (None = 0).
+
+    Retorna (n_eventos, n_consumidores), arrays alinhados com 'horas'.
+    """
+    h = pd.DatetimeIndex(horas).as_unit('ns').asi8
+    n = len(h)
+    inicio_ns = _horas_ns(inicio)
+
+    if fim is None:
+        fim_ns = inicio_ns
+    else:
+        fim_idx = pd.DatetimeIndex(fim)
+        # Última hora afetada: a hora que contém o instante imediatamente antes do fim
+        fim_ns = _horas_ns(fim_idx - pd.Timedelta(1, 'ns'))
+        invalido = fim_idx.isna() | (fim_ns < inicio_ns)
+        fim_ns = np.where(invalido, inicio_ns, fim_ns)
+
+    if consumidores is None:
+        consumidores = np.zeros(len(inicio_ns))
+    consumidores = np.nan_to_num(np.asarray(consumidores, dtype='float64'))
+
+    # Primeira hora do índice >= início e primeira hora > fim (intervalo fechado)
+    a = np.searchsorted(h, inicio_ns, side='left')
+    b = np.searchsorted(h, fim_ns, side='right')
+    validos = b > a
+    a, b, consumidores = a[validos], b[validos], consumidores[validos]
+
+    delta_eventos = np.bincount(a, minlength=n + 1) - np.bincount(b, minlength=n + 1)
+    delta_consumidores = (np.bincount(a, weights=consumidores, minlength=n + 1)
+                          - np.bincount(b, weights=consumidores, minlength=n + 1))
+    n_eventos = np.cumsum(delta_eventos[:n])
+    # Consumidores são inteiros: arredonda o erro de ponto flutuante da soma acumulada
+    n_consumidores = np.rint(np.cumsum(delta_consumidores[:n]))
+    return n_eventos.astype('int32'), n_consumidores.astype('int64')
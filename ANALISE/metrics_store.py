@@ -0,0 +1,104 @@
+"""
+Registro estruturado das execuções de treinamento (um arquivo JSON-lines,
+só com acréscimos).
+
+Cada linha é um registro completo de uma cidade × modelo: hiperparâmetros,
+F1 da validação cruzada, limiar de decisão, métricas de teste, matriz de
+confusão, importância das features e tempos. O relatório de texto
+(relatorio_*.txt) é gerado a partir do registro, e os gráficos consultam
+este arquivo em vez de extrair números do texto.
+
+Um registro nunca é alterado: re-treinar acrescenta uma nova linha, e
+latest_runs seleciona o registro mais recente de cada cidade × modelo.
+"""
+import os
+import json
+import uuid
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+METRICAS_DIR = 'Data/Metricas'
+ARQUIVO_EXECUCOES = 'execucoes.jsonl'
+# Incrementar ao mudar o formato dos registros
+VERSAO_REGISTRO = 1
+
+
+def runs_path(metricas_dir=METRICAS_DIR):
+    return os.path.join(metricas_dir, ARQUIVO_EXECUCOES)
+
+
+def _json_padrao(valor):
+    """Converte tipos do NumPy/pandas para JSON (NaN vira null em _sem_nan)."""
+    if isinstance(valor, np.ndarray):
+        return valor.tolist()
+    if isinstance(valor, np.generic):
+        return valor.item()
+    if isinstance(valor, pd.Timestamp):
+        return valor.isoformat()
+    raise TypeError(f"Tipo não serializável no registro: {type(valor).__name__}")
+
+
+def _sem_nan(valor):
+    """NaN/inf não são JSON válido: viram None."""
+    if isinstance(valor, dict):
+        return {k: _sem_nan(v) for k, v in valor.items()}
+    if isinstance(valor, (list, tuple)):
+        return [_sem_nan(v) for v in valor]
+    if isinstance(valor, (float, np.floating)) and not np.isfinite(valor):
+        return None
+    return valor
+
+
+def append_run(registro, metricas_dir=METRICAS_DIR):
+    """
+    Acrescenta o registro (dict) ao arquivo, com id, data e versão do formato.
+    A linha inteira é gravada em uma única escrita. Retorna o registro como
+    gravado (tipos do JSON), o mesmo que load_runs devolve depois.
+    """
+    registro = dict(
+        registro,
+        id_execucao=uuid.uuid4().hex[:12],
+        registrado_em=datetime.now().isoformat(timespec='seconds'),
+        versao_registro=VERSAO_REGISTRO
+    )
+    gravado = _sem_nan(json.loads(json.dumps(registro, default=_json_padrao)))
+    os.makedirs(metricas_dir, exist_ok=True)
+    with open(runs_path(metricas_dir), 'a', encoding='utf-8') as f:
+        f.write(json.dumps(gravado, ensure_ascii=False) + '\n')
+    return gravado
+
+
+def load_runs(metricas_dir=METRICAS_DIR):
+    """Todos os registros, na ordem em que foram gravados (linhas incompletas são ignoradas)."""
+    caminho = runs_path(metricas_dir)
+    if not os.path.exists(caminho):
+        return []
+    registros = []
+    with open(caminho, encoding='utf-8') as f:
+        for linha in f:
+            try:
+                registros.append(json.loads(linha))
+            except ValueError:
+                # Linha truncada por uma execução interrompida
+                continue
+    return registros
+
+
+def latest_runs(registros, tipo='treino'):
+    """Registro mais recente de cada (cidade, modelo), do tipo pedido, na ordem de gravação."""
+    ultimos = {}
+    for registro in registros:
+        if registro.get('tipo') == tipo:
+            ultimos[(registro['cidade'], registro['modelo'])] = registro
+    return list(ultimos.values())
+
+
+def runs_frame(registros):
+    """DataFrame com uma linha por registro e as métricas de teste como colunas (para comparações)."""
+    linhas = []
+    for registro in registros:
+        linha = {k: v for k, v in registro.items() if not isinstance(v, (dict, list))}
+        linha.update({f'teste_{k}': v for k, v in (registro.get('metricas_teste') or {}).items()})
+        linhas.append(linha)
+    return pd.DataFrame(linhas)
@@ -0,0 +1,124 @@
+"""
+Registro dos modelos treinados pelo driver (app_treinamento.py).
+
+Cada modelo é um dicionário com:
+  - 'nome':            nome exibido nos relatórios (ex.: 'RANDOM FOREST');
+  - 'sufixo':          usado no nome do relatório (relatorio_<cidade>_<sufixo>.txt);
+  - 'saida_dir':       diretório dos relatórios;
+  - 'build_estimator': função (y_train) -> estimador sklearn ainda não treinado;
+  - 'param_grid':      grade do GridSearchCV;
+  - 'importancia':     descrição da importância das features no relatório;
+  - 'halving':         (opcional) recurso do successive halving no agendador:
+                       {'recurso': 'n_estimators' | 'n_samples', 'min_recurso', 'max_recurso'}
+                       (max_recurso None = todas as amostras do fold);
+  - 'early_stopping_rounds': (opcional, XGBoost) parada antecipada no fold de
+                       validação durante o halving;
+  - 'atualizar':       função (estimator, X_new, y_new, incremento, contagem_classes)
+                       -> estimador atualizado só com os dados novos (retreino
+                       incremental, app_incremental.py);
+  - 'matriz_quantizada': (opcional, XGBoost) treina a busca com xgb.train sobre
+                       a QuantileDMatrix de cada fold, criada uma vez e reutilizada
+                       por todas as combinações (xgb_quantizado.py).
+
+Novos modelos são adicionados com register_model(chave, spec).
+"""
+from sklearn.base import clone
+from sklearn.ensemble import RandomForestClassifier
+from xgboost import XGBClassifier
+
+MODEL_REGISTRY = {}
+
+
+def register_model(key, spec):
+    """Adiciona (ou substitui) um modelo no registro."""
+    MODEL_REGISTRY[key] = spec
+    return spec
+
+
+def get_models(keys=None):
+    """Retorna [(chave, spec)] dos modelos pedidos (todos, se keys for None)."""
+    if keys is None:
+        keys = list(MODEL_REGISTRY)
+    desconhecidos = [key for key in keys if key not in MODEL_REGISTRY]
+    if desconhecidos:
+        raise KeyError(f"Modelos não registrados: {desconhecidos}. Disponíveis: {list(MODEL_REGISTRY)}")
+    return [(key, MODEL_REGISTRY[key]) for key in keys]
+
+
+# --- RANDOM FOREST ---
+
+def build_random_forest(y_train):
+    return RandomForestClassifier(random_state=42, n_jobs=-1)
+
+
+def update_random_forest(estimator, X_new, y_new, incremento, contagem_classes):
+    """
+    Adiciona 'incremento' árvores treinadas só nos dados novos (warm_start).
+    O class_weight 'balanced' calculado só no lote novo distorceria os pesos,
+    então é substituído por pesos explícitos da contagem acumulada das classes.
+    """
+    n0, n1 = contagem_classes
+    pesos = {0: (n0 + n1) / (2 * n0), 1: (n0 + n1) / (2 * n1)}
+    estimator.set_params(warm_start=True, n_estimators=estimator.n_estimators + incremento,
+                         class_weight=pesos if estimator.class_weight is not None else None)
+    estimator.fit(X_new, y_new)
+    return estimator
+
+
+register_model('random_forest', {
+    'nome': 'RANDOM FOREST',
+    'sufixo': 'random_forest',
+    'saida_dir': 'Data/Random Forest',
+    'build_estimator': build_random_forest,
+    'param_grid': {
+        'n_estimators': [100, 200],         # Reduzido para velocidade
+        'max_depth': [10, 20, None],
+        'min_samples_leaf': [1, 2, 4],
+        'class_weight': ['balanced']       # Essencial para dados desbalanceados
+    },
+    'importancia': 'Baseada em Gini',
+    'halving': {'recurso': 'n_estimators', 'min_recurso': 25, 'max_recurso': 200},
+    'atualizar': update_random_forest
+})
+
+
+# --- XGBOOST ---
+
+def build_xgboost(y_train):
+    # (scale_pos_weight = count(negatives) / count(positives))
+    scale_pos_weight = (y_train == 0).sum() / (y_train == 1).sum()
+    print(f"  Calculado scale_pos_weight (balanceamento): {scale_pos_weight:.2f}")
+    # Instancia o XGBoost com o balanceamento de classe
+    return XGBClassifier(
+        random_state=42,
+        n_jobs=-1,
+        scale_pos_weight=scale_pos_weight, # Aplica o balanceamento
+        eval_metric='logloss'
+    )
+
+
+def update_xgboost(estimator, X_new, y_new, incremento, contagem_classes):
+    """Continua o boosting a partir do booster salvo com 'incremento' rodadas nos dados novos."""
+    n0, n1 = contagem_classes
+    continuacao = clone(estimator).set_params(n_estimators=incremento, scale_pos_weight=n0 / n1)
+    continuacao.fit(X_new, y_new, xgb_model=estimator.get_booster())
+    return continuacao
+
+
+register_model('xgboost', {
+    'nome': 'XGBOOST',
+    'sufixo': 'xgboost',
+    'saida_dir': 'Data/XGBoost',
+    'build_estimator': build_xgboost,
+    'param_grid': {
+        'n_estimators': [100, 200],
+        'max_depth': [3, 5, 7],
+        'learning_rate': [0.01, 0.1],
+        'gamma': [0, 0.1]
+    },
+    'importancia': 'Baseada em Gain - XGBoost',
+    'halving': {'recurso': 'n_estimators', 'min_recurso': 50, 'max_recurso': 400},
+    'early_stopping_rounds': 20,
+    'matriz_quantizada': True,
+    'atualizar': update_xgboost
+})
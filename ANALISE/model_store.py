@@ -0,0 +1,79 @@
+"""
+Persistência dos modelos treinados (um arquivo por cidade e modelo).
+
+Cada arquivo guarda o estimador e um dicionário de metadados (features,
+hiperparâmetros, último instante de dados usado no treino, contagem das
+classes vistas e histórico de atualizações incrementais).
+
+Junto do .joblib é gravada a versão compilada em arrays NumPy das árvores
+(flat_trees.py), aberta por memory-map na pontuação.
+"""
+import os
+import joblib
+from datetime import datetime
+import flat_trees
+
+MODELOS_DIR = 'Data/Modelos'
+
+
+def model_path(cidade_nome, sufixo, modelos_dir=MODELOS_DIR):
+    safe_city_name = cidade_nome.replace(" ", "_").replace("/", "")
+    return os.path.join(modelos_dir, f'modelo_{safe_city_name}_{sufixo}.joblib')
+
+
+def save_model(cidade_nome, sufixo, estimator, metadados, modelos_dir=MODELOS_DIR):
+    """Salva estimador + metadados de forma atômica (arquivo temporário + os.replace)."""
+    os.makedirs(modelos_dir, exist_ok=True)
+    caminho = model_path(cidade_nome, sufixo, modelos_dir)
+    metadados = dict(metadados, salvo_em=datetime.now().isoformat(timespec='seconds'))
+    temporario = caminho + '.tmp'
+    joblib.dump({'modelo': estimator, 'metadados': metadados}, temporario)
+    os.replace(temporario, caminho)
+    print(f"[Modelos] Modelo salvo em: {caminho}")
+    if flat_trees.is_supported(estimator):
+        save_flat_model(cidade_nome, sufixo, estimator, metadados, modelos_dir)
+    return caminho
+
+
+def load_model(cidade_nome, sufixo, modelos_dir=MODELOS_DIR):
+    """Retorna (estimador, metadados) ou None se o modelo ainda não foi treinado."""
+    caminho = model_path(cidade_nome, sufixo, modelos_dir)
+    if not os.path.exists(caminho):
+        return None
+    conteudo = joblib.load(caminho)
+    return conteudo['modelo'], conteudo['metadados']
+
+
+def flat_model_path(cidade_nome, sufixo, modelos_dir=MODELOS_DIR):
+    safe_city_name = cidade_nome.replace(" ", "_").replace("/", "")
+    return os.path.join(modelos_dir, f'arvores_{safe_city_name}_{sufixo}')
+
+
+def save_flat_model(cidade_nome, sufixo, estimator, metadados, modelos_dir=MODELOS_DIR):
+    """Compila as árvores do estimador e grava ao lado do .joblib (mesmo 'salvo_em')."""
+    modelo_plano = flat_trees.flatten_model(estimator, metadados['features'])
+    return flat_trees.save_flat_model(
+        modelo_plano, flat_model_path(cidade_nome, sufixo, modelos_dir), salvo_em=metadados['salvo_em']
+    )
+
+
+def load_flat_model(cidade_nome, sufixo, metadados, modelos_dir=MODELOS_DIR):
+    """Modelo compilado (arrays em memory-map) ou None se não existir ou for de outro salvamento."""
+    modelo_plano = flat_trees.load_flat_model(flat_model_path(cidade_nome, sufixo, modelos_dir))
+    if modelo_plano is None or modelo_plano['meta'].get('salvo_em') != metadados.get('salvo_em'):
+        return None
+    return modelo_plano
+
+
+def load_or_build_flat_model(cidade_nome, sufixo, estimator, metadados, modelos_dir=MODELOS_DIR):
+    """
+    Modelo compilado do estimador salvo, compilando-o uma vez se o modelo foi
+    salvo antes da compilação das árvores. None se o estimador não for suportado.
+    """
+    if not flat_trees.is_supported(estimator):
+        return None
+    modelo_plano = load_flat_model(cidade_nome, sufixo, metadados, modelos_dir)
+    if modelo_plano is None:
+        save_flat_model(cidade_nome, sufixo, estimator, metadados, modelos_dir)
+        modelo_plano = load_flat_model(cidade_nome, sufixo, metadados, modelos_dir)
+    return modelo_plano
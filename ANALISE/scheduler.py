@@ -0,0 +1,477 @@
+"""
+Agendador global de treinamento.
+
+Em vez de percorrer as cidades em série, com um GridSearchCV(n_jobs=-1) por
+cidade envolvendo estimadores que também usam n_jobs=-1 (o que disputa os
+mesmos núcleos), todas as avaliações (cidade × modelo × hiperparâmetros × fold)
+viram tarefas independentes de uma única fila, atendida por um pool de
+processos. Cada processo tem as threads de BLAS/OpenMP e do próprio estimador
+fixadas em THREADS_POR_WORKER, de modo que N_WORKERS × THREADS_POR_WORKER não
+passe do número de núcleos.
+
+Quando todos os folds de uma combinação (cidade, modelo) terminam, o melhor
+conjunto de hiperparâmetros (maior F1 médio, mesmo critério do GridSearchCV)
+é re-treinado no treino completo como mais uma tarefa da fila, e o modelo
+volta para o processo principal, que gera o relatório da cidade.
+
+Com MODO_BUSCA = 'halving', a busca usa successive halving: todas as
+combinações começam com pouco recurso (amostras de treino ou n_estimators,
+conforme spec['halving'] do modelo) e, a cada rodada, só o melhor 1/FATOR_HALVING
+segue com FATOR_HALVING vezes mais recurso. No XGBoost, spec['early_stopping_rounds']
+ativa a parada antecipada no fold de validação, e o número de árvores escolhido
+vira o n_estimators do refit. ORCAMENTO_FITS e ORCAMENTO_SEGUNDOS valem desde a
+primeira rodada: esgotado o orçamento, os fits ainda não enviados deixam de ser
+submetidos (e os que aguardam no pool são cancelados, no caso do tempo), e a
+busca escolhe o melhor entre os candidatos com todos os folds avaliados. O
+primeiro candidato de cada rodada é sempre avaliado, para que haja uma escolha.
+O halving só existe no agendador: o caminho em série (USAR_AGENDADOR = False em
+app_treinamento.py) roda a grade completa.
+
+Cada fold avaliado é gravado no ledger (evaluation_ledger.py) assim que
+termina, e as células já gravadas não voltam ao pool: uma busca interrompida
+continua de onde parou e ampliar a grade custa só as combinações novas.
+"""
+import os
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from sklearn.base import clone
+from sklearn.metrics import f1_score
+from sklearn.model_selection import ParameterGrid, StratifiedKFold
+from threadpoolctl import threadpool_limits
+import xgb_quantizado
+import evaluation_ledger
+
+# --- CONFIGURAÇÕES ---
+
+# Processos do pool e threads por processo (BLAS/OpenMP e n_jobs do estimador)
+N_WORKERS = os.cpu_count() or 1
+THREADS_POR_WORKER = 1
+# Folds da validação cruzada (mesmo cv=3 do GridSearchCV original)
+CV_FOLDS = 3
+
+# 'grid' (todas as combinações com recurso total) ou 'halving' (successive halving)
+MODO_BUSCA = 'grid'
+FATOR_HALVING = 3
+# Orçamentos do modo halving (None = sem limite): fits executados (sem os do ledger)
+# por cidade × modelo e tempo total. Verificados a cada fit submetido
+ORCAMENTO_FITS = None
+ORCAMENTO_SEGUNDOS = None
+RANDOM_STATE = 42
+
+# Dados compartilhados com os workers (definidos no initializer de cada processo)
+_DADOS_WORKER = {}
+
+
+def _iniciar_worker(dados, threads):
+    """Initializer do pool: guarda os dados das cidades e fixa as threads do processo."""
+    _DADOS_WORKER.clear()
+    _DADOS_WORKER.update(dados)
+    _DADOS_WORKER['_threads'] = threads
+    # Vale para todo o processo (sem 'with'): BLAS e OpenMP ficam limitados
+    threadpool_limits(limits=threads)
+
+
+def _preparar_estimador(base, params, threads):
+    estimator = clone(base).set_params(**params)
+    if 'n_jobs' in estimator.get_params():
+        estimator.set_params(n_jobs=threads)
+    return estimator
+
+
+def _subamostrar(idx_treino, y_train, n_amostras, fold):
+    """Primeiras n_amostras de uma permutação fixa do treino do fold, mantendo a proporção das classes."""
+    rng = np.random.RandomState(RANDOM_STATE + fold)
+    classes = y_train.iloc[idx_treino].to_numpy()
+    partes = []
+    for classe in np.unique(classes):
+        idx_classe = rng.permutation(idx_treino[classes == classe])
+        partes.append(idx_classe[:max(1, round(n_amostras * len(idx_classe) / len(idx_treino)))])
+    return np.sort(np.concatenate(partes))
+
+
+def _executar_fold(cidade, base, params, fold, recurso=None, early_stopping=None, quantizado=False):
+    """
+    Treina uma combinação de hiperparâmetros em um fold e retorna o F1 e as
+    probabilidades de validação (usadas na escolha do limiar de decisão).
+    recurso: None (treino completo) ou (tipo, valor), com tipo 'n_samples' ou 'n_estimators'.
+    quantizado: usa o caminho nativo do XGBoost com a matriz do fold reutilizada
+    entre as combinações (ignorado no halving por amostras, que muda o treino).
+    """
+    X_train, y_train, folds = _DADOS_WORKER[cidade]
+    idx_treino, idx_valid = folds[fold]
+    inicio = time.time()
+    best_iteration = None
+    proba = None
+    if quantizado and (recurso is None or recurso[0] == 'n_estimators'):
+        try:
+            params = dict(params, n_estimators=recurso[1]) if recurso else params
+            estimator = _preparar_estimador(base, {}, _DADOS_WORKER['_threads'])
+            score, best_iteration, proba = xgb_quantizado.treinar_fold(estimator, params, cidade, X_train, y_train,
+                                                                       folds, fold, early_stopping)
+            erro = None
+        except Exception as e:
+            score, erro = np.nan, str(e)
+        return {'score': score, 'erro': erro, 'tempo': time.time() - inicio, 'best_iteration': best_iteration,
+                'proba': proba}
+
+    try:
+        estimator = _preparar_estimador(base, params, _DADOS_WORKER['_threads'])
+        if recurso is not None and recurso[0] == 'n_samples' and recurso[1] < len(idx_treino):
+            idx_treino = _subamostrar(idx_treino, y_train, recurso[1], fold)
+        elif recurso is not None and recurso[0] == 'n_estimators':
+            estimator.set_params(n_estimators=recurso[1])
+
+        X_valid, y_valid = X_train.iloc[idx_valid], y_train.iloc[idx_valid]
+        fit_kwargs = {}
+        if early_stopping:
+            # Parada antecipada do XGBoost avaliada no fold de validação
+            estimator.set_params(early_stopping_rounds=early_stopping)
+            fit_kwargs = {'eval_set': [(X_valid, y_valid)], 'verbose': False}
+        estimator.fit(X_train.iloc[idx_treino], y_train.iloc[idx_treino], **fit_kwargs)
+        if early_stopping:
+            best_iteration = estimator.best_iteration
+
+        score = f1_score(y_valid, estimator.predict(X_valid))
+        proba = estimator.predict_proba(X_valid)[:, 1].astype('float32')
+        erro = None
+    except Exception as e:
+        # Mesmo comportamento do GridSearchCV (error_score=nan)
+        score, erro = np.nan, str(e)
+    return {'score': score, 'erro': erro, 'tempo': time.time() - inicio, 'best_iteration': best_iteration,
+            'proba': proba}
+
+
+def _executar_refit(cidade, base, params):
+    """
+    Re-treina a melhor combinação no conjunto de treino completo. O modelo
+    devolvido (que é salvo) volta ao n_jobs do registro: as threads do worker
+    valem só para o fit dentro do pool.
+    """
+    X_train, y_train, _ = _DADOS_WORKER[cidade]
+    estimator = _preparar_estimador(base, params, _DADOS_WORKER['_threads'])
+    estimator.fit(X_train, y_train)
+    if 'n_jobs' in estimator.get_params():
+        estimator.set_params(n_jobs=base.get_params()['n_jobs'])
+    return estimator
+
+
+def construir_folds(y_train, n_folds=CV_FOLDS):
+    """Mesmos folds que o GridSearchCV usa para classificadores (StratifiedKFold sem shuffle)."""
+    skf = StratifiedKFold(n_splits=n_folds)
+    return list(skf.split(np.zeros(len(y_train)), y_train))
+
+
+def medias_cv(scores):
+    """F1 médio de cada candidato (NaN se algum fold não foi avaliado ou falhou)."""
+    return np.array([np.mean([np.nan if v is None else v for v in s]) for s in scores])
+
+
+def escolher_melhor(candidatos, scores):
+    """
+    Escolhe a combinação com maior F1 médio entre os folds. Em caso de empate
+    vence a primeira da grade, como no GridSearchCV. Retorna None se nenhuma
+    combinação teve todos os folds válidos.
+    """
+    medias = medias_cv(scores)
+    if np.all(np.isnan(medias)):
+        return None
+    melhor = int(np.nanargmax(medias))
+    return melhor, candidatos[melhor], float(medias[melhor])
+
+
+def probabilidades_oof(probas, folds, n_amostras):
+    """Junta as probabilidades de validação de cada fold no vetor out-of-fold (None se algum fold falhou)."""
+    if any(p is None for p in probas):
+        return None
+    oof = np.full(n_amostras, np.nan, dtype='float32')
+    for (_, idx_valid), proba in zip(folds, probas):
+        oof[idx_valid] = proba
+    return oof
+
+
+def candidatos_iniciais(param_grid, config_halving):
+    """
+    Combinações da grade. No halving por n_estimators esse parâmetro passa a ser
+    o recurso e sai da grade (combinações repetidas são descartadas).
+    """
+    candidatos = list(ParameterGrid(param_grid))
+    if config_halving and config_halving['recurso'] == 'n_estimators':
+        unicos = []
+        for params in candidatos:
+            params = {k: v for k, v in params.items() if k != 'n_estimators'}
+            if params not in unicos:
+                unicos.append(params)
+        candidatos = unicos
+    return candidatos
+
+
+def recurso_inicial(config_halving, n_treino_fold):
+    if not config_halving:
+        return None
+    maximo = config_halving.get('max_recurso') or n_treino_fold
+    return (config_halving['recurso'], min(config_halving['min_recurso'], maximo), maximo)
+
+
+def _orcamento_esgotado(e, inicio, proximos=0):
+    """
+    True se a busca halving passaria de ORCAMENTO_FITS com mais 'proximos' fits
+    ou se já usou ORCAMENTO_SEGUNDOS segundos.
+    """
+    if not e['orcamento']:
+        return False
+    if ORCAMENTO_FITS is not None and e['fits'] + proximos > ORCAMENTO_FITS:
+        return True
+    return ORCAMENTO_SEGUNDOS is not None and time.time() - inicio > ORCAMENTO_SEGUNDOS
+
+
+def _agendar_rodada(executor, futures, chave, e, n_folds, ledger, inicio):
+    """
+    Submete os fits (candidatos × folds) da rodada atual de uma cidade × modelo.
+    Células já gravadas no ledger (evaluation_ledger.py) não vão para o pool:
+    o resultado gravado entra direto na rodada. Com o orçamento esgotado, os
+    candidatos seguintes ao primeiro não são submetidos (ficam sem F1).
+    """
+    recurso = e['recurso'][:2] if e['recurso'] else None
+    quantizado = e['tarefa'].get('matriz_quantizada', False)
+    variante = {'recurso': recurso, 'early_stopping': e['early_stopping'], 'quantizado': quantizado}
+    e['scores'] = [[None] * n_folds for _ in e['candidatos']]
+    e['iteracoes'] = [[None] * n_folds for _ in e['candidatos']]
+    e['probas'] = [[None] * n_folds for _ in e['candidatos']]
+    e['celulas'] = [[None] * n_folds for _ in e['candidatos']]
+    e['pendentes'] = 0
+    cortados = 0
+    for i, params in enumerate(e['candidatos']):
+        if i > 0 and _orcamento_esgotado(e, inicio, n_folds):
+            cortados = len(e['candidatos']) - i
+            break
+        for fold in range(n_folds):
+            celula = evaluation_ledger.cell_key(e['dados'], chave[1], e['tarefa']['estimator'], params, fold, variante)
+            e['celulas'][i][fold] = celula
+            gravado = evaluation_ledger.lookup(ledger, celula)
+            if gravado is not None:
+                _registrar_fold(e, i, fold, gravado)
+                e['em_cache'] += 1
+                continue
+            future = executor.submit(_executar_fold, chave[0], e['tarefa']['estimator'], params, fold,
+                                     recurso, e['early_stopping'], quantizado)
+            futures[future] = ('fold', chave, i, fold)
+            e['pendentes'] += 1
+            # Só os fits enviados ao pool contam (células do ledger não gastam o orçamento)
+            e['fits'] += 1
+    e['rodada'] += 1
+    if e['recurso']:
+        print(f"  [Halving] {chave[0]} / {chave[1]}: rodada {e['rodada']}, "
+              f"{len(e['candidatos'])} candidato(s), {e['recurso'][0]} = {e['recurso'][1]}")
+    if cortados:
+        print(f"  [Halving] Orçamento esgotado: {cortados} candidato(s) de {chave[0]} / {chave[1]} "
+              f"não avaliado(s) nesta rodada.")
+
+
+def _cancelar_excedentes(futures, estado, inicio):
+    """
+    Com o orçamento de tempo esgotado, cancela os folds que ainda aguardam no
+    pool (exceto os do primeiro candidato da rodada). Retorna as chaves
+    cidade × modelo cuja rodada terminou com o cancelamento.
+    """
+    concluidas = set()
+    if ORCAMENTO_SEGUNDOS is None or time.time() - inicio <= ORCAMENTO_SEGUNDOS:
+        return concluidas
+    for future, (tipo, chave, i, fold) in list(futures.items()):
+        e = estado[chave]
+        if tipo != 'fold' or i == 0 or not e['orcamento'] or not future.cancel():
+            continue
+        del futures[future]
+        e['pendentes'] -= 1
+        e['fits'] -= 1
+        e['cancelados'] += 1
+        if e['pendentes'] == 0:
+            concluidas.add(chave)
+    return concluidas
+
+
+def _registrar_fold(e, i, fold, resultado):
+    e['scores'][i][fold] = resultado['score']
+    e['iteracoes'][i][fold] = resultado['best_iteration']
+    e['probas'][i][fold] = resultado['proba']
+
+
+def _avancar(executor, futures, chave, e, n_folds, inicio, resultados, ledger):
+    """
+    Agenda a próxima rodada. Se todas as células dela já estavam no ledger,
+    segue para a rodada seguinte (ou para o refit) sem esperar o pool.
+    """
+    while True:
+        _agendar_rodada(executor, futures, chave, e, n_folds, ledger, inicio)
+        if e['pendentes'] > 0:
+            return
+        if not _proxima_rodada(e, n_folds, inicio):
+            _finalizar_busca(executor, futures, chave, e, n_folds, resultados)
+            return
+
+
+def _finalizar_busca(executor, futures, chave, e, n_folds, resultados):
+    """Escolhe a melhor combinação da última rodada e submete o refit."""
+    escolha = escolher_melhor(e['candidatos'], e['scores'])
+    if escolha is None:
+        print(f"  ERRO CRÍTICO: nenhuma combinação válida para {chave[0]} / {chave[1]}.")
+        print("  Isso geralmente acontece se o 'cv' (cross-validation) não puder criar folds com ambas as classes.")
+        resultados[chave] = None
+        return
+    indice, best_params, best_score = escolha
+    best_params = _parametros_finais(e, indice, best_params)
+    resultados[chave] = {
+        'best_params': best_params,
+        'best_score': best_score,
+        'n_folds': n_folds,
+        'best_estimator': None,
+        'oof_proba': probabilidades_oof(e['probas'][indice], e['folds'], len(e['tarefa']['y_train'])),
+        'tempo_cv': e['tempo_cv'],
+        'fits': e['fits']
+    }
+    cancelados = f", {e['cancelados']} cancelados pelo orçamento" if e['cancelados'] else ''
+    print(f"  [Agendador] Busca concluída para {chave[0]} / {chave[1]} "
+          f"({e['fits']} fits, {e['em_cache']} do ledger{cancelados}): {best_params} (F1 CV: {best_score:.4f})")
+    future = executor.submit(_executar_refit, chave[0], e['tarefa']['estimator'], best_params)
+    futures[future] = ('refit', chave, None, None)
+
+
+def _proxima_rodada(e, n_folds, inicio):
+    """
+    Decide se a busca halving continua. Se sim, mantém o melhor 1/FATOR_HALVING
+    dos candidatos, multiplica o recurso e retorna True.
+    """
+    if not e['recurso'] or len(e['candidatos']) == 1:
+        return False
+    tipo, valor, maximo = e['recurso']
+    if valor >= maximo:
+        return False
+
+    medias = np.nan_to_num(medias_cv(e['scores']), nan=-np.inf)
+    # Candidatos sem todos os folds (cortados pelo orçamento ou com erro) não avançam
+    n_manter = min(int(np.ceil(len(e['candidatos']) / FATOR_HALVING)), max(1, int(np.isfinite(medias).sum())))
+    # Ordem estável: em empate, prevalece a ordem da grade
+    manter = np.sort(np.argsort(-medias, kind='stable')[:n_manter])
+
+    if ORCAMENTO_FITS is not None and e['fits'] + n_manter * n_folds > ORCAMENTO_FITS:
+        print("  [Halving] Orçamento de fits atingido; usando o melhor da última rodada.")
+        return False
+    if ORCAMENTO_SEGUNDOS is not None and time.time() - inicio > ORCAMENTO_SEGUNDOS:
+        print("  [Halving] Orçamento de tempo atingido; usando o melhor da última rodada.")
+        return False
+
+    e['candidatos'] = [e['candidatos'][i] for i in manter]
+    e['recurso'] = (tipo, min(valor * FATOR_HALVING, maximo), maximo)
+    return True
+
+
+def _parametros_finais(e, indice, params):
+    """Hiperparâmetros do refit, incluindo o recurso usado na última rodada."""
+    params = dict(params)
+    if e['recurso'] and e['recurso'][0] == 'n_estimators':
+        params['n_estimators'] = e['recurso'][1]
+    if e['early_stopping']:
+        # Número de árvores escolhido pela parada antecipada (média entre os folds)
+        iteracoes = [it for it in e['iteracoes'][indice] if it is not None]
+        if iteracoes:
+            params['n_estimators'] = int(round(np.mean(iteracoes))) + 1
+    return params
+
+
+def run_jobs(tarefas, n_workers=N_WORKERS, threads=THREADS_POR_WORKER, n_folds=CV_FOLDS, modo=MODO_BUSCA):
+    """
+    Executa a busca de todas as tarefas em um único pool.
+
+    tarefas: lista de dicts com 'cidade', 'modelo' (chave do registro),
+    'estimator' (estimador base não treinado), 'param_grid', 'X_train', 'y_train'
+    e, opcionalmente, 'halving' e 'early_stopping_rounds' (usados só com modo='halving')
+    e 'matriz_quantizada' (XGBoost nativo com a matriz de cada fold reutilizada).
+
+    Retorna {(cidade, modelo): {'best_params', 'best_score', 'n_folds',
+    'best_estimator', 'oof_proba', 'tempo_cv', 'fits'}}; o valor é None quando
+    a busca falhou. oof_proba são as probabilidades out-of-fold da melhor
+    combinação (na última rodada do halving).
+    """
+    dados = {}
+    hashes = {}
+    for tarefa in tarefas:
+        if tarefa['cidade'] not in dados:
+            folds = construir_folds(tarefa['y_train'], n_folds)
+            dados[tarefa['cidade']] = (tarefa['X_train'], tarefa['y_train'], folds)
+            hashes[tarefa['cidade']] = evaluation_ledger.dataset_hash(tarefa['X_train'], tarefa['y_train'], n_folds)
+
+    estado = {}
+    for tarefa in tarefas:
+        chave = (tarefa['cidade'], tarefa['modelo'])
+        config_halving = tarefa.get('halving') if modo == 'halving' else None
+        n_treino_fold = min(len(f[0]) for f in dados[tarefa['cidade']][2])
+        estado[chave] = {
+            'tarefa': tarefa,
+            'dados': hashes[tarefa['cidade']],
+            'folds': dados[tarefa['cidade']][2],
+            'candidatos': candidatos_iniciais(tarefa['param_grid'], config_halving),
+            'recurso': recurso_inicial(config_halving, n_treino_fold),
+            'early_stopping': tarefa.get('early_stopping_rounds') if config_halving else None,
+            'rodada': 0,
+            'orcamento': config_halving is not None,
+            'fits': 0,
+            'em_cache': 0,
+            'cancelados': 0,
+            'tempo_cv': 0.0
+        }
+
+    print(f"\n[Agendador] Busca '{modo}' em {len(estado)} combinações cidade × modelo "
+          f"({n_workers} workers × {threads} thread(s)).")
+
+    resultados = {}
+    inicio = time.time()
+    ledger = evaluation_ledger.open_ledger()
+    try:
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=_iniciar_worker,
+                                 initargs=(dados, threads)) as executor:
+            futures = {}
+            for chave, e in estado.items():
+                _avancar(executor, futures, chave, e, n_folds, inicio, resultados, ledger)
+
+            while futures:
+                prontos, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in prontos:
+                    tipo, chave, i, fold = futures.pop(future)
+                    e = estado[chave]
+
+                    if tipo == 'refit':
+                        try:
+                            resultados[chave]['best_estimator'] = future.result()
+                            print(f"  [Agendador] Refit concluído: {chave[0]} / {chave[1]}")
+                        except Exception as erro:
+                            print(f"  [Agendador] ERRO no refit de {chave[0]} / {chave[1]}: {erro}")
+                            resultados[chave] = None
+                        continue
+
+                    resultado = future.result()
+                    # Gravado assim que termina: uma busca interrompida recomeça daqui
+                    evaluation_ledger.store(ledger, e['celulas'][i][fold], resultado)
+                    _registrar_fold(e, i, fold, resultado)
+                    e['tempo_cv'] += resultado['tempo']
+                    e['pendentes'] -= 1
+                    if resultado['erro']:
+                        print(f"  [Agendador] AVISO: fit falhou ({chave[0]} / {chave[1]}, fold {fold}): {resultado['erro']}")
+
+                    concluidas = _cancelar_excedentes(futures, estado, inicio)
+                    if e['pendentes'] == 0:
+                        concluidas.add(chave)
+
+                    # Rodada concluída: próxima rodada do halving ou refit do melhor
+                    for chave_concluida in concluidas:
+                        e_concluida = estado[chave_concluida]
+                        if _proxima_rodada(e_concluida, n_folds, inicio):
+                            _avancar(executor, futures, chave_concluida, e_concluida, n_folds, inicio,
+                                     resultados, ledger)
+                        else:
+                            _finalizar_busca(executor, futures, chave_concluida, e_concluida, n_folds, resultados)
+    finally:
+        if ledger is not None:
+            ledger.close()
+
+    print(f"[Agendador] Todas as tarefas concluídas em {time.time() - inicio:.1f}s.")
+    return resultados
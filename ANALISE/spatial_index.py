@@ -0,0 +1,148 @@
+"""
+Índice espacial das estações do INMET e dos conjuntos da ANEEL.
+
+As coordenadas vêm de dois CSVs (separador ';') em COORDENADAS_DIR:
+  - estacoes_inmet.csv: Estacao;Codigo;Arquivo;Latitude;Longitude (estações
+    automáticas do INMET no RS; Arquivo é o nome do arquivo filtrado da estação
+    em INMET/Data/Filtrados/<ano>/);
+  - conjuntos_aneel.csv: Conjunto;Latitude;Longitude (Conjunto é o nome usado
+    como filtro nos conjuntos da ANEEL, como as chaves de CIDADES_CONFIG).
+
+As estações formam uma BallTree com métrica haversine (coordenadas em
+radianos), consultada uma vez para todos os conjuntos: cada conjunto recebe as
+suas K estações mais próximas. A mais próxima é a estação do conjunto (substitui
+o mapeamento manual cidade → arquivo); as seguintes são as vizinhas, cujas
+medições entram como features ponderadas pelo inverso da distância (IDW).
+
+As features das vizinhas de todos os conjuntos saem de um único produto de
+matrizes por coluna: pesos (conjuntos × estações) @ medições (estações × horas),
+renormalizado pelas estações com medição em cada hora.
+"""
+import os
+import numpy as np
+import pandas as pd
+from haversine import haversine_vector, Unit
+from sklearn.neighbors import BallTree
+
+COORDENADAS_DIR = 'Data/Coordenadas'
+ARQUIVO_ESTACOES = 'estacoes_inmet.csv'
+ARQUIVO_CONJUNTOS = 'conjuntos_aneel.csv'
+
+# Estações consultadas por conjunto (a primeira é a do próprio conjunto)
+K_ESTACOES = 3
+# Expoente do IDW (peso = 1 / distância^POTENCIA_IDW) e distância máxima de uma
+# vizinha (as mais distantes têm peso zero e não são carregadas)
+POTENCIA_IDW = 2
+RAIO_MAX_KM = 50.0
+# Abaixo desta distância a vizinha está no mesmo ponto que o conjunto
+DISTANCIA_MINIMA_KM = 1.0
+
+
+def coordinate_files(coordenadas_dir=COORDENADAS_DIR):
+    return [os.path.join(coordenadas_dir, ARQUIVO_ESTACOES), os.path.join(coordenadas_dir, ARQUIVO_CONJUNTOS)]
+
+
+def load_coordinates(coordenadas_dir=COORDENADAS_DIR):
+    """(estacoes, conjuntos): DataFrames indexados pelo nome, com Latitude/Longitude em graus."""
+    caminho_estacoes, caminho_conjuntos = coordinate_files(coordenadas_dir)
+    estacoes = pd.read_csv(caminho_estacoes, sep=';', index_col='Estacao')
+    conjuntos = pd.read_csv(caminho_conjuntos, sep=';', index_col='Conjunto')
+    return estacoes, conjuntos
+
+
+def build_station_tree(estacoes):
+    """BallTree das estações (haversine exige [latitude, longitude] em radianos)."""
+    return BallTree(np.radians(estacoes[['Latitude', 'Longitude']].to_numpy('float64')), metric='haversine')
+
+
+def nearest_stations(arvore, estacoes, conjuntos, k=K_ESTACOES):
+    """
+    As k estações mais próximas de cada conjunto, em uma consulta vetorizada.
+    Retorna um DataFrame longo: Conjunto, ordem (0 = mais próxima), Estacao, Arquivo, distancia_km.
+    """
+    k = min(k, len(estacoes))
+    pontos = conjuntos[['Latitude', 'Longitude']].to_numpy('float64')
+    _, indices = arvore.query(np.radians(pontos), k=k)
+
+    origem = np.repeat(pontos, k, axis=0)
+    destino = estacoes[['Latitude', 'Longitude']].to_numpy('float64')[indices.ravel()]
+    return pd.DataFrame({
+        'Conjunto': np.repeat(conjuntos.index.to_numpy(), k),
+        'ordem': np.tile(np.arange(k), len(conjuntos)),
+        'Estacao': estacoes.index.to_numpy()[indices.ravel()],
+        'Arquivo': estacoes['Arquivo'].to_numpy()[indices.ravel()],
+        'distancia_km': haversine_vector(origem, destino, Unit.KILOMETERS)
+    })
+
+
+def load_neighbours(coordenadas_dir=COORDENADAS_DIR, k=K_ESTACOES):
+    """Estações mais próximas de cada conjunto (nearest_stations), ou None sem os arquivos de coordenadas."""
+    if not all(os.path.exists(caminho) for caminho in coordinate_files(coordenadas_dir)):
+        return None
+    estacoes, conjuntos = load_coordinates(coordenadas_dir)
+    return nearest_stations(build_station_tree(estacoes), estacoes, conjuntos, k)
+
+
+def station_mapping(vizinhas):
+    """{conjunto: arquivo da estação mais próxima}, no formato de CIDADES_CONFIG."""
+    primeiras = vizinhas[vizinhas['ordem'] == 0]
+    return dict(zip(primeiras['Conjunto'], primeiras['Arquivo']))
+
+
+def neighbour_stations(vizinhas, raio_max_km=RAIO_MAX_KM):
+    """Vizinhas que entram no IDW: sem a estação do próprio conjunto (ordem 0) e até raio_max_km."""
+    candidatas = vizinhas[vizinhas['ordem'] > 0]
+    if raio_max_km is not None:
+        candidatas = candidatas[candidatas['distancia_km'] <= raio_max_km]
+    return candidatas
+
+
+def idw_weights(vizinhas, potencia=POTENCIA_IDW, raio_max_km=RAIO_MAX_KM):
+    """
+    Matriz de pesos IDW (conjuntos × estações) das vizinhas de cada conjunto
+    (neighbour_stations). Linhas somam 1 (ou 0 sem vizinhas no raio).
+    """
+    candidatas = neighbour_stations(vizinhas, raio_max_km)
+    pesos = 1.0 / np.maximum(candidatas['distancia_km'].to_numpy(), DISTANCIA_MINIMA_KM) ** potencia
+    matriz = pd.DataFrame({
+        'Conjunto': candidatas['Conjunto'].to_numpy(), 'Estacao': candidatas['Estacao'].to_numpy(), 'peso': pesos
+    }).pivot_table(index='Conjunto', columns='Estacao', values='peso', aggfunc='sum', fill_value=0.0)
+    matriz = matriz.reindex(index=vizinhas['Conjunto'].unique(), fill_value=0.0)
+    soma = matriz.sum(axis=1).replace(0.0, 1.0)
+    return matriz.div(soma, axis=0)
+
+
+def idw_features(pesos, medicoes, colunas):
+    """
+    Medições IDW das vizinhas para todos os conjuntos e horas.
+
+    pesos: matriz conjuntos × estações de idw_weights.
+    medicoes: {estacao: DataFrame horário (índice UTC) com as colunas}.
+    Retorna {conjunto: DataFrame horário com '<coluna> vizinhas'}; horas sem
+    nenhuma vizinha medida ficam NaN. Para cada coluna há um único produto
+    pesos @ matriz (estações × horas), com os pesos renormalizados pelas
+    estações que têm medição em cada hora.
+    """
+    estacoes = [e for e in pesos.columns if e in medicoes]
+    if not estacoes:
+        return {conjunto: pd.DataFrame(columns=[f'{c} vizinhas' for c in colunas], dtype='float32')
+                for conjunto in pesos.index}
+    horas = medicoes[estacoes[0]].index
+    for estacao in estacoes[1:]:
+        horas = horas.union(medicoes[estacao].index)
+    W = pesos[estacoes].to_numpy('float64')
+
+    resultado = {}
+    for coluna in colunas:
+        V = np.vstack([medicoes[e][coluna].reindex(horas).to_numpy('float64') for e in estacoes])
+        medido = np.isfinite(V)
+        soma_pesos = W @ medido
+        with np.errstate(invalid='ignore', divide='ignore'):
+            resultado[coluna] = np.where(soma_pesos > 0, (W @ np.where(medido, V, 0.0)) / soma_pesos, np.nan)
+
+    return {
+        conjunto: pd.DataFrame(
+            {f'{coluna} vizinhas': resultado[coluna][i] for coluna in colunas}, index=horas
+        ).astype('float32')
+        for i, conjunto in enumerate(pesos.index)
+    }
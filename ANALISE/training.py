@@ -0,0 +1,285 @@
+"""
+Treinamento e avaliação genéricos: recebem o split já pronto de uma cidade
+e a especificação de um modelo do registro (model_registry.py), executam o
+GridSearchCV, gravam o registro da execução (metrics_store.py) e geram o
+relatório de texto a partir dele.
+"""
+import pandas as pd
+import numpy as np
+import os
+import time
+from sklearn.base import clone
+from sklearn.model_selection import GridSearchCV, ParameterGrid, StratifiedKFold, cross_val_predict
+from sklearn.metrics import (
+    accuracy_score, roc_auc_score, confusion_matrix,
+    classification_report, f1_score, precision_score, recall_score
+)
+from data_pipeline import MODEL_FEATURES, TARGET, preprocessing_version
+import xgb_quantizado
+import model_store
+import decision_threshold
+import metrics_store
+
+METRICAS_TEXTO = "A avaliação do desempenho dos modelos foi realizada por meio das métricas: \\textit{acurácia}, \\textit{precisão}, \\textit{revocação (recall)}, \\textit{F1-score} e \\textit{matriz de confusão}."
+
+
+def safe_city_name(cidade_nome):
+    """Garante que o nome da cidade pode ser usado em nomes de arquivo."""
+    return cidade_nome.replace(" ", "_").replace("/", "")
+
+
+def save_report(report_content, report_path, descricao="Relatório"):
+    try:
+        with open(report_path, 'w', encoding='utf-8') as f:
+            f.write(report_content)
+        print(f"\n[SUCESSO] {descricao} salvo em: {report_path}")
+    except Exception as e:
+        print(f"\n[ERRO] Falha ao salvar {descricao.lower()} em {report_path}: {e}")
+
+
+def dataset_summary(df_final, cidade_nome, spec):
+    """Campos comuns dos registros de execução: cidade, modelo, features e proporção das classes."""
+    return {
+        'cidade': cidade_nome,
+        'modelo': spec['sufixo'],
+        'nome_modelo': spec['nome'],
+        'importancia': spec['importancia'],
+        'features': list(MODEL_FEATURES),
+        'target': TARGET,
+        'n_amostras': len(df_final),
+        'n_positivos': int(df_final[TARGET].sum()),
+        'proporcao_positiva': float(df_final[TARGET].mean())
+    }
+
+
+def write_single_class_report(df_final, cidade_nome, spec):
+    """Registra e gera o relatório de erro quando o dataset da cidade só contém uma classe."""
+    y = df_final[TARGET]
+    print(f"  AVISO: Apenas UMA classe (Todos {y.iloc[0]}) encontrada para {cidade_nome}.")
+    print("  Treinamento abortado. Gerando relatório de classe única.")
+
+    registro = metrics_store.append_run({'tipo': 'classe_unica', **dataset_summary(df_final, cidade_nome, spec)})
+    report_filename = f"relatorio_{safe_city_name(cidade_nome)}_{spec['sufixo']}_ERRO_CLASSE_UNICA.txt"
+    save_report(render_single_class_report(registro), os.path.join(spec['saida_dir'], report_filename),
+                "Relatório de erro (classe única)")
+
+
+def render_single_class_report(registro):
+    """Relatório "dummy" de erro a partir de um registro do tipo 'classe_unica'."""
+    return f"""
+========================================================
+  RELATÓRIO DE TREINAMENTO {registro['nome_modelo']} (CLASSE ÚNICA)
+========================================================
+{METRICAS_TEXTO}
+--------------------------------------------------------
+Modelo treinado para a cidade: {registro['cidade']}
+Features utilizadas: {registro['features']}
+Target Column (Alvo): {registro['target']}
+        
+ERRO: Treinamento abortado.
+O dataset SÓ contém a classe 0 (Sem Interrupção).
+Total de amostras: {registro['n_amostras']}
+Total de eventos de interrupção real: {registro['n_positivos']}
+========================================================
+"""
+
+
+def train_and_evaluate_model(df_final, split, cidade_nome, spec):
+    """Treina o modelo descrito por spec com Grid Search no split dado e salva o relatório."""
+    X_train, X_test, y_train, y_test = split
+    print(f"\n[Treinamento] {spec['nome']} para: {cidade_nome}")
+
+    # --- Configuração do Grid Search ---
+    print(f"  3. Iniciando Grid Search para {spec['nome']} (pode levar alguns minutos)...")
+    param_grid = spec['param_grid']
+    
+    # Usando F1 como métrica de otimização
+    estimator = spec['build_estimator'](y_train)
+
+    inicio = time.time()
+    try:
+        if spec.get('matriz_quantizada'):
+            # XGBoost nativo: a matriz quantizada de cada fold é criada uma só vez
+            busca = xgb_quantizado.grid_search_xgb(estimator, param_grid, X_train, y_train, n_folds=3,
+                                                   modelo=spec['sufixo'])
+        else:
+            grid_search = GridSearchCV(estimator=estimator, param_grid=param_grid,
+                                       scoring='f1', cv=3, verbose=1, n_jobs=-1) # cv=3 para velocidade
+            grid_search.fit(X_train, y_train)
+            busca = {
+                'best_params': grid_search.best_params_,
+                'best_score': grid_search.best_score_,
+                'n_folds': grid_search.cv,
+                'best_estimator': grid_search.best_estimator_,
+                # Probabilidades out-of-fold da melhor combinação (mesmos folds do GridSearchCV)
+                'oof_proba': cross_val_predict(clone(grid_search.best_estimator_), X_train, y_train,
+                                               cv=StratifiedKFold(n_splits=3), method='predict_proba')[:, 1]
+            }
+    except ValueError as e:
+        print(f"  ERRO CRÍTICO durante o fit do GridSearchCV: {e}")
+        print("  Isso geralmente acontece se o 'cv' (cross-validation) não puder criar folds com ambas as classes.")
+        return
+    busca['tempo_busca'] = time.time() - inicio
+    busca['fits'] = busca['n_folds'] * len(ParameterGrid(param_grid))
+
+    print(f"  Melhores Hiperparâmetros encontrados: {busca['best_params']}")
+    print(f"  Melhor F1 na Validação Cruzada (CV): {busca['best_score']:.4f}")
+
+    # --- Limiar de decisão e avaliação no Conjunto de Teste ---
+    select_threshold(busca, y_train)
+    metricas = evaluate_model(busca['best_estimator'], X_test, y_test, busca['limiar']['limiar'])
+    write_report(df_final, cidade_nome, spec, busca, metricas)
+    persist_model(df_final, cidade_nome, spec, busca, y_train)
+
+
+def select_threshold(busca, y_train):
+    """Escolhe o limiar de decisão pelas probabilidades OOF da busca e o guarda em busca['limiar']."""
+    busca['limiar'] = decision_threshold.choose_threshold(y_train, busca.get('oof_proba'))
+    limiar = busca['limiar']
+    print(f"  Limiar de decisão ({limiar['criterio']}): {limiar['limiar']:.4f} | F1 OOF: {limiar['f1']:.4f} | "
+          f"Precisão OOF: {limiar['precisao']:.4f} | Recall OOF: {limiar['recall']:.4f}")
+    return limiar
+
+
+def persist_model(df_final, cidade_nome, spec, busca, y_train):
+    """Salva o melhor modelo com os metadados usados na pontuação e no retreino incremental."""
+    metadados = {
+        'cidade': cidade_nome,
+        'modelo': spec['sufixo'],
+        'features': list(MODEL_FEATURES),
+        'versao_preprocessamento': preprocessing_version(),
+        'limiar': busca['limiar']['limiar'],
+        'criterio_limiar': busca['limiar']['criterio'],
+        'best_params': busca['best_params'],
+        # Último instante de dados visto: o retreino incremental usa só o que vier depois
+        'dados_ate': df_final.index.max().isoformat(),
+        'contagem_classes': [int((y_train == 0).sum()), int((y_train == 1).sum())],
+        'atualizacoes': []
+    }
+    model_store.save_model(cidade_nome, spec['sufixo'], busca['best_estimator'], metadados)
+
+
+def evaluate_model(best_model, X_test, y_test, limiar=decision_threshold.LIMIAR_PADRAO):
+    """Calcula as métricas do modelo já treinado no conjunto de teste, com previsão = probabilidade >= limiar."""
+    print("  4. Avaliando o modelo no Conjunto de Teste...")
+    inicio = time.time()
+    
+    y_proba = best_model.predict_proba(X_test)[:, 1]
+    y_pred = (y_proba >= limiar).astype(int)
+    
+    try:
+        auc = roc_auc_score(y_test, y_proba)
+    except ValueError:
+        print("  AVISO: Não foi possível calcular o AUC (provavelmente o teste só tem uma classe).")
+        auc = 0.0 # Define AUC como 0 se falhar
+
+    return {
+        'accuracy': accuracy_score(y_test, y_pred),
+        'auc': auc,
+        'f1': f1_score(y_test, y_pred), # F1 para a classe positiva (1)
+        'precisao': precision_score(y_test, y_pred, zero_division=0),
+        'recall': recall_score(y_test, y_pred, zero_division=0),
+        # Referência: F1 com o limiar padrão de 0,5
+        'f1_padrao': f1_score(y_test, (y_proba >= decision_threshold.LIMIAR_PADRAO).astype(int)),
+        'conf_matrix': confusion_matrix(y_test, y_pred),
+        # Relatório de Classificação
+        'class_report': classification_report(
+            y_test, y_pred,
+            target_names=['0 (Sem Interrupção)', '1 (Com Interrupção)'],
+            zero_division=0
+        ),
+        # Importância das Features
+        'feature_importance': pd.Series(best_model.feature_importances_, index=MODEL_FEATURES).sort_values(ascending=False),
+        'tempo_avaliacao': time.time() - inicio
+    }
+
+
+def write_report(df_final, cidade_nome, spec, busca, metricas):
+    """
+    Grava o registro da execução (busca: best_params, best_score, n_folds,
+    limiar e tempos; métricas de teste) e salva o relatório de texto gerado
+    a partir dele.
+    """
+    registro = metrics_store.append_run({
+        'tipo': 'treino',
+        **dataset_summary(df_final, cidade_nome, spec),
+        'best_params': busca['best_params'],
+        'best_score': busca['best_score'],
+        'n_folds': busca['n_folds'],
+        'limiar': busca['limiar'],
+        'metricas_teste': {
+            chave: metricas[chave] for chave in ('accuracy', 'auc', 'f1', 'f1_padrao', 'precisao', 'recall')
+        },
+        'matriz_confusao': metricas['conf_matrix'],
+        'relatorio_classificacao': metricas['class_report'],
+        'importancia_features': metricas['feature_importance'].astype('float64').to_dict(),
+        'tempos': {
+            'busca_s': busca.get('tempo_busca'),
+            'cv_s': busca.get('tempo_cv'),
+            'fits': busca.get('fits'),
+            'avaliacao_s': metricas['tempo_avaliacao']
+        }
+    })
+
+    # Exibe resumo no terminal
+    print("\n  5. Relatório de Treinamento Gerado (Salvo em arquivo):")
+    print(f"  Acurácia no Teste: {metricas['accuracy']:.4f}")
+    print(f"  F1-Score (Classe 1) no Teste: {metricas['f1']:.4f}")
+    
+    # Salvar o relatório
+    report_filename = f"relatorio_{safe_city_name(cidade_nome)}_{spec['sufixo']}.txt"
+    save_report(render_report(registro), os.path.join(spec['saida_dir'], report_filename))
+
+
+def render_report(registro):
+    """Relatório de texto de um registro do tipo 'treino' (metrics_store.py)."""
+    limiar = registro['limiar']
+    teste = registro['metricas_teste']
+    importancia = pd.Series(registro['importancia_features'], dtype='float64')
+    return f"""
+========================================================
+  RELATÓRIO DE TREINAMENTO {registro['nome_modelo']} (EVENTOS REAIS)
+========================================================
+{METRICAS_TEXTO}
+--------------------------------------------------------
+Modelo treinado para a cidade: {registro['cidade']}
+Features utilizadas: {registro['features']}
+Target Column (Alvo): {registro['target']}
+Proporção Positiva (Interrupções Reais no dataset total): {registro['proporcao_positiva'] * 100:.2f}%
+(Baseado em {registro['n_positivos']} eventos positivos em {registro['n_amostras']} amostras)
+--------------------------------------------------------
+Melhores Hiperparâmetros (GridSearch CV={registro['n_folds']} Folds):
+{registro['best_params']}
+
+Melhor F1 na Validação Cruzada (CV): {registro['best_score']:.4f}
+--------------------------------------------------------
+Limiar de Decisão (probabilidades out-of-fold, critério {limiar['criterio']}):
+Limiar: {limiar['limiar']:.4f}
+F1 OOF: {_fmt(limiar['f1'])} | Precisão OOF: {_fmt(limiar['precisao'])} | Recall OOF: {_fmt(limiar['recall'])}
+--------------------------------------------------------
+Métricas no Conjunto de Teste (20%, limiar {limiar['limiar']:.4f}):
+
+Acurácia: {teste['accuracy']:.4f}
+AUC: {teste['auc']:.4f}
+F1-Score (Classe 1): {teste['f1']:.4f}
+F1-Score (Classe 1, limiar padrão 0,5): {teste['f1_padrao']:.4f}
+--------------------------------------------------------
+Matriz de Confusão (Teste):
+  [Verdadeiro Negativo (TN)   Falso Positivo (FP)]
+  [Falso Negativo (FN)      Verdadeiro Positivo (TP)]
+{np.array(registro['matriz_confusao'])}
+
+Relatório de Classificação (Teste):
+{registro['relatorio_classificacao']}
+--------------------------------------------------------
+Importância das Features ({registro['importancia']}):
+{importancia.to_string(float_format='{:.6f}'.format)}
+--------------------------------------------------------
+Registro: {registro['id_execucao']} ({registro['registrado_em']})
+========================================================
+"""
+
+
+def _fmt(valor):
+    """Métrica com 4 casas (None quando não calculada, como no limiar padrão)."""
+    return 'n/d' if valor is None or (isinstance(valor, float) and np.isnan(valor)) else f'{valor:.4f}'
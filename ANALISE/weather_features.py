@@ -0,0 +1,171 @@
+"""
+Features derivadas do DataFrame horário do INMET: janelas móveis (somas,
+máximos e variações) e codificação da hora do dia e da estação do ano.
+
+Modo em lote (window_features): cada janela é calculada para todas as horas
+com operações vetorizadas. As janelas são temporais, (t - h, t], e respeitam
+as horas ausentes do INMET: a soma é a diferença de duas posições da soma
+acumulada (localizadas com searchsorted), o máximo usa o rolling temporal
+do pandas e a variação compara com a hora exata t - h (NaN se ela faltar).
+
+Modo incremental (new_stream_state + stream_features): para pontuação em
+streaming, cada nova hora atualiza as janelas em O(1) amortizado (soma
+acumulada com fila das horas da janela, fila monotônica para o máximo e
+histórico das últimas horas para a variação), sem recalcular o histórico.
+Os dois modos usam as mesmas operações em float64 e produzem os mesmos valores.
+"""
+from collections import deque
+import numpy as np
+import pandas as pd
+
+HORA_NS = 3_600_000_000_000
+
+# Janelas móveis, em horas
+JANELAS_HORAS = [3, 6, 24, 72]
+# Operações de janela por coluna do INMET: 'soma', 'max' e 'delta' (valor
+# atual menos o de h horas antes; na pressão, a tendência barométrica)
+OPERACOES_JANELA = {
+    'Chuva (mm)': ['soma', 'max'],
+    'Raj. Vento (m/s)': ['max'],
+    'Vel. Vento (m/s)': ['max'],
+    'Temp. Ins. (C)': ['delta'],
+    'Pressao Ins. (hPa)': ['delta']
+}
+# Fuso da hora do dia (ciclo diário local) e duração média do ano
+FUSO_LOCAL = 'America/Sao_Paulo'
+DIAS_ANO = 365.25
+CODIFICACOES = ['hora_sin', 'hora_cos', 'estacao_sin', 'estacao_cos']
+
+
+def derived_feature_names(janelas=JANELAS_HORAS, operacoes=OPERACOES_JANELA):
+    """Nomes das features derivadas, na ordem em que são geradas."""
+    nomes = [f'{coluna} {op} {h}h' for coluna, ops in operacoes.items() for op in ops for h in janelas]
+    return nomes + CODIFICACOES
+
+
+def _horas(index):
+    """Horas (inteiras) desde a época de um DatetimeIndex horário em UTC."""
+    return pd.DatetimeIndex(index).as_unit('ns').asi8 // HORA_NS
+
+
+def time_encodings(index):
+    """Seno/cosseno da hora local e do dia do ano (continuidade entre 23h e 0h, dezembro e janeiro)."""
+    local = pd.DatetimeIndex(index).tz_convert(FUSO_LOCAL)
+    angulo_hora = 2 * np.pi * local.hour.to_numpy('float64') / 24
+    angulo_dia = 2 * np.pi * (local.dayofyear.to_numpy('float64') - 1) / DIAS_ANO
+    return {
+        'hora_sin': np.sin(angulo_hora), 'hora_cos': np.cos(angulo_hora),
+        'estacao_sin': np.sin(angulo_dia), 'estacao_cos': np.cos(angulo_dia)
+    }
+
+
+def window_features(df_hourly, janelas=JANELAS_HORAS, operacoes=OPERACOES_JANELA):
+    """DataFrame horário com as features derivadas acrescentadas (float32), calculadas em lote."""
+    horas = _horas(df_hourly.index)
+    n = len(horas)
+    novas = {}
+    for coluna, ops in operacoes.items():
+        valores = df_hourly[coluna].to_numpy('float64')
+        serie = pd.Series(valores, index=df_hourly.index)
+        acumulado = np.cumsum(valores)
+        for op in ops:
+            for h in janelas:
+                if op == 'soma':
+                    # Soma em (t - h, t] = acumulado em t - acumulado na última hora <= t - h
+                    inicio = np.searchsorted(horas, horas - h, side='right')
+                    anterior = np.where(inicio > 0, acumulado[np.maximum(inicio - 1, 0)], 0.0)
+                    resultado = acumulado - anterior
+                elif op == 'max':
+                    resultado = serie.rolling(f'{h}h').max().to_numpy()
+                elif op == 'delta':
+                    pos = np.minimum(np.searchsorted(horas, horas - h), max(n - 1, 0))
+                    achou = (horas[pos] == horas - h) if n else np.zeros(0, dtype=bool)
+                    resultado = np.where(achou, valores - valores[pos], np.nan)
+                else:
+                    raise ValueError(f"Operação de janela desconhecida: {op}")
+                novas[f'{coluna} {op} {h}h'] = resultado
+    novas.update(time_encodings(df_hourly.index))
+    derivadas = pd.DataFrame(novas, index=df_hourly.index).astype('float32')
+    return pd.concat([df_hourly, derivadas], axis=1)
+
+
+def new_stream_state(janelas=JANELAS_HORAS, operacoes=OPERACOES_JANELA):
+    """Estado vazio do modo incremental (um por estação/cidade)."""
+    colunas = {}
+    for coluna, ops in operacoes.items():
+        colunas[coluna] = {
+            'acumulado': 0.0,
+            # Por janela: horas ainda dentro dela com o acumulado em cada uma, e o acumulado antes dela
+            'somas': {h: {'fila': deque(), 'base': 0.0} for h in janelas} if 'soma' in ops else {},
+            # Por janela: fila monotônica (valores decrescentes) de (hora, valor)
+            'maximos': {h: deque() for h in janelas} if 'max' in ops else {},
+            # Valores das últimas max(janelas) horas, para as variações
+            'historico': {} if 'delta' in ops else None,
+            'ordem': deque()
+        }
+    return {'janelas': list(janelas), 'operacoes': operacoes, 'ultima_hora': None, 'colunas': colunas}
+
+
+def _update_column(estado_coluna, ops, janelas, hora, valor, saida):
+    """Atualiza as janelas de uma coluna com a nova hora e acrescenta as features em 'saida'."""
+    estado_coluna['acumulado'] += valor
+    acumulado = estado_coluna['acumulado']
+    for h, janela in estado_coluna['somas'].items():
+        fila = janela['fila']
+        fila.append((hora, acumulado))
+        while fila[0][0] <= hora - h:
+            janela['base'] = fila.popleft()[1]
+    for h, fila in estado_coluna['maximos'].items():
+        while fila and fila[-1][1] <= valor:
+            fila.pop()
+        fila.append((hora, valor))
+        while fila[0][0] <= hora - h:
+            fila.popleft()
+    historico = estado_coluna['historico']
+    if historico is not None:
+        historico[hora] = valor
+        estado_coluna['ordem'].append(hora)
+        while estado_coluna['ordem'][0] < hora - max(janelas):
+            del historico[estado_coluna['ordem'].popleft()]
+
+    for op in ops:
+        for h in janelas:
+            if op == 'soma':
+                saida.append(acumulado - estado_coluna['somas'][h]['base'])
+            elif op == 'max':
+                saida.append(estado_coluna['maximos'][h][0][1])
+            else:
+                anterior = historico.get(hora - h)
+                saida.append(np.nan if anterior is None else valor - anterior)
+
+
+def stream_features(estado, df_hourly):
+    """
+    Acrescenta as features derivadas às novas horas de df_hourly, continuando
+    as janelas do estado (que é atualizado). As horas devem ser posteriores à
+    última hora já vista; caso contrário nada é atualizado e ValueError é levantado.
+    """
+    horas = _horas(df_hourly.index)
+    if len(horas) == 0:
+        return window_features(df_hourly, estado['janelas'], estado['operacoes'])
+    if np.any(np.diff(horas) <= 0) or (estado['ultima_hora'] is not None and horas[0] <= estado['ultima_hora']):
+        raise ValueError("As observações devem estar em ordem cronológica e ser posteriores às já recebidas.")
+
+    janelas = estado['janelas']
+    operacoes = estado['operacoes']
+    colunas = list(operacoes)
+    valores = df_hourly[colunas].to_numpy('float64').tolist()
+    linhas = []
+    for hora, valores_hora in zip(horas.tolist(), valores):
+        saida = []
+        for coluna, valor in zip(colunas, valores_hora):
+            _update_column(estado['colunas'][coluna], operacoes[coluna], janelas, hora, valor, saida)
+        linhas.append(saida)
+    estado['ultima_hora'] = int(horas[-1])
+
+    nomes = derived_feature_names(janelas, operacoes)[:-len(CODIFICACOES)]
+    derivadas = pd.DataFrame(np.array(linhas, dtype='float64').reshape(len(horas), len(nomes)),
+                             columns=nomes, index=df_hourly.index)
+    for nome, valores_codificados in time_encodings(df_hourly.index).items():
+        derivadas[nome] = valores_codificados
+    return pd.concat([df_hourly, derivadas.astype('float32')], axis=1)
@@ -0,0 +1,149 @@
+"""
+Treinamento nativo do XGBoost com matriz quantizada reutilizada.
+
+No GridSearchCV, cada fit do XGBClassifier reconstrói a DMatrix e os cortes
+do histograma (tree_method='hist') a partir das mesmas fatias do pandas. Aqui
+a QuantileDMatrix de treino e a DMatrix de validação de cada fold são criadas
+uma única vez por processo e reutilizadas por todas as combinações de
+hiperparâmetros; cada fit vira apenas um xgb.train sobre a matriz pronta.
+
+Os parâmetros vêm do próprio XGBClassifier (get_xgb_params), então o modelo
+treinado é o mesmo que o wrapper do sklearn produziria.
+"""
+import time
+import numpy as np
+import xgboost as xgb
+from sklearn.base import clone
+from sklearn.metrics import f1_score
+from sklearn.model_selection import ParameterGrid, StratifiedKFold
+import evaluation_ledger
+
+# Quantos conjuntos de dados (cidades) cada processo mantém em cache. O
+# agendador intercala os fits das cidades no mesmo worker, então o cache
+# guarda as matrizes das MAX_CONJUNTOS_CACHE cidades usadas mais recentemente
+# e descarta a menos recente ao chegar outra; a memória fica limitada
+MAX_CONJUNTOS_CACHE = 3
+
+# {chave_dados: {(fold, max_bin): (dtrain, dvalid, y_valid)}}, na ordem de uso (LRU)
+_MATRIZES = {}
+
+
+def limpar_cache():
+    _MATRIZES.clear()
+
+
+def matrizes_fold(chave_dados, X_train, y_train, folds, fold, max_bin=None):
+    """
+    Retorna (dtrain, dvalid, y_valid) do fold, criando-os só na primeira chamada.
+    A validação usa os cortes de quantis do treino (ref=dtrain), como o wrapper.
+    """
+    # Move o conjunto para o fim (mais recente) da ordem do cache
+    matrizes = _MATRIZES.pop(chave_dados, {})
+    while len(_MATRIZES) >= MAX_CONJUNTOS_CACHE:
+        _MATRIZES.pop(next(iter(_MATRIZES)))
+    _MATRIZES[chave_dados] = matrizes
+
+    chave = (fold, max_bin)
+    if chave not in matrizes:
+        idx_treino, idx_valid = folds[fold]
+        kwargs = {'max_bin': max_bin} if max_bin else {}
+        dtrain = xgb.QuantileDMatrix(X_train.iloc[idx_treino], label=y_train.iloc[idx_treino], **kwargs)
+        dvalid = xgb.QuantileDMatrix(X_train.iloc[idx_valid], label=y_train.iloc[idx_valid], ref=dtrain, **kwargs)
+        matrizes[chave] = (dtrain, dvalid, y_train.iloc[idx_valid].to_numpy())
+    return matrizes[chave]
+
+
+def parametros_nativos(estimator, params):
+    """Converte XGBClassifier + combinação da grade em (params do xgb.train, num_boost_round)."""
+    modelo = clone(estimator).set_params(**params)
+    nativos = {k: v for k, v in modelo.get_xgb_params().items() if v is not None}
+    nativos.pop('early_stopping_rounds', None)
+    return nativos, modelo.get_num_boosting_rounds(), nativos.get('max_bin')
+
+
+def treinar_fold(estimator, params, chave_dados, X_train, y_train, folds, fold, early_stopping=None):
+    """
+    Treina uma combinação em um fold sobre as matrizes em cache.
+    Retorna (F1 de validação, best_iteration ou None, probabilidades de validação).
+    """
+    nativos, n_rodadas, max_bin = parametros_nativos(estimator, params)
+    dtrain, dvalid, y_valid = matrizes_fold(chave_dados, X_train, y_train, folds, fold, max_bin)
+
+    kwargs = {}
+    if early_stopping:
+        kwargs = {'evals': [(dvalid, 'validacao')], 'early_stopping_rounds': early_stopping, 'verbose_eval': False}
+    booster = xgb.train(nativos, dtrain, num_boost_round=n_rodadas, **kwargs)
+
+    best_iteration = booster.best_iteration if early_stopping else None
+    iteracoes = (0, best_iteration + 1) if early_stopping else (0, 0)
+    y_proba = booster.predict(dvalid, iteration_range=iteracoes)
+    # Mesmo limiar do XGBClassifier.predict
+    return f1_score(y_valid, (y_proba > 0.5).astype(int)), best_iteration, y_proba
+
+
+def xgb_cv(estimator, params, chave_dados, X_train, y_train, folds, early_stopping=None, ledger=None, celula=None):
+    """
+    Avalia uma combinação em todos os folds no próprio processo (no estilo do xgb.cv).
+    Retorna (F1 por fold, best_iteration por fold, probabilidades out-of-fold).
+    Com um ledger (evaluation_ledger.py), celula(fold) é a chave de cada fold:
+    folds já gravados são reaproveitados e os novos são gravados ao terminar.
+    """
+    scores, iteracoes = [], []
+    oof = np.full(len(y_train), np.nan, dtype='float32')
+    for fold in range(len(folds)):
+        chave = celula(fold) if ledger is not None else None
+        resultado = evaluation_ledger.lookup(ledger, chave)
+        if resultado is None:
+            inicio = time.time()
+            score, best_iteration, y_proba = treinar_fold(estimator, params, chave_dados, X_train, y_train,
+                                                          folds, fold, early_stopping)
+            resultado = {'score': score, 'erro': None, 'tempo': time.time() - inicio,
+                         'best_iteration': best_iteration, 'proba': y_proba}
+            evaluation_ledger.store(ledger, chave, resultado)
+        scores.append(resultado['score'])
+        iteracoes.append(resultado['best_iteration'])
+        oof[folds[fold][1]] = resultado['proba']
+    return scores, iteracoes, oof
+
+
+def grid_search_xgb(estimator, param_grid, X_train, y_train, n_folds=3, chave_dados='treino', modelo='xgboost'):
+    """
+    Substituto do GridSearchCV(scoring='f1') para o XGBoost: mesmos folds
+    (StratifiedKFold sem shuffle), mesmo critério de escolha, mas com as
+    matrizes quantizadas de cada fold construídas uma só vez. Os folds já
+    avaliados (mesmas células do agendador no ledger) não são refeitos.
+    Retorna o dicionário da busca (best_params, best_score, n_folds, best_estimator
+    e oof_proba, as probabilidades out-of-fold da melhor combinação).
+    """
+    folds = list(StratifiedKFold(n_splits=n_folds).split(np.zeros(len(y_train)), y_train))
+    candidatos = list(ParameterGrid(param_grid))
+    print(f"Fitting {n_folds} folds for each of {len(candidatos)} candidates, totalling "
+          f"{n_folds * len(candidatos)} fits (matriz quantizada reutilizada)")
+
+    dados = evaluation_ledger.dataset_hash(X_train, y_train, n_folds)
+    variante = {'recurso': None, 'early_stopping': None, 'quantizado': True}
+    ledger = evaluation_ledger.open_ledger()
+    medias, oofs = [], []
+    try:
+        for params in candidatos:
+            celula = lambda fold, params=params: evaluation_ledger.cell_key(dados, modelo, estimator, params,
+                                                                            fold, variante)
+            scores, _, oof = xgb_cv(estimator, params, chave_dados, X_train, y_train, folds,
+                                    ledger=ledger, celula=celula)
+            medias.append(np.mean(scores))
+            oofs.append(oof)
+    finally:
+        limpar_cache()
+        if ledger is not None:
+            ledger.close()
+    melhor = int(np.nanargmax(medias))
+    best_params = candidatos[melhor]
+    best_estimator = clone(estimator).set_params(**best_params)
+    best_estimator.fit(X_train, y_train)
+    return {
+        'best_params': best_params,
+        'best_score': float(medias[melhor]),
+        'n_folds': n_folds,
+        'best_estimator': best_estimator,
+        'oof_proba': oofs[melhor]
+    }
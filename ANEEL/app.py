@@ -1,71 +1,243 @@
 import pandas as pd
-import re
+import pyarrow as pa
+import pyarrow.parquet as pq
 import os
+import sys
+import json
+import hashlib
+import shutil
+from functools import partial
+from urllib.parse import quote
+import regras
+
+# Manifesto e execução da filtragem incremental, compartilhados com INMET/app.py
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'COMUM'))
+from filtragem_incremental import remover_outro_formato, executar_filtragem, imprimir_resumo
 
 DATA_DIR = "Data"
 DATA_FILTRADO = "Data/Filtrados"
 
-conjuntos = [
-    'Passo Fundo 1',
-    'Santa Maria',
-    'SANTA MARIA',
-    'SANTA MARIA 1',
-    'SANTA MARIA 2',
-    'SANTA MARIA 4',
-    'SANTA MARIA 5',
-    'Lagoa Vermelha'
+# Modo streaming: lê o CSV nacional em blocos de CHUNKSIZE linhas, mantendo
+# apenas COLUNAS_UTILIZADAS, para que o pico de memória dependa do tamanho
+# do bloco e não do tamanho do arquivo anual.
+MODO_STREAMING = False
+CHUNKSIZE = 200_000
+
+# Formato dos arquivos filtrados: 'csv' (texto separado por ';') ou
+# 'parquet' (colunar, com datas, números e categorias já tipados)
+FORMATO_SAIDA = 'csv'
+
+# Número de processos usados para filtrar os arquivos anuais em paralelo
+# (1 = execução sequencial no processo atual)
+N_WORKERS = 1
+
+# Layout particionado no estilo Hive (DATA_PARTICIONADO/conjunto=<x>/ano=<y>/),
+# sempre em Parquet, para que os carregadores leiam só as partições da
+# cidade/ano desejados em vez do arquivo anual com todos os conjuntos.
+PARTICIONAR = False
+DATA_PARTICIONADO = os.path.join(DATA_FILTRADO, 'particionado')
+
+# Reprocessamento incremental: o manifesto guarda tamanho, mtime e hash de
+# cada arquivo de entrada e a versão das regras (ARQUIVO_REGRAS) usadas.
+# Só são refiltrados os arquivos novos ou alterados, ou todos quando as
+# regras mudam.
+INCREMENTAL = True
+ARQUIVO_MANIFESTO = os.path.join(DATA_FILTRADO, 'manifesto.json')
+# Incrementar ao alterar a lógica de filtragem (invalida todas as saídas)
+VERSAO_FILTRO = 1
+
+# Colunas efetivamente usadas pelos scripts de ANALISE e GRAFICOS
+COLUNAS_UTILIZADAS = [
+    'SigAgente',
+    'DscConjuntoUnidadeConsumidora',
+    'DscTipoInterrupcao',
+    'IdeMotivoInterrupcao',
+    'DatInicioInterrupcao',
+    'DatFimInterrupcao',
+    'NumUnidadeConsumidora',
+    'DscFatoGeradorInterrupcao'
 ]
 
-valores_excluir = [
-    "Interna;Nao Programada;Terceiros;Ligacao clandestina",
-    "Interna;Nao Programada;Meio Ambiente;Animais",
-    "Interna;Nao Programada;Terceiros;Empresas de servicos publicos ou suas contratadas",
-    "Interna;Programada;Manutencao;Preventiva",
-    "Interna;Nao Programada;Falha Operacional;Servico mal executado",
-    "Interna;Nao Programada;Nao classificada",
-    "Interna;Nao Programada;Proprias do Sistema;Nao identificada",
-    "Interna;Nao Programada;Terceiros;Defeito interno nao afetando outras unidades consumidoras",
-    "Interna;Programada;Alteracao;Para melhoria",
-    "Interna;Programada;Manutencao;Corretiva",
-    "Interna;Nao Programada;Terceiros;Vandalismo",
-    "Interna;Programada;Alteracao;Para ampliacao"
+# Tipos usados na saída Parquet (as demais colunas viram categorias)
+COLUNAS_DATA = ['DatGeracaoConjuntoDados', 'DatInicioInterrupcao', 'DatFimInterrupcao']
+COLUNAS_NUMERICAS = [
+    'IdeConjuntoUnidadeConsumidora',
+    'NumOrdemInterrupcao',
+    'IdeMotivoInterrupcao',
+    'NumNivelTensao',
+    'NumUnidadeConsumidora',
+    'NumConsumidorConjunto',
+    'NumAno'
 ]
 
+# Regras de inclusão/exclusão/renomeação (agentes, conjuntos e causas).
+# Novos conjuntos ou distribuidoras são adicionados editando o JSON.
+ARQUIVO_REGRAS = "regras_filtro.json"
+REGRAS = regras.carregar_regras(ARQUIVO_REGRAS)
+
+def filtrar_interrupcoes(df):
+    """Aplica as regras de agente, conjuntos, causas excluídas e renomeação a um DataFrame (ou bloco)."""
+    return regras.aplicar_regras(df, REGRAS)
+
+def colunas_leitura():
+    """Colunas lidas no modo streaming: as usadas depois mais as referenciadas pelas regras."""
+    return set(COLUNAS_UTILIZADAS) | set(regras.colunas_usadas(REGRAS))
+
+def tipar_interrupcoes(df):
+    """Converte as colunas de texto em datas, números (vírgula decimal) e categorias."""
+    df = df.copy()
+    for col in df.columns:
+        if col in COLUNAS_DATA:
+            df[col] = pd.to_datetime(df[col], errors='coerce')
+        elif col in COLUNAS_NUMERICAS:
+            # float64 mesmo para inteiros, para manter o mesmo tipo em todos os blocos
+            df[col] = pd.to_numeric(df[col].str.replace(',', '.', regex=False), errors='coerce').astype('float64')
+        else:
+            df[col] = df[col].astype('category')
+    return df
+
+def schema_parquet(df):
+    """Schema fixo para a escrita em blocos (categorias sempre como dicionário de strings)."""
+    campos = []
+    for col in df.columns:
+        if col in COLUNAS_DATA:
+            campos.append((col, pa.timestamp('ns')))
+        elif col in COLUNAS_NUMERICAS:
+            campos.append((col, pa.float64()))
+        else:
+            campos.append((col, pa.dictionary(pa.int32(), pa.string())))
+    return pa.schema(campos)
+
+def salvar_filtrado(df, output_file):
+    if output_file.endswith('.parquet'):
+        df_tipado = tipar_interrupcoes(df)
+        df_tipado.to_parquet(output_file, index=False, schema=schema_parquet(df_tipado))
+    else:
+        df.to_csv(output_file, index=False, sep=';')
+    remover_outro_formato(output_file)
+
 def processar_csv_aneel(input_file, output_file):
     df = pd.read_csv(input_file, sep=';', dtype=str, encoding='latin1', low_memory=False)
-    df_rge_sul = df[
-        df['SigAgente'].str.contains('RGE SUL', na=False) &
-        df['DscConjuntoUnidadeConsumidora'].isin(conjuntos)
-    ]
-    
-    regex_excluir = "|".join(map(re.escape, valores_excluir))
-    df_rge_sul = df_rge_sul[~df_rge_sul['DscFatoGeradorInterrupcao'].str.contains(regex_excluir, na=False)]
-
-    df_rge_sul.loc[
-        df_rge_sul['DscConjuntoUnidadeConsumidora'].str.upper().str.startswith('SANTA MARIA', na=False), 
-        'DscConjuntoUnidadeConsumidora'
-    ] = 'Santa Maria'
-
-    df_rge_sul.loc[
-        df_rge_sul['DscConjuntoUnidadeConsumidora'].str.upper().str.startswith('PASSO FUNDO', na=False), 
-        'DscConjuntoUnidadeConsumidora'
-    ] = 'Passo Fundo'
-
-    df_rge_sul.to_csv(output_file, index=False, sep=';')
-    print(f'✅ Arquivo salvo: {output_file}')
-
-def processar_todos_csvs():
-    if not os.path.exists(DATA_FILTRADO):
-        os.makedirs(DATA_FILTRADO)
-    for file in os.listdir(DATA_DIR):
+    df_rge_sul = filtrar_interrupcoes(df)
+    salvar_filtrado(df_rge_sul, output_file)
+    return len(df_rge_sul)
+
+def processar_csv_aneel_streaming(input_file, output_file, chunksize=CHUNKSIZE):
+    """Filtra o CSV em blocos, lendo só as colunas de colunas_leitura() e anexando cada bloco filtrado à saída."""
+    leitor = pd.read_csv(
+        input_file, sep=';', dtype=str, encoding='latin1',
+        usecols=lambda col, colunas=colunas_leitura(): col in colunas, chunksize=chunksize
+    )
+    parquet = output_file.endswith('.parquet')
+    # Escreve em um arquivo temporário para não deixar saída parcial em caso de erro
+    temp_file = output_file + '.tmp'
+    total = 0
+    primeiro_bloco = True
+    writer = None
+    try:
+        with leitor:
+            for bloco in leitor:
+                bloco_filtrado = filtrar_interrupcoes(bloco)
+                if parquet:
+                    bloco_tipado = tipar_interrupcoes(bloco_filtrado)
+                    if writer is None:
+                        schema = schema_parquet(bloco_tipado)
+                        writer = pq.ParquetWriter(temp_file, schema)
+                    writer.write_table(pa.Table.from_pandas(bloco_tipado, schema=schema, preserve_index=False))
+                else:
+                    bloco_filtrado.to_csv(
+                        temp_file, index=False, sep=';',
+                        mode='w' if primeiro_bloco else 'a', header=primeiro_bloco
+                    )
+                primeiro_bloco = False
+                total += len(bloco_filtrado)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    if primeiro_bloco:
+        # Arquivo sem linhas: grava apenas o cabeçalho
+        vazio = pd.DataFrame(columns=COLUNAS_UTILIZADAS, dtype=str)
+        if parquet:
+            vazio = tipar_interrupcoes(vazio)
+            vazio.to_parquet(temp_file, index=False, schema=schema_parquet(vazio))
+        else:
+            vazio.to_csv(temp_file, index=False, sep=';')
+
+    os.replace(temp_file, output_file)
+    remover_outro_formato(output_file)
+    return total
+
+def escrever_particoes(output_file, particionado_dir=DATA_PARTICIONADO):
+    """
+    Reescreve as partições conjunto=<x>/ano=<y> a partir da saída anual já filtrada.
+    As partições antigas do mesmo ano são removidas antes, para não sobrar conjunto
+    que deixou de passar pelas regras.
+    """
+    ano = os.path.splitext(os.path.basename(output_file))[0].split('_')[-1]
+    if output_file.endswith('.parquet'):
+        df = pd.read_parquet(output_file)
+    else:
+        df = tipar_interrupcoes(pd.read_csv(output_file, sep=';', dtype=str))
+
+    if os.path.isdir(particionado_dir):
+        for pasta_conjunto in os.listdir(particionado_dir):
+            pasta_ano = os.path.join(particionado_dir, pasta_conjunto, f'ano={ano}')
+            if os.path.isdir(pasta_ano):
+                shutil.rmtree(pasta_ano)
+
+    coluna = 'DscConjuntoUnidadeConsumidora'
+    for conjunto, df_conjunto in df.groupby(coluna, sort=True, observed=True):
+        pasta = os.path.join(particionado_dir, f'conjunto={quote(str(conjunto), safe="")}', f'ano={ano}')
+        os.makedirs(pasta, exist_ok=True)
+        df_conjunto.to_parquet(os.path.join(pasta, 'parte-0.parquet'), index=False, schema=schema_parquet(df_conjunto))
+    return df[coluna].nunique()
+
+def versao_regras(modo_streaming=MODO_STREAMING, particionar=PARTICIONAR):
+    """Hash das regras de filtragem; qualquer mudança força o reprocessamento."""
+    definicao = {
+        'versao': VERSAO_FILTRO,
+        'regras': REGRAS['config'],
+        'colunas': sorted(colunas_leitura()) if modo_streaming else None,
+        'particionado': particionar
+    }
+    return hashlib.sha256(json.dumps(definicao, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+def listar_arquivos_aneel(formato=FORMATO_SAIDA):
+    """Retorna os pares (entrada, saída) de cada arquivo anual encontrado em DATA_DIR."""
+    tarefas = []
+    for file in sorted(os.listdir(DATA_DIR)):
         if file.endswith('.csv') and file.startswith('interrupcoes-energia-eletrica-'):
             ano = file.split('-')[-1].replace('.csv', '')
             input_path = os.path.join(DATA_DIR, file)
-            output_path = os.path.join(DATA_FILTRADO, f'interrupcoes_rge_sul_filtrado_{ano}.csv')
-            try:
-                processar_csv_aneel(input_path, output_path)
-            except Exception as e:
-                print(f'❌ Erro ao processar {input_path}: {e}')
+            output_path = os.path.join(DATA_FILTRADO, f'interrupcoes_rge_sul_filtrado_{ano}.{formato}')
+            tarefas.append((input_path, output_path))
+    return tarefas
+
+def processar_arquivo(input_path, output_path, modo_streaming=MODO_STREAMING, chunksize=CHUNKSIZE, particionar=PARTICIONAR):
+    """Filtra um arquivo anual e, se pedido, reescreve as partições (processar de executar_filtragem)."""
+    if modo_streaming:
+        resultado = {'registros': processar_csv_aneel_streaming(input_path, output_path, chunksize=chunksize)}
+    else:
+        resultado = {'registros': processar_csv_aneel(input_path, output_path)}
+    if particionar:
+        resultado['particoes'] = escrever_particoes(output_path)
+    return resultado
+
+def processar_todos_csvs(modo_streaming=MODO_STREAMING, chunksize=CHUNKSIZE, n_workers=N_WORKERS,
+                         formato=FORMATO_SAIDA, incremental=INCREMENTAL, particionar=PARTICIONAR):
+    """
+    Filtra todos os arquivos anuais, em paralelo quando n_workers > 1.
+    No modo incremental, pula as entradas que não mudaram desde a última execução.
+    Retorna um resumo com o resultado de cada arquivo.
+    """
+    if not os.path.exists(DATA_FILTRADO):
+        os.makedirs(DATA_FILTRADO)
+    return executar_filtragem(
+        listar_arquivos_aneel(formato),
+        partial(processar_arquivo, modo_streaming=modo_streaming, chunksize=chunksize, particionar=particionar),
+        ARQUIVO_MANIFESTO, versao_regras(modo_streaming, particionar), n_workers, incremental
+    )
 
 if __name__ == "__main__":
-    processar_todos_csvs()
\ No newline at end of file
+    imprimir_resumo(processar_todos_csvs())
@@ -0,0 +1,123 @@
+"""
+Motor de regras de filtragem dos dados da ANEEL.
+
+As regras ficam em um arquivo JSON (regras_filtro.json) com três listas:
+  - "incluir":  mantém a linha só se TODAS as regras casarem;
+  - "excluir":  descarta a linha se QUALQUER regra casar;
+  - "renomear": substitui o valor da coluna pelo novo nome do padrão que casar.
+
+Cada regra tem "coluna", "operador" ('igual', 'contem' ou 'comeca_com'),
+"valores" (lista, ou dicionário padrão -> novo nome em "renomear") e,
+opcionalmente, "ignorar_caixa".
+
+As regras são compiladas uma vez e avaliadas sobre os valores DISTINTOS de
+cada coluna (pd.factorize / códigos da categoria). O resultado por valor é
+memorizado e expandido para as linhas pelos códigos, então o custo depende
+do número de valores distintos, não do número de linhas.
+"""
+import json
+import numpy as np
+import pandas as pd
+
+OPERADORES = ('igual', 'contem', 'comeca_com')
+
+
+def _casador(operador, padroes):
+    """Retorna uma função que diz se um valor (já normalizado) casa com os padrões."""
+    if operador == 'igual':
+        conjunto = frozenset(padroes)
+        return lambda valor: valor in conjunto
+    if operador == 'contem':
+        padroes = tuple(padroes)
+        return lambda valor: any(padrao in valor for padrao in padroes)
+    if operador == 'comeca_com':
+        prefixos = tuple(padroes)
+        return lambda valor: valor.startswith(prefixos)
+    raise ValueError(f"Operador desconhecido: {operador!r} (use um de {OPERADORES})")
+
+
+def _memorizar(funcao):
+    """Memoriza o resultado por valor distinto, inclusive entre blocos diferentes."""
+    cache = {}
+
+    def funcao_memorizada(valor):
+        if valor not in cache:
+            cache[valor] = funcao(valor)
+        return cache[valor]
+    return funcao_memorizada
+
+
+def _compilar_predicado(regra):
+    normalizar = str.upper if regra.get('ignorar_caixa', False) else str
+    casa = _casador(regra.get('operador', 'igual'), [normalizar(v) for v in regra['valores']])
+    return _memorizar(lambda valor: casa(normalizar(valor)))
+
+
+def _compilar_renomeacao(regra):
+    normalizar = str.upper if regra.get('ignorar_caixa', False) else str
+    operador = regra.get('operador', 'igual')
+    # Um casador por padrão, na ordem do arquivo (o primeiro que casar vence)
+    pares = [(_casador(operador, [normalizar(padrao)]), novo) for padrao, novo in regra['valores'].items()]
+
+    def renomear(valor):
+        valor_normalizado = normalizar(valor)
+        for casa, novo in pares:
+            if casa(valor_normalizado):
+                return novo
+        return valor
+    return _memorizar(renomear)
+
+
+def compilar_regras(config):
+    """Compila o dicionário de configuração em listas de (coluna, função)."""
+    return {
+        'config': config,
+        'incluir': [(regra['coluna'], _compilar_predicado(regra)) for regra in config.get('incluir', [])],
+        'excluir': [(regra['coluna'], _compilar_predicado(regra)) for regra in config.get('excluir', [])],
+        'renomear': [(regra['coluna'], _compilar_renomeacao(regra)) for regra in config.get('renomear', [])]
+    }
+
+
+def carregar_regras(caminho):
+    with open(caminho, 'r', encoding='utf-8') as f:
+        return compilar_regras(json.load(f))
+
+
+def colunas_usadas(regras):
+    """Colunas referenciadas pelas regras (precisam ser lidas mesmo no modo com projeção)."""
+    colunas = []
+    for tipo in ('incluir', 'excluir', 'renomear'):
+        for coluna, _ in regras[tipo]:
+            if coluna not in colunas:
+                colunas.append(coluna)
+    return colunas
+
+
+def _fatorar(serie):
+    """Códigos por linha (-1 = nulo) e valores distintos da coluna."""
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        return serie.cat.codes.to_numpy(), serie.cat.categories
+    return pd.factorize(serie)
+
+
+def _avaliar(serie, predicado):
+    codigos, distintos = _fatorar(serie)
+    # O último elemento (False) é o resultado dos nulos, indexado pelo código -1
+    por_valor = np.fromiter((predicado(v) for v in distintos), dtype=bool, count=len(distintos))
+    return np.append(por_valor, False)[codigos]
+
+
+def aplicar_regras(df, regras):
+    """Aplica as regras de inclusão, exclusão e renomeação a um DataFrame (ou bloco)."""
+    mascara = np.ones(len(df), dtype=bool)
+    for coluna, predicado in regras['incluir']:
+        mascara &= _avaliar(df[coluna], predicado)
+    for coluna, predicado in regras['excluir']:
+        mascara &= ~_avaliar(df[coluna], predicado)
+
+    df_filtrado = df[mascara].copy()
+    for coluna, renomear in regras['renomear']:
+        codigos, distintos = _fatorar(df_filtrado[coluna])
+        novos = np.array([renomear(v) for v in distintos] + [np.nan], dtype=object)
+        df_filtrado[coluna] = novos[codigos]
+    return df_filtrado
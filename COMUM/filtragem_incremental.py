@@ -0,0 +1,161 @@
+"""
+Filtragem incremental compartilhada por INMET/app.py e ANEEL/app.py.
+
+O manifesto (JSON) guarda, para cada saída, a entrada usada, seu tamanho,
+mtime e hash e a versão das regras (calculada por cada app em versao_regras).
+executar_filtragem pula as entradas que não mudaram, processa as demais
+(em paralelo quando n_workers > 1) e atualiza o manifesto no processo principal.
+
+Cada app fornece só a função que filtra um arquivo: processar(entrada, saida)
+devolve um dict com 'registros' (e outros campos do resultado, se houver).
+"""
+import os
+import time
+import json
+import hashlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+
+def remover_outro_formato(output_path):
+    """Remove a saída do outro formato para que os leitores não usem um arquivo desatualizado."""
+    base, ext = os.path.splitext(output_path)
+    outro = base + ('.csv' if ext == '.parquet' else '.parquet')
+    if os.path.exists(outro):
+        os.remove(outro)
+
+
+def hash_arquivo(caminho, tamanho_bloco=1 << 20):
+    sha = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(tamanho_bloco), b''):
+            sha.update(bloco)
+    return sha.hexdigest()
+
+
+def assinatura_arquivo(caminho):
+    st = os.stat(caminho)
+    return {'tamanho': st.st_size, 'mtime_ns': st.st_mtime_ns}
+
+
+def carregar_manifesto(caminho):
+    if not os.path.exists(caminho):
+        return {}
+    try:
+        with open(caminho, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f'⚠️ Manifesto inválido ({e}), todos os arquivos serão reprocessados.')
+        return {}
+
+
+def salvar_manifesto(manifesto, caminho):
+    # Descarta registros cujas saídas não existem mais
+    manifesto = {saida: registro for saida, registro in manifesto.items() if os.path.exists(saida)}
+    temp = caminho + '.tmp'
+    with open(temp, 'w', encoding='utf-8') as f:
+        json.dump(manifesto, f, indent=2, sort_keys=True)
+    os.replace(temp, caminho)
+
+
+def precisa_reprocessar(input_path, output_path, manifesto, versao):
+    """Compara a entrada com o manifesto: tamanho e mtime primeiro, hash só se o mtime mudou."""
+    registro = manifesto.get(output_path)
+    if registro is None or not os.path.exists(output_path):
+        return True
+    if registro['entrada'] != input_path or registro['versao_regras'] != versao:
+        return True
+    assinatura = assinatura_arquivo(input_path)
+    if assinatura['tamanho'] != registro['tamanho']:
+        return True
+    if assinatura['mtime_ns'] == registro['mtime_ns']:
+        return False
+    # mtime mudou (ex.: arquivo baixado de novo): compara o conteúdo
+    if hash_arquivo(input_path) == registro['hash']:
+        registro['mtime_ns'] = assinatura['mtime_ns']
+        return False
+    return True
+
+
+def executar_tarefa(processar, input_path, output_path):
+    """Filtra um arquivo com processar e devolve o resultado (sucesso ou erro) em vez de imprimir."""
+    inicio = time.perf_counter()
+    resultado = {'entrada': input_path, 'saida': output_path, 'sucesso': False, 'ignorado': False, 'registros': 0, 'erro': None}
+    try:
+        resultado['assinatura'] = {**assinatura_arquivo(input_path), 'hash': hash_arquivo(input_path)}
+        os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+        resultado.update(processar(input_path, output_path))
+        resultado['sucesso'] = True
+    except Exception as e:
+        resultado['erro'] = f'{type(e).__name__}: {e}'
+    resultado['tempo'] = time.perf_counter() - inicio
+    return resultado
+
+
+def imprimir_resumo(resumo):
+    for resultado in resumo['resultados']:
+        if resultado['ignorado']:
+            print(f"⏭️ Sem alterações: {resultado['saida']}")
+        elif resultado['sucesso']:
+            print(f"✅ Arquivo filtrado salvo: {resultado['saida']} ({resultado['registros']} registros, {resultado['tempo']:.1f}s)")
+        else:
+            print(f"❌ Erro ao filtrar {resultado['entrada']}: {resultado['erro']}")
+    print(f"Resumo: {resumo['sucesso']}/{resumo['total']} arquivos filtrados ({resumo['ignorados']} sem alterações), {resumo['erros']} com erro ({resumo['tempo']:.1f}s)")
+
+
+def executar_filtragem(pares, processar, caminho_manifesto, versao, n_workers=1, incremental=True):
+    """
+    Filtra os pares (entrada, saída) com processar, em paralelo quando n_workers > 1
+    (processar deve ser serializável: função do módulo ou functools.partial).
+    No modo incremental, pula as entradas que não mudaram desde a última execução.
+    Retorna um resumo com o resultado de cada arquivo.
+    """
+    inicio = time.perf_counter()
+    manifesto = carregar_manifesto(caminho_manifesto) if incremental else {}
+    tarefas = []
+    resultados = []
+    for input_path, output_path in pares:
+        if incremental and not precisa_reprocessar(input_path, output_path, manifesto, versao):
+            resultados.append({
+                'entrada': input_path, 'saida': output_path, 'sucesso': True, 'ignorado': True,
+                'registros': manifesto[output_path].get('registros', 0), 'erro': None, 'tempo': 0.0
+            })
+        else:
+            tarefas.append((input_path, output_path))
+
+    if n_workers is None or n_workers > 1:
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            futuros = [
+                pool.submit(executar_tarefa, processar, input_path, output_path)
+                for input_path, output_path in tarefas
+            ]
+            for futuro in as_completed(futuros):
+                resultados.append(futuro.result())
+    else:
+        for input_path, output_path in tarefas:
+            resultados.append(executar_tarefa(processar, input_path, output_path))
+
+    # O manifesto é atualizado só aqui, no processo principal
+    for resultado in resultados:
+        if resultado['ignorado']:
+            continue
+        if resultado['sucesso']:
+            manifesto[resultado['saida']] = {
+                'entrada': resultado['entrada'],
+                'versao_regras': versao,
+                'registros': resultado['registros'],
+                **resultado['assinatura']
+            }
+        else:
+            manifesto.pop(resultado['saida'], None)
+    salvar_manifesto(manifesto, caminho_manifesto)
+
+    resultados.sort(key=lambda r: r['entrada'])
+    sucesso = sum(r['sucesso'] for r in resultados)
+    return {
+        'total': len(resultados),
+        'sucesso': sucesso,
+        'ignorados': sum(r['ignorado'] for r in resultados),
+        'erros': len(resultados) - sucesso,
+        'tempo': time.perf_counter() - inicio,
+        'resultados': resultados
+    }
@@ -1,51 +1,33 @@
 import os
-import re
-import glob
+import sys
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 
-def parse_report(file_path):
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-
-        if 'xgboost' in os.path.basename(file_path).lower():
-            model_name = 'XGBOOST'
-        elif 'random_forest' in os.path.basename(file_path).lower():
-            model_name = 'RANDOM FOREST'
-        else:
-            model_name = 'Desconhecido'
-
-        city_match = re.search(r'relatorio_(.*)_(xgboost|random_forest)\.txt', os.path.basename(file_path), re.IGNORECASE)
-        city_name = city_match.group(1).replace('_', ' ').title() if city_match else 'Desconhecida'
-
-        matrix_match = re.search(r'\[\[\s*(\d+)\s+(\d+)\]\s*\[\s*(\d+)\s+(\d+)\]\]', content)
-        if not matrix_match:
-            print(f"Aviso: Não foi possível encontrar a matriz no arquivo: {file_path}")
-            return None
-
-        tn = int(matrix_match.group(1))
-        fp = int(matrix_match.group(2))
-        fn = int(matrix_match.group(3))
-        tp = int(matrix_match.group(4))
-        matrix = np.array([[tn, fp], [fn, tp]])
-
-        return {
-            'city': city_name,
-            'model': model_name,
-            'matrix': matrix
+# Leitura dos registros de execução do treinamento (ANALISE/metrics_store.py)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'ANALISE'))
+import metrics_store
+
+# Pasta dos registros gravados pelo treinamento, um JSON por linha em execucoes.jsonl
+METRICAS_DIR = '../../ANALISE/Data/Metricas'
+METRICAS_PATH = metrics_store.runs_path(METRICAS_DIR)
+
+def load_latest_runs(metricas_dir=METRICAS_DIR):
+    """Matriz de confusão do treino mais recente de cada cidade × modelo no arquivo de execuções."""
+    return [
+        {
+            'city': run['cidade'],
+            'model': run['nome_modelo'],
+            'matrix': np.array(run['matriz_confusao'])
         }
-
-    except Exception as e:
-        print(f"Erro ao processar o arquivo {file_path}: {e}")
-        return None
+        for run in metrics_store.latest_runs(metrics_store.load_runs(metricas_dir))
+    ]
 
 def plot_confusion_matrices(results, save_path):
     cities = sorted(list(set(r['city'] for r in results)))
     models = ['XGBOOST', 'RANDOM FOREST']
 
-    fig, axes = plt.subplots(nrows=len(cities), ncols=len(models), figsize=(12, 18))
+    fig, axes = plt.subplots(nrows=len(cities), ncols=len(models), figsize=(12, 6 * len(cities)), squeeze=False)
     fig.suptitle('Comparação de Matrizes de Confusão (Teste)', fontsize=20, y=1.02)
 
     for row, city in enumerate(cities):
@@ -79,25 +61,13 @@ def plot_confusion_matrices(results, save_path):
     print(f"✅ Gráfico salvo em: {save_path}")
 
 if __name__ == "__main__":
-    report_dirs = [
-        '../../ANALISE/Data/XGBoost',
-        '../../ANALISE/Data/Random Forest'
-    ]
-
-    file_paths = []
-    for d in report_dirs:
-        file_paths.extend(glob.glob(os.path.join(d, '*.txt')))
-
-    if not file_paths:
-        print("Nenhum arquivo .txt encontrado nos diretórios de relatório.")
-        print("Por favor, coloque os arquivos de relatório nas pastas XGBoost e Random Forest.")
+    if not os.path.exists(METRICAS_PATH):
+        print(f"Arquivo de execuções não encontrado: {METRICAS_PATH}")
+        print("Execute o treinamento (ANALISE/app_treinamento.py) para gerar os registros.")
     else:
-        results = []
-        for path in file_paths:
-            data = parse_report(path)
-            if data:
-                results.append(data)
-
+        results = load_latest_runs()
         if results:
             save_path = os.path.join('../Images/ANALISE', 'matriz_confusao_comparativo.png')
-            plot_confusion_matrices(results, save_path)
\ No newline at end of file
+            plot_confusion_matrices(results, save_path)
+        else:
+            print("Nenhum registro de treinamento encontrado no arquivo de execuções.")
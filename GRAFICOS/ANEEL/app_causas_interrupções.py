@@ -1,26 +1,15 @@
 import os
-import pandas as pd
 import matplotlib.pyplot as plt
+from cubo_interrupcoes import carregar_cubo, consultar
 
-# Diretório dos arquivos ANEEL filtrados
-aneel_filtrados_dir = '../../ANEEL/Data/Filtrados'
-anos = ['2020', '2021', '2022', '2023', '2024']
+# Contagens vindas do cubo pré-agregado (cubo_interrupcoes.py)
+cubo = carregar_cubo()
 
-df_list = []
-for ano in anos:
-    arq = os.path.join(aneel_filtrados_dir, f'interrupcoes_rge_sul_filtrado_{ano}.csv')
-    if os.path.exists(arq):
-        df = pd.read_csv(arq, sep=';', dtype=str)
-        df['Ano'] = ano
-        df_list.append(df)
-
-if not df_list:
+if cubo.empty:
     print("Nenhum arquivo encontrado.")
     exit()
 
-df_total = pd.concat(df_list, ignore_index=True)
-cidade_col = 'DscConjuntoUnidadeConsumidora'
-contagem = df_total[cidade_col].value_counts().sort_values(ascending=False)
+contagem = consultar(cubo, 'cidade').sort_values(ascending=False)
 
 images_dir = os.path.join('../Images', 'ANEEL')
 os.makedirs(images_dir, exist_ok=True)
@@ -1,45 +1,18 @@
-import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 import os
+from cubo_interrupcoes import carregar_cubo, consultar
 
-DATA_FILTRADOS = "../../ANEEL/Data/Filtrados"
+# --- Processamento de Dados ---
+# Contagens vindas do cubo pré-agregado (cubo_interrupcoes.py), em vez de recarregar os arquivos anuais
+cubo = carregar_cubo()
 
-arquivos_csv = [
-    'interrupcoes_rge_sul_filtrado_2020.csv',
-    'interrupcoes_rge_sul_filtrado_2021.csv',
-    'interrupcoes_rge_sul_filtrado_2022.csv',
-    'interrupcoes_rge_sul_filtrado_2023.csv',
-    'interrupcoes_rge_sul_filtrado_2024.csv',
-]
-
-# Função para carregar e agregar dados (reutilizada de scripts anteriores)
-def carregar_e_agregar_dados(arquivos):
-    """Carrega todos os arquivos CSV e os concatena."""
-    dfs = []
-    for arquivo in arquivos:
-        caminho = os.path.join(DATA_FILTRADOS, arquivo)
-        try:
-            # Lendo com o separador correto e forçando a leitura como string para evitar erros
-            df = pd.read_csv(caminho, sep=';', dtype=str, encoding='latin1', low_memory=False)
-            
-            # Extrai o ano do nome do arquivo
-            df['Ano'] = int(arquivo.split('_')[-1].split('.')[0])
-            dfs.append(df)
-        except FileNotFoundError:
-            print(f"⚠️ Aviso: Arquivo não encontrado: {caminho}")
-    return pd.concat(dfs, ignore_index=True)
-
-# --- 2. Processamento de Dados ---
-
-df_total = carregar_e_agregar_dados(arquivos_csv)
-
-if df_total.empty:
+if cubo.empty:
     print("Nenhum dado encontrado para processamento.")
     exit()
 
 # Contagem de interrupções por ano
-contagem_por_ano = df_total['Ano'].value_counts().sort_index()
+contagem_por_ano = consultar(cubo, 'Ano').sort_index()
 
 # Garante que a pasta Images existe
 images_dir = '../Images/ANEEL'
@@ -0,0 +1,156 @@
+"""
+Cubo de interrupções da ANEEL compartilhado pelos gráficos de GRAFICOS/ANEEL.
+
+Uma única passada pelos arquivos filtrados (ANEEL/app.py) agrega as
+interrupções por cidade (conjunto) × causa × ano × mês × hora do dia, com a
+contagem, a duração total, os consumidores afetados e os consumidor-horas.
+O cubo é gravado em CUBO_PATH (Parquet compacto) e reconstruído
+automaticamente quando algum arquivo filtrado muda (nome, tamanho ou mtime).
+
+Os gráficos leem o cubo com carregar_cubo() e agregam com consultar(), em vez
+de recarregar todos os arquivos anuais.
+
+Uso direto: python cubo_interrupcoes.py   (reconstrói o cubo)
+"""
+import os
+import json
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+DATA_FILTRADOS = "../../ANEEL/Data/Filtrados"
+ANOS = [2020, 2021, 2022, 2023, 2024]
+CUBO_PATH = "../Data/ANEEL/cubo_interrupcoes.parquet"
+# Incrementar ao mudar a agregação (força a reconstrução do cubo)
+VERSAO_CUBO = 1
+
+DIMENSOES = ['cidade', 'causa', 'Ano', 'mes', 'hora']
+MEDIDAS = ['n_interrupcoes', 'duracao_horas', 'consumidores', 'consumidor_horas']
+COLUNAS_LEITURA = [
+    'DscConjuntoUnidadeConsumidora',
+    'DscFatoGeradorInterrupcao',
+    'DatInicioInterrupcao',
+    'DatFimInterrupcao',
+    'NumUnidadeConsumidora'
+]
+
+
+def arquivos_filtrados(anos=ANOS):
+    """{ano: caminho} dos arquivos filtrados existentes (a versão Parquet tem prioridade)."""
+    arquivos = {}
+    for ano in anos:
+        caminho = os.path.join(DATA_FILTRADOS, f'interrupcoes_rge_sul_filtrado_{ano}.csv')
+        caminho_parquet = os.path.splitext(caminho)[0] + '.parquet'
+        if os.path.exists(caminho_parquet):
+            arquivos[ano] = caminho_parquet
+        elif os.path.exists(caminho):
+            arquivos[ano] = caminho
+        else:
+            print(f"⚠️ Aviso: Arquivo não encontrado: {caminho}")
+    return arquivos
+
+
+def assinatura(arquivos):
+    """Identifica as entradas do cubo (versão + nome, tamanho e mtime de cada arquivo)."""
+    return json.dumps({
+        'versao': VERSAO_CUBO,
+        'arquivos': {str(ano): [os.path.basename(c), os.path.getsize(c), os.path.getmtime(c)]
+                     for ano, c in arquivos.items()}
+    }, sort_keys=True)
+
+
+def ler_ano(caminho):
+    """Lê só as colunas do cubo de um arquivo filtrado (Parquet tipado ou CSV em texto)."""
+    if caminho.endswith('.parquet'):
+        existentes = set(pq.read_schema(caminho).names)
+        df = pd.read_parquet(caminho, columns=[c for c in COLUNAS_LEITURA if c in existentes])
+    else:
+        try:
+            df = pd.read_csv(caminho, sep=';', dtype=str, usecols=lambda c: c in COLUNAS_LEITURA)
+        except UnicodeDecodeError:
+            df = pd.read_csv(caminho, sep=';', dtype=str, encoding='latin1', usecols=lambda c: c in COLUNAS_LEITURA)
+    # Arquivos filtrados antigos podem não ter a data de fim ou os consumidores
+    return df.reindex(columns=COLUNAS_LEITURA)
+
+
+def agregar_ano(df, ano):
+    """Agrega as interrupções de um ano nas dimensões do cubo (mês e hora -1 quando a data é inválida)."""
+    inicio = pd.to_datetime(df['DatInicioInterrupcao'], errors='coerce')
+    fim = pd.to_datetime(df['DatFimInterrupcao'], errors='coerce')
+    duracao = (fim - inicio).dt.total_seconds() / 3600
+    consumidores = pd.to_numeric(df['NumUnidadeConsumidora'].astype('string').str.replace(',', '.', regex=False),
+                                 errors='coerce')
+    linhas = pd.DataFrame({
+        'cidade': df['DscConjuntoUnidadeConsumidora'].astype('string').str.strip(),
+        'causa': df['DscFatoGeradorInterrupcao'].astype('string').str.replace('"', '', regex=False).str.strip(),
+        'Ano': ano,
+        'mes': inicio.dt.month.fillna(-1).astype('int8'),
+        'hora': inicio.dt.hour.fillna(-1).astype('int8'),
+        'n_interrupcoes': 1,
+        'duracao_horas': duracao,
+        'consumidores': consumidores,
+        'consumidor_horas': duracao * consumidores
+    })
+    return linhas.groupby(DIMENSOES, dropna=False, sort=False)[MEDIDAS].sum().reset_index()
+
+
+def construir_cubo(arquivos):
+    """Uma passada pelos arquivos filtrados: {ano: caminho} -> DataFrame do cubo."""
+    partes = [agregar_ano(ler_ano(caminho), ano) for ano, caminho in arquivos.items()]
+    if not partes:
+        return pd.DataFrame(columns=DIMENSOES + MEDIDAS)
+    cubo = pd.concat(partes, ignore_index=True)
+    return cubo.astype({
+        'cidade': 'category', 'causa': 'category', 'Ano': 'int16',
+        'n_interrupcoes': 'int32', 'duracao_horas': 'float32', 'consumidores': 'float64',
+        'consumidor_horas': 'float64'
+    })
+
+
+def salvar_cubo(cubo, assinatura_entradas, caminho=CUBO_PATH):
+    """Grava o cubo (arquivo temporário + os.replace) com a assinatura das entradas nos metadados."""
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    tabela = pa.Table.from_pandas(cubo, preserve_index=False)
+    metadados = dict(tabela.schema.metadata or {}, assinatura=assinatura_entradas)
+    temporario = caminho + '.tmp'
+    pq.write_table(tabela.replace_schema_metadata(metadados), temporario)
+    os.replace(temporario, caminho)
+
+
+def carregar_cubo(anos=ANOS, caminho=CUBO_PATH, reconstruir=False):
+    """
+    Retorna o cubo, reconstruindo-o se os arquivos filtrados mudaram desde a
+    última gravação (ou com reconstruir=True). Sem arquivos filtrados, usa o
+    cubo gravado, se houver.
+    """
+    arquivos = arquivos_filtrados(anos)
+    if not arquivos:
+        return pd.read_parquet(caminho) if os.path.exists(caminho) else construir_cubo({})
+
+    assinatura_entradas = assinatura(arquivos)
+    if not reconstruir and os.path.exists(caminho):
+        metadados = pq.read_schema(caminho).metadata or {}
+        if metadados.get(b'assinatura', b'').decode('utf-8') == assinatura_entradas:
+            return pd.read_parquet(caminho)
+
+    print(f"[Cubo] Agregando {len(arquivos)} arquivo(s) filtrado(s) da ANEEL...")
+    cubo = construir_cubo(arquivos)
+    salvar_cubo(cubo, assinatura_entradas, caminho)
+    print(f"[Cubo] {len(cubo)} células gravadas em: {caminho} ({os.path.getsize(caminho) / 1024:.1f} KB)")
+    return cubo
+
+
+def consultar(cubo, por, filtros=None, medida='n_interrupcoes'):
+    """
+    Soma de 'medida' agrupada pelas dimensões 'por' (nome ou lista), após os
+    filtros {dimensão: valor ou lista de valores}.
+    Ex.: consultar(cubo, 'Ano', {'cidade': 'Santa Maria'}, 'consumidores').
+    """
+    for dimensao, valor in (filtros or {}).items():
+        valores = valor if isinstance(valor, (list, tuple, set)) else [valor]
+        cubo = cubo[cubo[dimensao].isin(valores)]
+    return cubo.groupby(por, observed=True)[medida].sum()
+
+
+if __name__ == "__main__":
+    carregar_cubo(reconstruir=True)
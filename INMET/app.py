@@ -1,53 +1,211 @@
 import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
 import os
+import sys
+import json
+import hashlib
+from functools import partial
+
+# Manifesto e execução da filtragem incremental, compartilhados com ANEEL/app.py
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'COMUM'))
+from filtragem_incremental import remover_outro_formato, executar_filtragem, imprimir_resumo
+
+# Formato dos arquivos filtrados: 'csv' (texto separado por ';') ou
+# 'parquet' (colunar). Nos dois casos a saída já vem normalizada: índice
+# 'Datetime' em UTC e medições em float32 (ponto decimal), de modo que os
+# scripts de ANALISE não precisam mais tratar strings.
+FORMATO_SAIDA = 'csv'
+
+# Modo streaming: cada arquivo é lido em blocos de CHUNKSIZE linhas, só com
+# COLUNAS_PRINCIPAIS, e cada bloco filtrado é anexado à saída. O pico de
+# memória passa a depender do tamanho do bloco, não do histórico da estação.
+MODO_STREAMING = False
+CHUNKSIZE = 100_000
+
+# Colunas que não podem estar vazias para a linha ser mantida
+COLUNAS_OBRIGATORIAS = ["Raj. Vento (m/s)", "Chuva (mm)"]
+
+# Formatos de data encontrados nos arquivos do INMET
+FORMATOS_DATA = ['%d/%m/%Y', '%Y-%m-%d', '%Y/%m/%d']
+
+# Número de processos usados para filtrar os arquivos das estações em paralelo
+# (1 = execução sequencial no processo atual)
+N_WORKERS = 1
+
+# Reprocessamento incremental: o manifesto (em <filtrados_dir>/manifesto.json)
+# guarda tamanho, mtime e hash de cada arquivo de entrada e a versão das regras.
+# Só são refiltrados os arquivos novos ou alterados, ou todos quando as regras mudam.
+INCREMENTAL = True
+NOME_MANIFESTO = 'manifesto.json'
+# Incrementar ao alterar a lógica de filtragem (invalida todas as saídas)
+VERSAO_FILTRO = 2
+
+COLUNAS_PRINCIPAIS = [
+    "Data", "Hora (UTC)", "Temp. Ins. (C)", "Temp. Max. (C)", "Temp. Min. (C)",
+    "Umi. Ins. (%)", "Umi. Max. (%)", "Umi. Min. (%)",
+    "Pto Orvalho Ins. (C)", "Pto Orvalho Max. (C)", "Pto Orvalho Min. (C)",
+    "Pressao Ins. (hPa)", "Pressao Max. (hPa)", "Pressao Min. (hPa)",
+    "Vel. Vento (m/s)", "Dir. Vento (m/s)", "Raj. Vento (m/s)",
+    "Radiacao (KJ/m²)", "Chuva (mm)"
+]
+
+def tipar_dados_inmet(df):
+    """
+    Normaliza um bloco filtrado: Data + Hora (UTC) viram o índice 'Datetime'
+    (com fuso UTC) e as medições (vírgula decimal) viram float32.
+    """
+    data = df['Data'].astype(str).str.strip()
+    # Hora vem como "0000", "0000 UTC" ou "00:00"
+    hora = df['Hora (UTC)'].astype(str).str.replace(r'\D', '', regex=True).str[:4].str.zfill(4)
+    datetime = pd.Series(pd.NaT, index=df.index, dtype='datetime64[ns]')
+    for formato in FORMATOS_DATA:
+        faltantes = datetime.isna()
+        if not faltantes.any():
+            break
+        datetime[faltantes] = pd.to_datetime(
+            data[faltantes] + ' ' + hora[faltantes], format=f'{formato} %H%M', errors='coerce'
+        )
+
+    df_tipado = pd.DataFrame(index=pd.DatetimeIndex(datetime, name='Datetime').tz_localize('UTC'))
+    for col in df.columns:
+        if col in ('Data', 'Hora (UTC)'):
+            continue
+        # float32 mesmo para colunas inteiras, para manter o mesmo tipo em todos os blocos
+        df_tipado[col] = pd.to_numeric(
+            df[col].astype(str).str.replace('"', '', regex=False).str.replace(',', '.', regex=False).str.strip(),
+            errors='coerce'
+        ).astype('float32').to_numpy()
+    return df_tipado[df_tipado.index.notna()]
+
+
+def filtrar_bloco(df):
+    """Mantém só COLUNAS_PRINCIPAIS e descarta as linhas com rajada ou chuva vazias (máscaras vetorizadas)."""
+    df = df[[col for col in COLUNAS_PRINCIPAIS if col in df.columns]]
+    mascara = np.ones(len(df), dtype=bool)
+    for col in COLUNAS_OBRIGATORIAS:
+        if col not in df.columns:
+            # Sem a coluna não há como validar a linha: nada é mantido
+            mascara[:] = False
+            break
+        mascara &= df[col].fillna('').str.strip().ne('').to_numpy()
+    return df[mascara]
+
 
 def filtrar_dados_csv(input_path, output_path):
-    colunas_principais = [
-        "Data", "Hora (UTC)", "Temp. Ins. (C)", "Temp. Max. (C)", "Temp. Min. (C)",
-        "Umi. Ins. (%)", "Umi. Max. (%)", "Umi. Min. (%)",
-        "Pto Orvalho Ins. (C)", "Pto Orvalho Max. (C)", "Pto Orvalho Min. (C)",
-        "Pressao Ins. (hPa)", "Pressao Max. (hPa)", "Pressao Min. (hPa)",
-        "Vel. Vento (m/s)", "Dir. Vento (m/s)", "Raj. Vento (m/s)",
-        "Radiacao (KJ/m²)", "Chuva (mm)"
-    ]
     try:
         df = pd.read_csv(input_path, sep=';', dtype=str, on_bad_lines="skip")
     except Exception as e:
-        print(f'⚠️ Erro ao ler {input_path} ({e}), tentando pular linhas problemáticas...')
-        return
+        raise ValueError(f'Erro ao ler {input_path} ({e})') from e
 
-    df = df[[col for col in colunas_principais if col in df.columns]]
+    df_filtrado = tipar_dados_inmet(filtrar_bloco(df))
 
-    # Filtra apenas se "Raj. Vento (m/s)" ou "Chuva (mm)" estão vazias ou NaN
-    col_vento = "Raj. Vento (m/s)"
-    col_chuva = "Chuva (mm)"
-    cond_vento = df[col_vento].isna() | (df[col_vento].astype(str).str.strip() == '') if col_vento in df.columns else pd.Series([True]*len(df))
-    cond_chuva = df[col_chuva].isna() | (df[col_chuva].astype(str).str.strip() == '') if col_chuva in df.columns else pd.Series([True]*len(df))
-    df_filtrado = df[~(cond_vento | cond_chuva)]
+    if output_path.endswith('.parquet'):
+        df_filtrado.to_parquet(output_path)
+    else:
+        df_filtrado.to_csv(output_path, sep=';')
 
-    df_filtrado.to_csv(output_path, index=False, sep=';')
+    remover_outro_formato(output_path)
+    return len(df_filtrado)
 
 
-def filtrar_todos_csvs(data_dir='Data', filtrados_dir='Data/Filtrados'):
-    if not os.path.exists(filtrados_dir):
-        os.makedirs(filtrados_dir)
+def filtrar_dados_csv_streaming(input_path, output_path, chunksize=CHUNKSIZE):
+    """Versão em blocos de filtrar_dados_csv: lê só COLUNAS_PRINCIPAIS e anexa cada bloco filtrado à saída."""
+    parquet = output_path.endswith('.parquet')
+    # Escreve em um arquivo temporário para não deixar saída parcial em caso de erro
+    temp_path = output_path + '.tmp'
+    total = 0
+    primeiro_bloco = True
+    writer = None
+    try:
+        leitor = pd.read_csv(
+            input_path, sep=';', dtype=str, on_bad_lines="skip",
+            usecols=lambda col: col in COLUNAS_PRINCIPAIS, chunksize=chunksize
+        )
+        try:
+            with leitor:
+                for bloco in leitor:
+                    bloco_filtrado = tipar_dados_inmet(filtrar_bloco(bloco))
+                    if parquet:
+                        tabela = pa.Table.from_pandas(bloco_filtrado, preserve_index=True)
+                        if writer is None:
+                            writer = pq.ParquetWriter(temp_path, tabela.schema)
+                        writer.write_table(tabela)
+                    else:
+                        bloco_filtrado.to_csv(
+                            temp_path, sep=';',
+                            mode='w' if primeiro_bloco else 'a', header=primeiro_bloco
+                        )
+                    primeiro_bloco = False
+                    total += len(bloco_filtrado)
+        finally:
+            if writer is not None:
+                writer.close()
+    except Exception as e:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise ValueError(f'Erro ao ler {input_path} ({e})') from e
+
+    if primeiro_bloco:
+        # Arquivo só com cabeçalho: grava a saída vazia com as colunas projetadas
+        vazio = tipar_dados_inmet(filtrar_bloco(pd.read_csv(input_path, sep=';', dtype=str, nrows=0)))
+        if parquet:
+            vazio.to_parquet(temp_path)
+        else:
+            vazio.to_csv(temp_path, sep=';')
+
+    os.replace(temp_path, output_path)
+    remover_outro_formato(output_path)
+    return total
+
+
+def versao_regras():
+    """Hash das regras de filtragem; qualquer mudança força o reprocessamento."""
+    regras = {'versao': VERSAO_FILTRO, 'colunas': COLUNAS_PRINCIPAIS, 'obrigatorias': COLUNAS_OBRIGATORIAS}
+    return hashlib.sha256(json.dumps(regras, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+def listar_arquivos_inmet(data_dir='Data', filtrados_dir='Data/Filtrados', formato=FORMATO_SAIDA):
+    """Percorre data_dir e retorna os pares (entrada, saída) de cada CSV de estação."""
+    tarefas = []
     for root, dirs, files in os.walk(data_dir):
         if 'Filtrados' in root:
             continue
-        for file in files:
+        dirs.sort()
+        for file in sorted(files):
             if file.endswith('.csv'):
                 input_path = os.path.join(root, file)
                 rel_path = os.path.relpath(root, data_dir)
                 out_dir = os.path.join(filtrados_dir, rel_path) if rel_path != '.' else filtrados_dir
-                if not os.path.exists(out_dir):
-                    os.makedirs(out_dir)
                 nome_base = os.path.splitext(file)[0]
-                output_path = os.path.join(out_dir, f'{nome_base}_filtrado.csv')
-                try:
-                    filtrar_dados_csv(input_path, output_path)
-                    print(f'✅ Arquivo filtrado salvo: {output_path}')
-                except Exception as e:
-                    print(f'❌ Erro ao filtrar {input_path}: {e}')
+                output_path = os.path.join(out_dir, f'{nome_base}_filtrado.{formato}')
+                tarefas.append((input_path, output_path))
+    return tarefas
+
+
+def filtrar_arquivo(input_path, output_path, modo_streaming=MODO_STREAMING, chunksize=CHUNKSIZE):
+    """Filtra um arquivo de estação (processar de executar_filtragem)."""
+    if modo_streaming:
+        return {'registros': filtrar_dados_csv_streaming(input_path, output_path, chunksize=chunksize)}
+    return {'registros': filtrar_dados_csv(input_path, output_path)}
+
+
+def filtrar_todos_csvs(data_dir='Data', filtrados_dir='Data/Filtrados', n_workers=N_WORKERS,
+                       formato=FORMATO_SAIDA, incremental=INCREMENTAL,
+                       modo_streaming=MODO_STREAMING, chunksize=CHUNKSIZE):
+    """
+    Filtra todos os CSVs das estações, em paralelo quando n_workers > 1.
+    No modo incremental, pula as entradas que não mudaram desde a última execução.
+    Retorna um resumo com o resultado de cada arquivo.
+    """
+    if not os.path.exists(filtrados_dir):
+        os.makedirs(filtrados_dir)
+    return executar_filtragem(
+        listar_arquivos_inmet(data_dir, filtrados_dir, formato),
+        partial(filtrar_arquivo, modo_streaming=modo_streaming, chunksize=chunksize),
+        os.path.join(filtrados_dir, NOME_MANIFESTO), versao_regras(), n_workers, incremental
+    )
 
 if __name__ == "__main__":
-    filtrar_todos_csvs(data_dir='Data', filtrados_dir='Data/Filtrados')
\ No newline at end of file
+    imprimir_resumo(filtrar_todos_csvs(data_dir='Data', filtrados_dir='Data/Filtrados'))
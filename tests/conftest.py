@@ -0,0 +1,10 @@
+"""
+Os módulos do projeto são scripts soltos em cada pasta (sem pacote), então os
+testes colocam as pastas no sys.path, como os próprios scripts fazem com COMUM.
+"""
+import os
+import sys
+
+RAIZ = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+for pasta in ('ANALISE', 'ANEEL', 'COMUM'):
+    sys.path.insert(0, os.path.join(RAIZ, pasta))
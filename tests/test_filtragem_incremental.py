@@ -0,0 +1,104 @@
+"""O manifesto da filtragem incremental (COMUM/filtragem_incremental.py) pula e refaz os arquivos certos."""
+import os
+import pytest
+import filtragem_incremental
+
+
+def contar_linhas(chamadas, input_path, output_path):
+    chamadas.append(input_path)
+    with open(input_path, encoding='utf-8') as f:
+        linhas = f.readlines()
+    if linhas and linhas[0].startswith('ERRO'):
+        raise ValueError('arquivo inválido')
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.writelines(linhas)
+    return {'registros': len(linhas)}
+
+
+@pytest.fixture
+def pastas(tmp_path):
+    entradas = tmp_path / 'Data'
+    entradas.mkdir()
+    for nome in ('a', 'b', 'c'):
+        (entradas / f'{nome}.csv').write_text(f'{nome}\n' * 3, encoding='utf-8')
+    pares = [(str(entradas / f'{nome}.csv'), str(tmp_path / 'Filtrados' / f'{nome}_filtrado.csv'))
+             for nome in ('a', 'b', 'c')]
+    return pares, str(tmp_path / 'manifesto.json')
+
+
+def executar(pares, manifesto, versao='v1', incremental=True):
+    chamadas = []
+    processar = lambda entrada, saida: contar_linhas(chamadas, entrada, saida)
+    resumo = filtragem_incremental.executar_filtragem(pares, processar, manifesto, versao, incremental=incremental)
+    return resumo, sorted(os.path.basename(c) for c in chamadas)
+
+
+def test_segunda_execucao_pula_tudo(pastas):
+    pares, manifesto = pastas
+    resumo, chamadas = executar(pares, manifesto)
+    assert chamadas == ['a.csv', 'b.csv', 'c.csv'] and resumo['sucesso'] == 3
+    resumo, chamadas = executar(pares, manifesto)
+    assert chamadas == [] and resumo['ignorados'] == 3
+    # Os ignorados mantêm a contagem de registros do manifesto
+    assert [r['registros'] for r in resumo['resultados']] == [3, 3, 3]
+
+
+def test_refaz_so_o_arquivo_alterado(pastas):
+    pares, manifesto = pastas
+    executar(pares, manifesto)
+    with open(pares[1][0], 'a', encoding='utf-8') as f:
+        f.write('b\n')
+    resumo, chamadas = executar(pares, manifesto)
+    assert chamadas == ['b.csv'] and resumo['ignorados'] == 2
+    assert resumo['resultados'][1]['registros'] == 4
+
+
+def test_mtime_novo_com_mesmo_conteudo(pastas):
+    pares, manifesto = pastas
+    executar(pares, manifesto)
+    st = os.stat(pares[0][0])
+    os.utime(pares[0][0], ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    _, chamadas = executar(pares, manifesto)
+    assert chamadas == []
+    # O novo mtime é gravado, então a próxima execução nem calcula o hash
+    registro = filtragem_incremental.carregar_manifesto(manifesto)[pares[0][1]]
+    assert registro['mtime_ns'] == st.st_mtime_ns + 10**9
+
+
+def test_mesmo_tamanho_conteudo_diferente(pastas):
+    pares, manifesto = pastas
+    executar(pares, manifesto)
+    st = os.stat(pares[2][0])
+    with open(pares[2][0], 'w', encoding='utf-8') as f:
+        f.write('x\n' * 3)
+    os.utime(pares[2][0], ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    _, chamadas = executar(pares, manifesto)
+    assert chamadas == ['c.csv']
+
+
+def test_nova_versao_das_regras_refaz_tudo(pastas):
+    pares, manifesto = pastas
+    executar(pares, manifesto)
+    _, chamadas = executar(pares, manifesto, versao='v2')
+    assert chamadas == ['a.csv', 'b.csv', 'c.csv']
+
+
+def test_saida_apagada_e_modo_completo(pastas):
+    pares, manifesto = pastas
+    executar(pares, manifesto)
+    os.remove(pares[0][1])
+    _, chamadas = executar(pares, manifesto)
+    assert chamadas == ['a.csv']
+    _, chamadas = executar(pares, manifesto, incremental=False)
+    assert chamadas == ['a.csv', 'b.csv', 'c.csv']
+
+
+def test_erro_nao_entra_no_manifesto(pastas):
+    pares, manifesto = pastas
+    with open(pares[1][0], 'w', encoding='utf-8') as f:
+        f.write('ERRO\n')
+    resumo, _ = executar(pares, manifesto)
+    assert resumo['erros'] == 1 and 'ValueError' in resumo['resultados'][1]['erro']
+    assert pares[1][1] not in filtragem_incremental.carregar_manifesto(manifesto)
+    _, chamadas = executar(pares, manifesto)
+    assert chamadas == ['b.csv']
@@ -0,0 +1,48 @@
+"""As árvores compiladas (flat_trees.py) devem dar as mesmas probabilidades do predict_proba."""
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from xgboost import XGBClassifier
+import flat_trees
+
+
+def dados(n=2000, n_features=6, ausentes=False, semente=0):
+    rng = np.random.RandomState(semente)
+    X = rng.normal(size=(n, n_features)).astype('float32')
+    y = (X[:, 0] + 0.5 * X[:, 1] ** 2 + rng.normal(scale=0.5, size=n) > 0.8).astype(int)
+    if ausentes:
+        X[rng.rand(n, n_features) < 0.1] = np.nan
+    features = [f'f{i}' for i in range(n_features)]
+    return pd.DataFrame(X, columns=features), y
+
+
+@pytest.mark.parametrize('profundidade', [3, None])
+def test_random_forest(profundidade):
+    X, y = dados()
+    modelo = RandomForestClassifier(n_estimators=30, max_depth=profundidade, random_state=0).fit(X, y)
+    plano = flat_trees.flatten_model(modelo, X.columns)
+    X_teste, _ = dados(500, semente=1)
+    np.testing.assert_allclose(flat_trees.predict_proba_flat(plano, X_teste.to_numpy()),
+                               modelo.predict_proba(X_teste), rtol=0, atol=1e-12)
+
+
+@pytest.mark.parametrize('ausentes', [False, True])
+def test_xgboost(ausentes):
+    X, y = dados(ausentes=ausentes)
+    modelo = XGBClassifier(n_estimators=40, max_depth=4, tree_method='hist', n_jobs=1).fit(X, y)
+    plano = flat_trees.flatten_model(modelo, X.columns)
+    X_teste, _ = dados(500, ausentes=ausentes, semente=1)
+    np.testing.assert_allclose(flat_trees.predict_proba_flat(plano, X_teste.to_numpy()),
+                               modelo.predict_proba(X_teste), rtol=0, atol=1e-6)
+
+
+def test_modelo_gravado_em_mmap(tmp_path):
+    X, y = dados()
+    modelo = RandomForestClassifier(n_estimators=10, random_state=0).fit(X, y)
+    plano = flat_trees.flatten_model(modelo, X.columns)
+    diretorio = flat_trees.save_flat_model(plano, str(tmp_path / 'modelo'))
+    carregado = flat_trees.load_flat_model(diretorio)
+    assert carregado['meta']['features'] == list(X.columns)
+    np.testing.assert_array_equal(flat_trees.predict_proba_flat(carregado, X.to_numpy()),
+                                  flat_trees.predict_proba_flat(plano, X.to_numpy()))
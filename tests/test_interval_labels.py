@@ -0,0 +1,59 @@
+"""A rotulagem vetorizada (interval_labels.py) deve bater com a marcação hora a hora de cada evento."""
+import numpy as np
+import pandas as pd
+import pytest
+import interval_labels
+
+
+def rotulagem_ingenua(horas, inicio, fim, consumidores):
+    """Marca, evento por evento, todas as horas entre a hora do início e a última hora antes do fim."""
+    n_eventos = np.zeros(len(horas), dtype='int64')
+    n_consumidores = np.zeros(len(horas), dtype='int64')
+    for i in range(len(inicio)):
+        primeira = inicio[i].floor('h')
+        ultima = primeira
+        if fim is not None and not pd.isna(fim[i]):
+            ultima = (fim[i] - pd.Timedelta(1, 'ns')).floor('h')
+            if ultima < primeira:
+                ultima = primeira
+        ativas = (horas >= primeira) & (horas <= ultima)
+        n_eventos[ativas] += 1
+        if consumidores is not None and not np.isnan(consumidores[i]):
+            n_consumidores[ativas] += int(consumidores[i])
+    return n_eventos, n_consumidores
+
+
+def eventos(n=300, semente=0):
+    rng = np.random.RandomState(semente)
+    base = pd.Timestamp('2023-01-01', tz='UTC')
+    # Inícios também antes e depois do índice horário
+    inicio = base + pd.to_timedelta(rng.randint(-50 * 60, 550 * 60, n), unit='min')
+    duracao = pd.to_timedelta(rng.choice([0, 1, 30, 60, 61, 180, 1500], n), unit='min')
+    fim = pd.DatetimeIndex(inicio + duracao)
+    # Fim ausente e fim anterior ao início marcam só a hora do início
+    fim = fim.where(rng.rand(n) > 0.1, pd.NaT)
+    fim = fim.where(rng.rand(n) > 0.05, inicio - pd.Timedelta(hours=2))
+    consumidores = rng.randint(1, 5000, n).astype('float64')
+    consumidores[rng.rand(n) < 0.1] = np.nan
+    return pd.DatetimeIndex(inicio), fim, consumidores
+
+
+@pytest.mark.parametrize('com_fim', [True, False])
+def test_igual_a_rotulagem_ingenua(com_fim):
+    horas = pd.date_range('2023-01-01', periods=500, freq='h', tz='UTC')
+    # Horas faltantes no índice do INMET
+    horas = horas.delete(np.arange(100, 140))
+    inicio, fim, consumidores = eventos()
+    fim = fim if com_fim else None
+
+    n_eventos, n_consumidores = interval_labels.label_hours(horas, inicio, fim, consumidores)
+    esperado_eventos, esperado_consumidores = rotulagem_ingenua(horas, inicio, fim, consumidores)
+    np.testing.assert_array_equal(n_eventos, esperado_eventos)
+    np.testing.assert_array_equal(n_consumidores, esperado_consumidores)
+
+
+def test_sem_eventos():
+    horas = pd.date_range('2023-01-01', periods=24, freq='h', tz='UTC')
+    vazio = pd.DatetimeIndex([], tz='UTC')
+    n_eventos, n_consumidores = interval_labels.label_hours(horas, vazio, vazio)
+    assert not n_eventos.any() and not n_consumidores.any()
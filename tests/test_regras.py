@@ -0,0 +1,105 @@
+"""
+O motor de regras (ANEEL/regras.py + regras_filtro.json) deve manter as mesmas
+linhas e os mesmos nomes do filtro anterior, escrito com str.contains/regex.
+"""
+import os
+import re
+import numpy as np
+import pandas as pd
+import pytest
+import regras
+
+ARQUIVO_REGRAS = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'ANEEL', 'regras_filtro.json')
+
+CONJUNTOS = [
+    'Passo Fundo 1', 'Santa Maria', 'SANTA MARIA', 'SANTA MARIA 1', 'SANTA MARIA 2',
+    'SANTA MARIA 4', 'SANTA MARIA 5', 'Lagoa Vermelha'
+]
+VALORES_EXCLUIR = [
+    "Interna;Nao Programada;Terceiros;Ligacao clandestina",
+    "Interna;Nao Programada;Meio Ambiente;Animais",
+    "Interna;Nao Programada;Terceiros;Empresas de servicos publicos ou suas contratadas",
+    "Interna;Programada;Manutencao;Preventiva",
+    "Interna;Nao Programada;Falha Operacional;Servico mal executado",
+    "Interna;Nao Programada;Nao classificada",
+    "Interna;Nao Programada;Proprias do Sistema;Nao identificada",
+    "Interna;Nao Programada;Terceiros;Defeito interno nao afetando outras unidades consumidoras",
+    "Interna;Programada;Alteracao;Para melhoria",
+    "Interna;Programada;Manutencao;Corretiva",
+    "Interna;Nao Programada;Terceiros;Vandalismo",
+    "Interna;Programada;Alteracao;Para ampliacao"
+]
+
+
+def filtro_regex(df):
+    """Filtro anterior ao motor de regras (ANEEL/app.py antes de regras.py)."""
+    regex_excluir = "|".join(map(re.escape, VALORES_EXCLUIR))
+    df_rge_sul = df[
+        df['SigAgente'].str.contains('RGE SUL', na=False) &
+        df['DscConjuntoUnidadeConsumidora'].isin(CONJUNTOS)
+    ]
+    df_rge_sul = df_rge_sul[~df_rge_sul['DscFatoGeradorInterrupcao'].str.contains(regex_excluir, na=False)].copy()
+    df_rge_sul.loc[
+        df_rge_sul['DscConjuntoUnidadeConsumidora'].str.upper().str.startswith('SANTA MARIA', na=False),
+        'DscConjuntoUnidadeConsumidora'
+    ] = 'Santa Maria'
+    df_rge_sul.loc[
+        df_rge_sul['DscConjuntoUnidadeConsumidora'].str.upper().str.startswith('PASSO FUNDO', na=False),
+        'DscConjuntoUnidadeConsumidora'
+    ] = 'Passo Fundo'
+    return df_rge_sul
+
+
+def interrupcoes(n=5000, semente=0):
+    """Amostra no formato do CSV da ANEEL (tudo texto), com nulos e variações de caixa."""
+    rng = np.random.RandomState(semente)
+    agentes = ['RGE SUL', 'RGE SUL DISTRIBUIDORA', 'rge sul', 'CEEE-D', 'RGE', None]
+    conjuntos = CONJUNTOS + ['Santa Maria 3', 'PASSO FUNDO', 'Passo Fundo 2', 'Erechim', 'Lagoa vermelha', None]
+    fatos = VALORES_EXCLUIR + [
+        'Externa;Nao Programada;Meio Ambiente;Descarga atmosferica',
+        'Interna;Nao Programada;Meio Ambiente;Vento',
+        'Interna;Nao Programada;Meio Ambiente;Animais;Outros',
+        'interna;nao programada;terceiros;vandalismo',
+        None
+    ]
+    return pd.DataFrame({
+        'SigAgente': rng.choice(np.array(agentes, dtype=object), n),
+        'DscConjuntoUnidadeConsumidora': rng.choice(np.array(conjuntos, dtype=object), n),
+        'DscFatoGeradorInterrupcao': rng.choice(np.array(fatos, dtype=object), n),
+        'DatInicioInterrupcao': [f'2023-01-{1 + i % 28:02d} 10:00:00' for i in range(n)]
+    })
+
+
+@pytest.fixture(scope='module')
+def regras_filtro():
+    return regras.carregar_regras(ARQUIVO_REGRAS)
+
+
+def test_mesmas_linhas_do_filtro_regex(regras_filtro):
+    df = interrupcoes()
+    esperado = filtro_regex(df)
+    obtido = regras.aplicar_regras(df, regras_filtro)
+    assert len(esperado) > 0
+    pd.testing.assert_frame_equal(obtido, esperado)
+
+
+def test_colunas_categoricas(regras_filtro):
+    df = interrupcoes(semente=1)
+    categorico = df.astype('category')
+    obtido = regras.aplicar_regras(categorico, regras_filtro)
+    esperado = filtro_regex(df)
+    assert list(obtido.index) == list(esperado.index)
+    # As categorias trazem os nulos como NaN e o texto como None
+    pd.testing.assert_frame_equal(obtido.astype(object).fillna('<nulo>'), esperado.astype(object).fillna('<nulo>'))
+
+
+def test_em_blocos(regras_filtro):
+    # A memorização por valor é compartilhada entre os blocos do modo streaming
+    df = interrupcoes(semente=2)
+    blocos = [regras.aplicar_regras(df.iloc[i:i + 700], regras_filtro) for i in range(0, len(df), 700)]
+    pd.testing.assert_frame_equal(pd.concat(blocos), filtro_regex(df))
+
+
+def test_operador_desconhecido():
+    with pytest.raises(ValueError):
+        regras.compilar_regras({'incluir': [{'coluna': 'SigAgente', 'operador': 'regex', 'valores': ['RGE']}]})
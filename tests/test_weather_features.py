@@ -0,0 +1,52 @@
+"""O modo incremental (stream_features) deve reproduzir as janelas do modo em lote (window_features)."""
+import numpy as np
+import pandas as pd
+import pytest
+import weather_features
+
+
+def serie_horaria(n=600, semente=0):
+    """Série horária do INMET com horas faltantes, como nos arquivos reamostrados."""
+    rng = np.random.RandomState(semente)
+    horas = pd.date_range('2023-01-01', periods=n, freq='h', tz='UTC')
+    horas = horas[rng.rand(n) > 0.15]
+    dados = {
+        'Chuva (mm)': rng.exponential(1.0, len(horas)) * (rng.rand(len(horas)) < 0.3),
+        'Raj. Vento (m/s)': rng.gamma(2.0, 3.0, len(horas)),
+        'Vel. Vento (m/s)': rng.gamma(2.0, 1.5, len(horas)),
+        'Temp. Ins. (C)': 20 + 5 * rng.normal(size=len(horas)),
+        'Pressao Ins. (hPa)': 1010 + rng.normal(size=len(horas))
+    }
+    return pd.DataFrame(dados, index=horas).astype('float32')
+
+
+def comparar(stream, lote):
+    assert list(stream.columns) == list(lote.columns)
+    np.testing.assert_allclose(stream.to_numpy('float64'), lote.to_numpy('float64'),
+                               rtol=1e-6, atol=1e-5, equal_nan=True)
+
+
+def test_nomes_das_features():
+    lote = weather_features.window_features(serie_horaria(50))
+    assert list(lote.columns[5:]) == weather_features.derived_feature_names()
+
+
+@pytest.mark.parametrize('tamanho_bloco', [1, 7, 600])
+def test_stream_igual_ao_lote(tamanho_bloco):
+    df = serie_horaria()
+    lote = weather_features.window_features(df)
+    estado = weather_features.new_stream_state()
+    blocos = [weather_features.stream_features(estado, df.iloc[i:i + tamanho_bloco])
+              for i in range(0, len(df), tamanho_bloco)]
+    comparar(pd.concat(blocos), lote)
+
+
+def test_stream_rejeita_horas_repetidas():
+    df = serie_horaria(100)
+    estado = weather_features.new_stream_state()
+    weather_features.stream_features(estado, df.iloc[:50])
+    with pytest.raises(ValueError):
+        weather_features.stream_features(estado, df.iloc[40:60])
+    # O estado não muda com o erro: a continuação ainda bate com o lote
+    continuacao = weather_features.stream_features(estado, df.iloc[50:])
+    comparar(continuacao, weather_features.window_features(df).iloc[50:])